@@ -1,49 +1,131 @@
+import functools
 import os
-import shutil
-import stat
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
     List,
+    Optional,
     Union,
+    get_args,
 )
 
 import woodchips
 from github import (
     Auth,
-    Gist,
     Github,
-    Repository,
 )
 
+from github_archive.cache import (
+    CachingAdapter,
+    ListingCache,
+)
+from github_archive.concurrency import ConcurrencyController
 from github_archive.constants import (
+    ARCHIVED_CHOICES,
+    ASYNCIO_ENGINE,
+    BACKEND_CHOICES,
+    CLONE_FILTER_CHOICES,
     CLONE_OPERATION,
+    DEFAULT_API_THREADS,
+    DEFAULT_ARCHIVED,
+    DEFAULT_BACKEND,
     DEFAULT_BASE_URL,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_ENGINE,
+    DEFAULT_GIANT_THREADS,
+    DEFAULT_GIANT_TIMEOUT,
     DEFAULT_LOCATION,
     DEFAULT_LOG_LEVEL,
+    DEFAULT_METRICS_HOST,
+    DEFAULT_MIN_THREADS,
     DEFAULT_NUM_THREADS,
+    DEFAULT_QUEUE_BACKEND,
+    DEFAULT_RETRIES,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_SCHEDULE,
     DEFAULT_TIMEOUT,
+    ENGINE_CHOICES,
     GIST_CONTEXT,
+    GRAPHQL_BACKEND,
     LOGGER_NAME,
     ORG_CONTEXT,
+    OWNER_QUEUE_PUT_INTERVAL,
+    OWNER_QUEUE_SIZE,
     PERSONAL_CONTEXT,
     PULL_OPERATION,
+    QUEUE_BACKEND_CHOICES,
+    SCHEDULE_CHOICES,
+    SIZE_SCHEDULE,
     STAR_CONTEXT,
     USER_CONTEXT,
 )
+from github_archive.distributed import (
+    QueuePipeline,
+    consume_work_queue,
+    get_work_queue,
+    wait_for_run,
+)
+from github_archive.filters import (
+    AssetFilter,
+    get_invalid_patterns,
+    parse_date,
+)
 from github_archive.gists import (
-    iterate_gists_to_archive,
     iterate_gists_to_fork,
+    queue_gists_to_archive,
     view_gists,
 )
+from github_archive.git import (
+    is_incomplete_clone,
+    remove_dir,
+)
+from github_archive.graphql import iterate_graphql_git_assets
+from github_archive.journal import RunJournal
 from github_archive.logger import (
     log_and_raise_value_error,
     setup_logger,
 )
+from github_archive.metrics import RunMetrics
+from github_archive.pipeline import (
+    ArchivePipeline,
+    AsyncArchivePipeline,
+)
+from github_archive.progress import ProgressTracker
+from github_archive.ratelimit import (
+    RateLimitedAdapter,
+    TokenPool,
+    install_adapter,
+)
+from github_archive.records import (
+    GistRecord,
+    RepoRecord,
+    build_gist_record,
+    build_repo_record,
+)
+from github_archive.report import RunReport
 from github_archive.repos import (
-    iterate_repos_to_archive,
     iterate_repos_to_fork,
+    queue_repos_to_archive,
     view_repos,
 )
+from github_archive.shards import ShardedPipeline
+from github_archive.ssh import SshControlPool
+from github_archive.state import StateIndex
+
+_END_OF_LISTING = object()
+
+
+class _OwnerListingError:
+    """Carries an exception raised while listing an owner from its worker thread back to the consumer."""
+
+    def __init__(self, error: Exception):
+        self.error = error
 
 
 class GithubArchive:
@@ -68,9 +150,60 @@ class GithubArchive:
         threads=DEFAULT_NUM_THREADS,
         base_url=DEFAULT_BASE_URL,
         log_level=DEFAULT_LOG_LEVEL,
+        stream=False,
+        api_threads=DEFAULT_API_THREADS,
+        cache=True,
+        cache_ttl=DEFAULT_CACHE_TTL,
+        force_pull=False,
+        mirror=False,
+        depth=None,
+        clone_filter=None,
+        strategy_threshold=0,
+        deepen=None,
+        schedule=DEFAULT_SCHEDULE,
+        giant_threshold=0,
+        giant_threads=DEFAULT_GIANT_THREADS,
+        giant_timeout=DEFAULT_GIANT_TIMEOUT,
+        adaptive=False,
+        min_threads=DEFAULT_MIN_THREADS,
+        backend=DEFAULT_BACKEND,
+        min_size=None,
+        max_size=None,
+        archived=DEFAULT_ARCHIVED,
+        pushed_since=None,
+        resume=False,
+        retries=DEFAULT_RETRIES,
+        retry_backoff=DEFAULT_RETRY_BACKOFF,
+        resumable_clones=False,
+        scaled_timeouts=False,
+        stall_timeout=0,
+        progress=False,
+        metrics_file=None,
+        metrics_port=None,
+        metrics_host=DEFAULT_METRICS_HOST,
+        report_file=None,
+        engine=DEFAULT_ENGINE,
+        shards=1,
+        http_config=None,
+        ssh_multiplex=False,
+        ssh_command=None,
+        queue=None,
+        queue_backend=DEFAULT_QUEUE_BACKEND,
+        nodes=None,
+        node=None,
+        shard_index=None,
     ):
+        # The options the run was created with, each shard of a sharded run builds its own copy of the run from them
+        self.options = dict(locals())
+        del self.options["self"]
+
         # Parameter variables
-        self.token = token
+        # Several comma separated tokens can be pooled to share the load of the API calls, the first one is
+        # the authenticated user
+        self.tokens = (
+            [pooled_token.strip() for pooled_token in token.split(",") if pooled_token.strip()] if token else []
+        )
+        self.token = self.tokens[0] if self.tokens else None
         self.users = users.lower().split(",") if users else ""
         self.orgs = orgs.lower().split(",") if orgs else ""
         self.gists = gists.lower().split(",") if gists else ""
@@ -79,8 +212,9 @@ class GithubArchive:
         self.clone = clone
         self.pull = pull
         self.fork = fork
-        self.include = include.lower().split(",") if include else ""
-        self.exclude = exclude.lower().split(",") if exclude else ""
+        # Patterns keep their case, regexes are case sensitive to parse (eg: `\D`) even though matching isn't
+        self.include = include.split(",") if include else ""
+        self.exclude = exclude.split(",") if exclude else ""
         self.languages = languages.lower().split(",") if languages else ""
         self.forks = forks
         self.location = os.path.expanduser(location)
@@ -89,141 +223,266 @@ class GithubArchive:
         self.threads = threads
         self.base_url = base_url
         self.log_level = log_level
+        self.stream = stream
+        self.api_threads = api_threads
+        self.cache_ttl = cache_ttl
+        self.force_pull = force_pull
+        self.mirror = mirror
+        self.depth = depth
+        self.clone_filter = clone_filter
+        self.strategy_threshold = strategy_threshold
+        self.deepen = deepen
+        self.schedule = schedule
+        self.giant_threshold = giant_threshold
+        self.giant_threads = giant_threads
+        self.giant_timeout = giant_timeout
+        self.adaptive = adaptive
+        self.min_threads = min_threads
+        self.backend = backend
+        self.min_size = min_size
+        self.max_size = max_size
+        self.archived = archived
+        self.pushed_since = pushed_since
+        self.resume = resume
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.resumable_clones = resumable_clones
+        self.scaled_timeouts = scaled_timeouts
+        self.stall_timeout = stall_timeout
+        self.progress = progress
+        self.metrics_file = os.path.expanduser(metrics_file) if metrics_file else None
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.report_file = os.path.expanduser(report_file) if report_file else None
+        self.engine = engine
+        self.shards = shards
+        # Settings are passed one by one rather than comma separated since their values may contain commas
+        self.http_config = list(http_config) if http_config else []
+        self.ssh_multiplex = ssh_multiplex
+        self.ssh_command = ssh_command
+        self.queue = os.path.expanduser(queue) if queue else None
+        self.queue_backend = queue_backend
+        # A coordinator lists the git assets of the run and publishes them for its worker nodes to archive
+        self.nodes = [pooled_node.strip() for pooled_node in nodes.split(",") if pooled_node.strip()] if nodes else []
+        self.node = node
+        # Set on the copy of the run a shard builds, shards only archive git assets that were already listed
+        self.shard_index = shard_index
 
         # Internal variables
         self.github_instance = (
-            Github(auth=Auth.Token(self.token), base_url=self.base_url)
+            # The connection pool is sized so concurrent listings and forks don't discard connections
+            Github(auth=Auth.Token(self.token), base_url=self.base_url, pool_size=max(self.api_threads, self.threads))
             if self.token
-            else Github(base_url=self.base_url)
+            else Github(base_url=self.base_url, pool_size=max(self.api_threads, self.threads))
         )
-        self.authenticated_user = self.github_instance.get_user() if self.token else None
-        self.authenticated_username = self.authenticated_user.login.lower() if self.token else None
+        self.token_pool = TokenPool(self.tokens)
+        self.metrics = RunMetrics(self)
+        self.cache = ListingCache(self.location, self.cache_ttl) if cache else None
+        if self.cache:
+            install_adapter(
+                self.github_instance,
+                CachingAdapter,
+                cache=self.cache,
+                token_pool=self.token_pool,
+                metrics=self.metrics,
+            )
+        else:
+            install_adapter(self.github_instance, RateLimitedAdapter, token_pool=self.token_pool, metrics=self.metrics)
+        self.authenticated_user = self.github_instance.get_user() if self.token and shard_index is None else None
+        self.authenticated_username = self.authenticated_user.login.lower() if self.authenticated_user else None
+        self.failed_owners: Dict[str, List[str]] = {}
+        self.state = StateIndex(self.location)
+        self.journal = RunJournal(self.location)
+        self.report = RunReport(self)
+        self.controller: Optional[ConcurrencyController] = None
+        self.progress_tracker: Optional[ProgressTracker] = None
+        self.ssh_pool: Optional[SshControlPool] = None
 
     def run(self):
         """Run the tool based on the arguments passed via the CLI."""
         self.initialize_project()
         logger = woodchips.get(LOGGER_NAME)
         logger.info("# GitHub Archive started...")
+        if self.cache:
+            self.cache.prune()
+        self.state.load()
         start_time = datetime.now()
-        failed_repo_dirs = []
-
-        # Personal (includes personal authenticated items)
-        if self.token and self.users and self.authenticated_user_in_users():
-            logger.info("# Making API call to GitHub for personal repos...")
-            personal_repos = self.get_all_git_assets(PERSONAL_CONTEXT)
-
-            if self.view:
-                logger.info("# Viewing user repos...")
-                view_repos(personal_repos)
-            if self.clone:
-                logger.info("# Cloning missing personal repos...")
-                failed_repos = iterate_repos_to_archive(self, personal_repos, CLONE_OPERATION)
-                if any(failed_repos):
-                    failed_repo_dirs.extend(failed_repos)
-            if self.pull:
-                logger.info("# Pulling changes to personal repos...")
-                _ = iterate_repos_to_archive(self, personal_repos, PULL_OPERATION)
-            if self.fork:
-                # We can't fork a repo we already have, do nothing
-                pass
-
-            # We remove the authenticated user from the list so that we don't double pull their
-            # repos for the `users` logic.
-            self.users.remove(self.authenticated_username)
-
-        # Users (can include personal non-authenticated items, excludes personal authenticated calls)
-        if self.users and len(self.users) > 0:
-            logger.info("# Making API calls to GitHub for user repos...")
-            user_repos = self.get_all_git_assets(USER_CONTEXT)
-
-            if self.view:
-                logger.info("# Viewing user repos...")
-                view_repos(user_repos)
-            if self.clone:
-                logger.info("# Cloning missing user repos...")
-                failed_repos = iterate_repos_to_archive(self, user_repos, CLONE_OPERATION)
-                if any(failed_repos):
-                    failed_repo_dirs.extend(failed_repos)
-            if self.pull:
-                logger.info("# Pulling changes to user repos...")
-                _ = iterate_repos_to_archive(self, user_repos, PULL_OPERATION)
-            if self.fork:
-                logger.info("# Forking user repos...")
-                iterate_repos_to_fork(self, user_repos)
-
-        # Orgs
-        if self.orgs:
-            logger.info("# Making API calls to GitHub for org repos...")
-            org_repos = self.get_all_git_assets(ORG_CONTEXT)
-
-            if self.view:
-                logger.info("# Viewing org repos...")
-                view_repos(org_repos)
-            if self.clone:
-                logger.info("# Cloning missing org repos...")
-                failed_repos = iterate_repos_to_archive(self, org_repos, CLONE_OPERATION)
-                if any(failed_repos):
-                    failed_repo_dirs.extend(failed_repos)
-            if self.pull:
-                logger.info("# Pulling changes to org repos...")
-                _ = iterate_repos_to_archive(self, org_repos, PULL_OPERATION)
-            if self.fork:
-                logger.info("# Forking org repos...")
-                iterate_repos_to_fork(self, org_repos)
-
-        # Stars
-        if self.stars:
-            logger.info("# Making API call to GitHub for starred repos...")
-            starred_repos = self.get_all_git_assets(STAR_CONTEXT)
-
-            if self.view:
-                logger.info("# Viewing stars...")
-                view_repos(starred_repos)
-            if self.clone:
-                logger.info("# Cloning missing starred repos...")
-                failed_repos = iterate_repos_to_archive(self, starred_repos, CLONE_OPERATION)
-                if any(failed_repos):
-                    failed_repo_dirs.extend(failed_repos)
-            if self.pull:
-                logger.info("# Pulling changes to starred repos...")
-                _ = iterate_repos_to_archive(self, starred_repos, PULL_OPERATION)
-            if self.fork:
-                logger.info("# Forking starred repos...")
-                iterate_repos_to_fork(self, starred_repos)
-
-        if failed_repo_dirs:
+        if self.metrics_port is not None:
+            port = self.metrics.serve(self.metrics_port, self.metrics_host)
+            logger.info(f"# Serving metrics at http://{self.metrics_host}:{port}/metrics...")
+        operations = self.get_git_operations()
+        # A worker runs the git operations of the run its coordinator started, a coordinator leaves them to workers
+        work_queue = get_work_queue(self) if self.node else None
+        run_id = None
+        if work_queue:
+            run_id, operations = wait_for_run(work_queue, self.node)
+        archives_locally = bool(operations) and not self.nodes
+        if archives_locally:
+            self.open_journal()
+            self.report.open(operations)
+        # Shards control their own concurrency and report their own progress
+        sharded = self.shards > 1 and archives_locally
+        if self.adaptive and not sharded:
+            self.controller = ConcurrencyController(self)
+            self.controller.start()
+        if archives_locally:
+            # The report and metrics need the bytes git receives even when the progress of the run isn't reported
+            self.progress_tracker = ProgressTracker(self.location)
+            if self.progress and not sharded:
+                self.progress_tracker.start()
+        if self.ssh_multiplex and archives_locally and not sharded:
+            self.ssh_pool = SshControlPool(self)
+        # The SSH connections of the pool are closed even if the run is cut short
+        try:
+            pipeline: ArchivePipeline
+            if self.nodes:
+                pipeline = QueuePipeline(self)
+            elif sharded:
+                pipeline = ShardedPipeline(self)
+            elif self.engine == ASYNCIO_ENGINE:
+                pipeline = AsyncArchivePipeline(self)
+            else:
+                pipeline = ArchivePipeline(self)
+
+            # Workers archive the git assets their coordinator publishes instead of listing any
+            if work_queue:
+                consume_work_queue(self, work_queue, pipeline)
+
+            # Personal (includes personal authenticated items)
+            if self.token and self.users and self.authenticated_user_in_users():
+                logger.info("# Making API call to GitHub for personal repos...")
+                personal_repos = self.list_git_assets(pipeline, PERSONAL_CONTEXT, operations)
+
+                if self.view:
+                    logger.info("# Viewing user repos...")
+                    view_repos(personal_repos)
+                if operations and not self.stream:
+                    logger.info("# Queuing personal repos to archive...")
+                    queue_repos_to_archive(self, pipeline, PERSONAL_CONTEXT, personal_repos, operations)
+                if self.fork:
+                    # We can't fork a repo we already have, do nothing
+                    pass
+
+                # We remove the authenticated user from the list so that we don't double pull their
+                # repos for the `users` logic.
+                self.users.remove(self.authenticated_username)
+
+            # Users (can include personal non-authenticated items, excludes personal authenticated calls)
+            if self.users and len(self.users) > 0:
+                logger.info("# Making API calls to GitHub for user repos...")
+                user_repos = self.list_git_assets(pipeline, USER_CONTEXT, operations)
+
+                if self.view:
+                    logger.info("# Viewing user repos...")
+                    view_repos(user_repos)
+                if operations and not self.stream:
+                    logger.info("# Queuing user repos to archive...")
+                    queue_repos_to_archive(self, pipeline, USER_CONTEXT, user_repos, operations)
+                if self.fork:
+                    logger.info("# Forking user repos...")
+                    iterate_repos_to_fork(self, user_repos)
+
+            # Orgs
+            if self.orgs:
+                logger.info("# Making API calls to GitHub for org repos...")
+                org_repos = self.list_git_assets(pipeline, ORG_CONTEXT, operations)
+
+                if self.view:
+                    logger.info("# Viewing org repos...")
+                    view_repos(org_repos)
+                if operations and not self.stream:
+                    logger.info("# Queuing org repos to archive...")
+                    queue_repos_to_archive(self, pipeline, ORG_CONTEXT, org_repos, operations)
+                if self.fork:
+                    logger.info("# Forking org repos...")
+                    iterate_repos_to_fork(self, org_repos)
+
+            # Stars
+            if self.stars:
+                logger.info("# Making API call to GitHub for starred repos...")
+                starred_repos = self.list_git_assets(pipeline, STAR_CONTEXT, operations)
+
+                if self.view:
+                    logger.info("# Viewing stars...")
+                    view_repos(starred_repos)
+                if operations and not self.stream:
+                    logger.info("# Queuing starred repos to archive...")
+                    queue_repos_to_archive(self, pipeline, STAR_CONTEXT, starred_repos, operations)
+                if self.fork:
+                    logger.info("# Forking starred repos...")
+                    iterate_repos_to_fork(self, starred_repos)
+
+            # Gists
+            if self.gists:
+                logger.info("# Making API call to GitHub for gists...")
+                gists = self.list_git_assets(pipeline, GIST_CONTEXT, operations)
+
+                if self.view:
+                    logger.info("# Viewing gists...")
+                    view_gists(gists)
+                if operations and not self.stream:
+                    logger.info("# Queuing gists to archive...")
+                    queue_gists_to_archive(self, pipeline, GIST_CONTEXT, gists, operations)
+                if self.fork:
+                    logger.info("# Forking gists...")
+                    iterate_gists_to_fork(self, gists)
+
+            logger.info("# Waiting for git operations to finish...")
+            failures = pipeline.wait()
+            if work_queue and run_id:
+                work_queue.complete(self.node, run_id)
+        finally:
+            if self.ssh_pool:
+                self.ssh_pool.close()
+        if self.controller:
+            self.controller.stop()
+        if self.progress_tracker and self.progress and not sharded:
+            self.progress_tracker.stop()
+        if archives_locally:
+            self.state.save()
+            self.journal.finish()
+            self.report.finish()
+            logger.info(f"# Run report written to {self.report.path}")
+        failed_dirs = {"repos": [], "gists": []}
+
+        for context, failed_assets in failures.items():
+            logger.warning(f"{len(failed_assets)} {context} git asset(s) failed to archive.")
+            dirs_location = "gists" if context == GIST_CONTEXT else "repos"
+            # Only failed clones are removed so they can be retried, a failed pull leaves the existing archive intact
+            failed_dirs[dirs_location].extend(name for operation, name in failed_assets if operation == CLONE_OPERATION)
+
+        if failed_dirs["repos"]:
             logger.info("Cleaning up repos...")
-            self.remove_failed_dirs("repos", failed_repo_dirs)
-
-        # Gists
-        if self.gists:
-            logger.info("# Making API call to GitHub for gists...")
-            gists = self.get_all_git_assets(GIST_CONTEXT)
-            failed_gist_dirs = []
-
-            if self.view:
-                logger.info("# Viewing gists...")
-                view_gists(gists)
-            if self.clone:
-                logger.info("# Cloning missing gists...")
-                failed_gists = iterate_gists_to_archive(self, gists, CLONE_OPERATION)
-                if any(failed_gists):
-                    failed_gist_dirs.extend(failed_gists)
-            if self.pull:
-                logger.info("# Pulling changes to gists...")
-                _ = iterate_gists_to_archive(self, gists, PULL_OPERATION)
-            if self.fork:
-                logger.info("# Forking gists...")
-                iterate_gists_to_fork(self, gists)
-
-            if failed_gist_dirs:
-                logger.info("Cleaning up gists...")
-                self.remove_failed_dirs("gists", failed_gist_dirs)
+            self.remove_failed_dirs("repos", failed_dirs["repos"])
+
+        if failed_dirs["gists"]:
+            logger.info("Cleaning up gists...")
+            self.remove_failed_dirs("gists", failed_dirs["gists"])
+
+        for context, owners in self.failed_owners.items():
+            logger.error(f"Could not retrieve the {context} git assets of: {', '.join(owners)}")
 
+        self.token_pool.log_budgets()
+        self.metrics.finish()
+        if self.metrics_file:
+            self.metrics.write_textfile(self.metrics_file)
+        self.metrics.shutdown()
         execution_time = f"Execution time: {datetime.now() - start_time}."
         finish_message = f"GitHub Archive complete! {execution_time}"
         logger.info(finish_message)
 
+    @property
+    def exports_metrics(self) -> bool:
+        """Returns True if the metrics of the run are written to a textfile or served over HTTP."""
+        return bool(self.metrics_file) or self.metrics_port is not None
+
+    @property
+    def tracks_git_progress(self) -> bool:
+        """Returns True if git is asked for its progress, which stall detection, progress reports and the bytes
+        received in metrics and the run report need.
+        """
+        return bool(self.stall_timeout or self.progress or self.exports_metrics)
+
     def initialize_project(self):
         """Initialize the tool and ensure everything is in order before moving on:
         1. Directories are setup correctly
@@ -237,7 +496,14 @@ class GithubArchive:
             os.makedirs(os.path.join(self.location, "repos"))
             os.makedirs(os.path.join(self.location, "gists"))
 
-        if (self.users or self.orgs or self.gists or self.stars) and not (
+        if self.node and (
+            self.users or self.orgs or self.gists or self.stars or self.view or self.clone or self.pull or self.fork
+        ):
+            log_and_raise_value_error(
+                logger=logger,
+                message="A worker node can't be given lists or git operations, it archives what its coordinator lists.",
+            )
+        elif (self.users or self.orgs or self.gists or self.stars) and not (
             self.view or self.clone or self.pull or self.fork
         ):
             log_and_raise_value_error(
@@ -251,34 +517,177 @@ class GithubArchive:
                 logger=logger,
                 message="A list must be provided when a git operation is specified.",
             )
-        elif not (
-            self.users or self.orgs or self.gists or self.stars or self.view or self.clone or self.pull or self.fork
+        elif (
+            not (
+                self.users or self.orgs or self.gists or self.stars or self.view or self.clone or self.pull or self.fork
+            )
+            and not self.node
         ):
             log_and_raise_value_error(
                 logger=logger,
                 message="At least one git operation and one list must be provided to run github-archive.",
             )
-        elif self.include and self.exclude:
+        elif invalid_patterns := get_invalid_patterns([*self.include, *self.exclude]):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The include and exclude flags contain invalid regexes: {', '.join(invalid_patterns)}.",
+            )
+        elif self.pushed_since and parse_date(self.pushed_since) is None:
+            log_and_raise_value_error(
+                logger=logger,
+                message="The pushed_since flag must be a date formatted as YYYY-MM-DD.",
+            )
+        elif self.archived not in get_args(ARCHIVED_CHOICES):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The archived flag must be one of: {', '.join(get_args(ARCHIVED_CHOICES))}.",
+            )
+        elif (self.depth is not None and self.depth < 1) or (self.deepen is not None and self.deepen < 1):
+            log_and_raise_value_error(
+                logger=logger,
+                message="The depth and deepen flags must be a positive number of commits.",
+            )
+        elif self.retries < 0 or self.retry_backoff < 0:
+            log_and_raise_value_error(
+                logger=logger,
+                message="The retries and retry_backoff flags must not be negative.",
+            )
+        elif self.stall_timeout < 0:
+            log_and_raise_value_error(
+                logger=logger,
+                message="The stall_timeout flag must not be negative.",
+            )
+        elif self.metrics_port is not None and not 0 <= self.metrics_port <= 65535:
+            log_and_raise_value_error(
+                logger=logger,
+                message="The metrics_port flag must be a valid port.",
+            )
+        elif self.shards < 1:
+            log_and_raise_value_error(
+                logger=logger,
+                message="The shards flag must be at least 1.",
+            )
+        elif any(not setting.startswith("http.") or "=" not in setting for setting in self.http_config):
+            log_and_raise_value_error(
+                logger=logger,
+                message="The http_config flag must be given http.* key=value settings.",
+            )
+        elif self.ssh_multiplex and self.use_https:
             log_and_raise_value_error(
                 logger=logger,
-                message="The include and exclude flags are mutually exclusive. Only one can be used on each run.",
+                message="The ssh_multiplex flag can't be used with the https flag, HTTPS URLs don't go through SSH.",
             )
-        elif (self.include or self.exclude) and self.languages:
+        elif (self.nodes or self.node) and not self.queue:
             log_and_raise_value_error(
                 logger=logger,
-                message="The include and exclude flags cannot be used with the languages flag.",
+                message="The nodes and node flags require the queue flag.",
+            )
+        elif self.queue and bool(self.nodes) == bool(self.node):
+            log_and_raise_value_error(
+                logger=logger,
+                message="The queue flag requires either the nodes flag of a coordinator or the node flag of a worker.",
+            )
+        elif self.nodes and not (self.clone or self.pull):
+            log_and_raise_value_error(
+                logger=logger,
+                message="A coordinator must be given the clone or pull flag to publish git operations to its workers.",
+            )
+        elif self.queue_backend not in get_args(QUEUE_BACKEND_CHOICES):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The queue_backend flag must be one of: {', '.join(get_args(QUEUE_BACKEND_CHOICES))}.",
+            )
+        elif self.engine not in get_args(ENGINE_CHOICES):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The engine flag must be one of: {', '.join(get_args(ENGINE_CHOICES))}.",
+            )
+        elif self.schedule not in get_args(SCHEDULE_CHOICES):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The schedule flag must be one of: {', '.join(get_args(SCHEDULE_CHOICES))}.",
+            )
+        elif self.clone_filter and self.clone_filter not in get_args(CLONE_FILTER_CHOICES):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The filter flag must be one of: {', '.join(get_args(CLONE_FILTER_CHOICES))}.",
+            )
+        elif self.backend not in get_args(BACKEND_CHOICES):
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The backend flag must be one of: {', '.join(get_args(BACKEND_CHOICES))}.",
+            )
+        elif self.backend == GRAPHQL_BACKEND and not self.token:
+            log_and_raise_value_error(
+                logger=logger,
+                message="The GraphQL backend requires a token, GitHub does not allow anonymous GraphQL requests.",
             )
 
+    @functools.cached_property
+    def asset_filter(self) -> AssetFilter:
+        """The filter compiled from the filtering options, built on first use once the options are validated."""
+        return AssetFilter(
+            include=self.include,
+            exclude=self.exclude,
+            languages=self.languages,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            archived=self.archived,
+            pushed_since=parse_date(self.pushed_since) if self.pushed_since else None,
+        )
+
+    def open_journal(self):
+        """Start journaling the run. When resuming an interrupted run, the partial clones it left behind are
+        removed based on the journal so they can be cloned again.
+        """
+        logger = woodchips.get(LOGGER_NAME)
+
+        if self.journal.open(resume=self.resume):
+            logger.info("# Resuming the interrupted run...")
+            for key in self.journal.get_interrupted_clones():
+                dirs_location, directory = key.split("/", 1)
+                self.remove_failed_dirs(dirs_location, [directory])
+        elif self.resume:
+            logger.info("# No interrupted run to resume, starting a new run...")
+
+    def get_git_operations(self) -> List[str]:
+        """Returns the git operations to run on each asset, in the order they need to run."""
+        operations = []
+
+        if self.clone:
+            operations.append(CLONE_OPERATION)
+        if self.pull:
+            operations.append(PULL_OPERATION)
+
+        return operations
+
     def authenticated_user_in_users(self) -> bool:
         """Returns True if the authenticated user is in the list of users."""
         return self.authenticated_user.login.lower() in self.users
 
-    def get_all_git_assets(self, context: str) -> List[Union[Repository.Repository, Gist.Gist]]:
+    def get_all_git_assets(self, context: str) -> List[Union[RepoRecord, GistRecord]]:
         """Retrieve a list of lists via API of git assets (repos, gists) of the
-        specified owner(s) (users, orgs). Returns a flattened, sorted list of git assets.
+        specified owner(s) (users, orgs). Returns a flattened list of git assets sorted
+        by owner, or from largest to smallest when scheduling by size.
         """
-        logger = woodchips.get(LOGGER_NAME)
+        all_git_assets = list(self.iterate_git_assets(context))
+
+        if self.schedule == SIZE_SCHEDULE and context != GIST_CONTEXT:
+            final_sorted_list = sorted(all_git_assets, key=lambda item: getattr(item, "size", None) or 0, reverse=True)
+        else:
+            final_sorted_list = sorted(all_git_assets, key=lambda item: item.owner.login)
 
+        return final_sorted_list
+
+    def iterate_git_assets(self, context: str) -> Iterator[Union[RepoRecord, GistRecord]]:
+        """Lazily retrieve via API the git assets (repos, gists) of the specified owner(s) (users, orgs) as records.
+
+        Each page of results is only requested once the previous page has been consumed and its assets
+        are filtered as they arrive so callers can start working on them before the listing completes.
+
+        Owners are listed concurrently (up to `api_threads` at a time) but their assets are always yielded
+        in the order the owners were passed. An owner whose listing fails is reported and skipped.
+        """
         get_org_repos = lambda owner: self.github_instance.get_organization(owner).get_repos()  # noqa
         get_personal_repos = lambda _: self.authenticated_user.get_repos(affiliation="owner")  # noqa
         get_starred_repos = lambda owner: self.github_instance.get_user(owner).get_starred()  # noqa
@@ -293,44 +702,152 @@ class GithubArchive:
             USER_CONTEXT: [self.users, get_user_repos, "repos"],
         }
 
-        all_git_assets = []
         owner_list = context_manager[context][0]
+        get_owner_git_assets = context_manager[context][1]
         git_asset_string = context_manager[context][2]
 
-        for owner in owner_list:
-            formatted_owner_name = owner.strip()
-            git_assets = context_manager[context][1](owner)
-            logger.debug(f"{formatted_owner_name} {git_asset_string} retrieved!")
+        if self.backend == GRAPHQL_BACKEND:
+            get_owner_git_assets = lambda owner: iterate_graphql_git_assets(self, context, owner)  # noqa
+        else:
+            # PyGithub objects are converted to records as they are listed so they can be freed right away
+            build_record = build_gist_record if context == GIST_CONTEXT else build_repo_record
+            get_rest_git_assets = get_owner_git_assets
+            get_owner_git_assets = lambda owner: map(build_record, get_rest_git_assets(owner))  # noqa
+
+        if self.api_threads > 1 and len(owner_list) > 1:
+            # Bounded so an owner listed far ahead of the one being consumed can't hold its whole listing in memory
+            owner_queues: List[queue.Queue] = [queue.Queue(maxsize=OWNER_QUEUE_SIZE) for _ in owner_list]
+            pool = ThreadPoolExecutor(min(self.api_threads, len(owner_list)))
+            listing_stopped = threading.Event()
+
+            def put(owner_queue: queue.Queue, item: object) -> bool:
+                """Wait for room in the queue of an owner, returns False if the assets are no longer consumed."""
+                # A listing abandoned without being closed (eg: on an uncaught error) must not hold up the exit
+                while not listing_stopped.is_set() and threading.main_thread().is_alive():
+                    try:
+                        owner_queue.put(item, timeout=OWNER_QUEUE_PUT_INTERVAL)
+                        return True
+                    except queue.Full:
+                        pass
+
+                return False
+
+            def list_owner(owner: str, owner_queue: queue.Queue):
+                try:
+                    for item in self._iterate_owner_git_assets(context, owner, get_owner_git_assets):
+                        if not put(owner_queue, item):
+                            return
+                    put(owner_queue, _END_OF_LISTING)
+                except Exception as error:
+                    put(owner_queue, _OwnerListingError(error))
+
+            for owner, owner_queue in zip(owner_list, owner_queues):
+                pool.submit(list_owner, owner, owner_queue)
+
+            try:
+                for owner, owner_queue in zip(owner_list, owner_queues):
+                    while True:
+                        item = owner_queue.get()
+                        if item is _END_OF_LISTING:
+                            self._report_listed_owner(owner, git_asset_string)
+                            break
+                        elif isinstance(item, _OwnerListingError):
+                            self._report_failed_owner(context, owner, git_asset_string, item.error)
+                            break
+                        else:
+                            yield item
+            finally:
+                listing_stopped.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            for owner in owner_list:
+                try:
+                    yield from self._iterate_owner_git_assets(context, owner, get_owner_git_assets)
+                    self._report_listed_owner(owner, git_asset_string)
+                except Exception as error:
+                    self._report_failed_owner(context, owner, git_asset_string, error)
+
+    def _iterate_owner_git_assets(
+        self,
+        context: str,
+        owner: str,
+        get_owner_git_assets: Callable[[str], Iterable],
+    ) -> Iterator[Union[RepoRecord, GistRecord]]:
+        """Lazily retrieve the git assets of a single owner, page by page, filtering them as they arrive so that
+        filtered out assets never reach the pipeline.
+        """
+        logger = woodchips.get(LOGGER_NAME)
+        # Each page of the listing of an owner must come from the same account, see `TokenPool.pin`
+        with self.token_pool.pin():
+            git_assets = get_owner_git_assets(owner)
 
             for item in git_assets:
                 if context == GIST_CONTEXT:
                     # Automatically add gists since we don't support forked gists
-                    all_git_assets.append(item)
+                    if self.asset_filter.matches_gist(item):
+                        self.metrics.record_listed(context)
+                        yield item
+                    else:
+                        logger.debug(f"{item.id} skipped due to filtering")
                 elif self.forks or (self.forks is False and item.fork is False):
-                    all_git_assets.append(item)
+                    if self.asset_filter.matches_repo(item):
+                        self.metrics.record_listed(context)
+                        yield item
+                    else:
+                        logger.debug(f"{item.name} skipped due to filtering")
                 else:
                     # Do not include this forked asset
                     pass
 
-        final_sorted_list = sorted(all_git_assets, key=lambda item: item.owner.login)
+    def _report_listed_owner(self, owner: str, git_asset_string: str):
+        """Logs that every git asset of an owner was retrieved."""
+        logger = woodchips.get(LOGGER_NAME)
+        logger.debug(f"{owner.strip()} {git_asset_string} retrieved!")
 
-        return final_sorted_list
+    def _report_failed_owner(self, context: str, owner: str, git_asset_string: str, error: Exception):
+        """Logs and records an owner whose git assets could not be retrieved so the run can carry on without it."""
+        logger = woodchips.get(LOGGER_NAME)
+        logger.error(f"Failed to retrieve {owner.strip()} {git_asset_string}: {error}")
+        self.failed_owners.setdefault(context, []).append(owner.strip())
+
+    def list_git_assets(
+        self,
+        pipeline: ArchivePipeline,
+        context: str,
+        operations: List[str],
+    ) -> List[Union[RepoRecord, GistRecord]]:
+        """Retrieve the git assets of a context for viewing, archiving and forking.
+
+        When streaming, each asset is queued on the pipeline as soon as its page of results arrives
+        (in the order GitHub returns them) instead of waiting for the full, sorted list.
+        """
+        if not (self.stream and operations):
+            return self.get_all_git_assets(context)
+
+        listed_git_assets = []
+
+        def stream_git_assets():
+            for item in self.iterate_git_assets(context):
+                listed_git_assets.append(item)
+                yield item
+
+        queue_function = queue_gists_to_archive if context == GIST_CONTEXT else queue_repos_to_archive
+        queue_function(self, pipeline, context, stream_git_assets(), operations)
+
+        return listed_git_assets
 
     def remove_failed_dirs(self, dirs_location: str, failed_dirs: List[str]):
         """Removes a directory if it fails a git operation due to
         timing out or other errors so it can be retried on the next run.
+
+        Partial clones that can be resumed are kept so the next run continues them instead of starting over.
         """
         logger = woodchips.get(LOGGER_NAME)
 
-        def make_dir_writable(function, path, _):
-            """The `.git` folder on Windows cannot be gracefully removed due to being read-only,
-            so we make the directory writable on a failure and retry the original function.
-            """
-            os.chmod(path, stat.S_IWRITE)
-            function(path)
-
         for directory in set(failed_dirs):
             path = os.path.join(self.location, dirs_location, directory)
-            if os.path.exists(path):
+            if is_incomplete_clone(path):
+                logger.debug(f"Keeping the partial clone of {directory} to resume it on the next run...")
+            elif os.path.exists(path):
                 logger.debug(f"Removing {directory} due to a failed git operation...")
-                shutil.rmtree(path, onerror=make_dir_writable)
+                remove_dir(path)
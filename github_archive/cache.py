@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    Optional,
+)
+
+import woodchips
+from requests import (
+    PreparedRequest,
+    Response,
+)
+from requests.structures import CaseInsensitiveDict
+
+from github_archive.constants import LOGGER_NAME
+from github_archive.ratelimit import (
+    RateLimitedAdapter,
+    TokenPool,
+)
+
+# Headers describing the encoding of the original payload, these no longer apply once the body has been cached
+STALE_HEADERS = (
+    "content-encoding",
+    "content-length",
+    "transfer-encoding",
+)
+
+
+class ListingCache:
+    """An on-disk cache of GitHub API responses (such as listing pages) stored alongside their ETags.
+
+    Each entry lives in its own JSON file under `<location>/cache` so concurrent listings never contend on a
+    single file. Entries that haven't been used for `ttl` seconds are evicted and will be requested again in full.
+    """
+
+    def __init__(self, location: str, ttl: int):
+        self.directory = os.path.join(location, "cache")
+        self.ttl = ttl
+
+    @staticmethod
+    def key(url: str, authorization: Optional[str]) -> str:
+        """Build the cache key of a request, the credentials are part of the key (hashed, never stored) so that
+        private listings of one token are never served to another.
+        """
+        return hashlib.sha256(f"{url}\n{authorization or ''}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached entry for a key, or None if there isn't one or it has expired."""
+        path = os.path.join(self.directory, f"{key}.json")
+
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self._remove(path)
+                return None
+
+            with open(path) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, etag: str, headers: Dict[str, str], body: str):
+        """Store a response body and its headers under a key.
+
+        The entry is written to a temporary file first and moved into place so a reader never sees a partial entry.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{key}.json")
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry = {
+            "etag": etag,
+            "headers": headers,
+            "body": body,
+        }
+
+        with open(temp_path, "w") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(temp_path, path)
+
+    def touch(self, key: str):
+        """Restart the TTL of an entry that the API just confirmed is still current."""
+        try:
+            os.utime(os.path.join(self.directory, f"{key}.json"))
+        except OSError:
+            pass
+
+    def prune(self):
+        """Evict every entry that has outlived the TTL."""
+        logger = woodchips.get(LOGGER_NAME)
+
+        if not os.path.isdir(self.directory):
+            return
+
+        now = time.time()
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    self._remove(path)
+                    logger.debug(f"Evicted {filename} from the cache")
+            except OSError:
+                # Another process may have evicted the entry first
+                pass
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class CachingAdapter(RateLimitedAdapter):
+    """A `requests` transport adapter that turns GET requests into conditional requests using cached ETags.
+
+    A `304 Not Modified` response does not count against the GitHub rate limit, it is answered with the cached
+    body and headers (refreshed with the rate limit headers of the 304) so callers can't tell the difference.
+
+    Entries are keyed on the token each request is actually sent with, which the token pool picks per request.
+    """
+
+    def __init__(self, cache: ListingCache, token_pool: TokenPool, **kwargs):
+        self.cache = cache
+        super().__init__(token_pool, **kwargs)
+
+    def _send_with_token(self, request: PreparedRequest, resource: str, token: Optional[str], **kwargs) -> Response:
+        if request.method != "GET" or not request.url:
+            return super()._send_with_token(request, resource, token, **kwargs)
+
+        # The token pool has already swapped in the token the request is sent with
+        key = self.cache.key(request.url, str(request.headers.get("Authorization", "")))
+        # A retry may be sent with another token than the one the previous attempt was conditional on
+        request.headers.pop("If-None-Match", None)
+        entry = self.cache.get(key)
+        if entry:
+            request.headers["If-None-Match"] = entry["etag"]
+
+        response = super()._send_with_token(request, resource, token, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self.cache.touch(key)
+            return self._build_cached_response(request, response, entry)
+        elif response.status_code == 200 and response.headers.get("ETag"):
+            headers = {
+                header: value for header, value in response.headers.items() if header.lower() not in STALE_HEADERS
+            }
+            self.cache.set(key, response.headers["ETag"], headers, response.content.decode("utf-8"))
+
+        return response
+
+    @staticmethod
+    def _build_cached_response(
+        request: PreparedRequest, not_modified_response: Response, entry: Dict[str, Any]
+    ) -> Response:
+        """Build a `200 OK` response from a cache entry."""
+        cached_response = Response()
+        cached_response.status_code = 200
+        cached_response.reason = "OK"
+        cached_response.url = request.url  # type: ignore[assignment]
+        cached_response.request = request
+        cached_response.encoding = "utf-8"
+        cached_response._content = entry["body"].encode("utf-8")
+        cached_response.headers = CaseInsensitiveDict(entry["headers"])
+
+        # The rate limit headers of the 304 are the current ones, the cached ones are from the original request
+        for header, value in not_modified_response.headers.items():
+            if header.lower().startswith("x-ratelimit-"):
+                cached_response.headers[header] = value
+
+        not_modified_response.close()
+
+        return cached_response
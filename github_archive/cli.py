@@ -4,12 +4,31 @@ from typing import get_args
 from github_archive import GithubArchive
 from github_archive._version import __version__
 from github_archive.constants import (
+    ARCHIVED_CHOICES,
+    BACKEND_CHOICES,
+    CLONE_FILTER_CHOICES,
+    DEFAULT_API_THREADS,
+    DEFAULT_ARCHIVED,
+    DEFAULT_BACKEND,
     DEFAULT_BASE_URL,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_ENGINE,
+    DEFAULT_GIANT_THREADS,
+    DEFAULT_GIANT_TIMEOUT,
     DEFAULT_LOCATION,
     DEFAULT_LOG_LEVEL,
+    DEFAULT_METRICS_HOST,
+    DEFAULT_MIN_THREADS,
     DEFAULT_NUM_THREADS,
+    DEFAULT_QUEUE_BACKEND,
+    DEFAULT_RETRIES,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_SCHEDULE,
     DEFAULT_TIMEOUT,
+    ENGINE_CHOICES,
     LOG_LEVEL_CHOICES,
+    QUEUE_BACKEND_CHOICES,
+    SCHEDULE_CHOICES,
 )
 
 
@@ -28,7 +47,8 @@ class GithubArchiveCli:
             default=None,
             help=(
                 "Provide your GitHub token to authenticate with the GitHub API and gain access to private repos and"
-                " gists."
+                " gists. Pass a comma separated list of tokens to pool their rate limits, the first one is used as the"
+                " authenticated user."
             ),
         )
         parser.add_argument(
@@ -100,14 +120,20 @@ class GithubArchiveCli:
             type=str,
             required=False,
             default=None,
-            help="Pass a comma separated list of repos to filter what is included in the Archive.",
+            help=(
+                "Pass a comma separated list of repos or gists to filter what is included in the Archive. Names can be"
+                " globs (github-*), regexes (re:^github-) and be qualified with their owner (justintime50/github-*)."
+            ),
         )
         parser.add_argument(
             "--exclude",
             type=str,
             required=False,
             default=None,
-            help="Pass a comma separated list of repos to filter what is excluded from the Archive.",
+            help=(
+                "Pass a comma separated list of repos or gists to filter what is excluded from the Archive, supports"
+                " the same patterns as --include."
+            ),
         )
         parser.add_argument(
             "--languages",
@@ -116,6 +142,62 @@ class GithubArchiveCli:
             default=None,
             help="Pass a comma separated list of languages to filter what is included in the Archive.",
         )
+        parser.add_argument(
+            "--min_size",
+            type=int,
+            required=False,
+            default=None,
+            help="Only include repos at least this size in KB (as reported by GitHub).",
+        )
+        parser.add_argument(
+            "--max_size",
+            type=int,
+            required=False,
+            default=None,
+            help="Only include repos at most this size in KB (as reported by GitHub).",
+        )
+        parser.add_argument(
+            "--archived",
+            type=str,
+            required=False,
+            default=DEFAULT_ARCHIVED,
+            choices=set(get_args(ARCHIVED_CHOICES)),
+            help=f"Whether to include, exclude or only include archived repos. Default: {DEFAULT_ARCHIVED}",
+        )
+        parser.add_argument(
+            "--pushed_since",
+            type=str,
+            required=False,
+            default=None,
+            help="Only include repos pushed to (or gists updated) since this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to resume an interrupted run, skipping the git assets it already archived and"
+                " removing the clones it left partially done."
+            ),
+        )
+        parser.add_argument(
+            "--resumable_clones",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to clone git assets in stages that are kept when a clone fails or times out, the next"
+                " attempt resumes the clone instead of starting over."
+            ),
+        )
+        parser.add_argument(
+            "--force_pull",
+            action="store_true",
+            required=False,
+            default=False,
+            help="Pass this flag to pull every git asset, even those GitHub reports unchanged since the last sync.",
+        )
         parser.add_argument(
             "--forks",
             action="store_true",
@@ -130,6 +212,49 @@ class GithubArchiveCli:
             default=DEFAULT_LOCATION,
             help=f"The location where you want your GitHub Archive to be stored. Default: {DEFAULT_LOCATION}",
         )
+        parser.add_argument(
+            "--mirror",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to keep bare mirror clones (without a working tree) updated via `git remote update"
+                " --prune` instead of checked out repos updated via `git pull --rebase`."
+            ),
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            required=False,
+            default=None,
+            help="Pass a number of commits to shallow clone git assets with a history truncated to that depth.",
+        )
+        parser.add_argument(
+            "--filter",
+            type=str,
+            required=False,
+            default=None,
+            dest="clone_filter",
+            choices=set(get_args(CLONE_FILTER_CHOICES)),
+            help="Partially clone git assets, fetching blobs (blob:none) or trees and blobs (tree:0) on demand.",
+        )
+        parser.add_argument(
+            "--strategy_threshold",
+            type=int,
+            required=False,
+            default=0,
+            help=(
+                "Only use the --depth and --filter clone strategies for repos at least this size in KB (as reported by"
+                " GitHub). Default: 0 (every repo)"
+            ),
+        )
+        parser.add_argument(
+            "--deepen",
+            type=int,
+            required=False,
+            default=None,
+            help="Pass a number of commits to deepen the history of shallow clones by on each pull.",
+        )
         parser.add_argument(
             "--https",
             action="store_true",
@@ -144,6 +269,160 @@ class GithubArchiveCli:
             default=DEFAULT_TIMEOUT,
             help=f"The number of seconds before a git operation times out. Default: {DEFAULT_TIMEOUT}",
         )
+        parser.add_argument(
+            "--scaled_timeouts",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to scale the timeout of each git operation by how long it took on earlier runs and by"
+                " the size of the repo. Git assets with neither use --timeout."
+            ),
+        )
+        parser.add_argument(
+            "--stall_timeout",
+            type=int,
+            required=False,
+            default=0,
+            help=(
+                "The number of seconds a clone, fetch or pull may go without reporting progress before it is killed."
+                " Default: 0 (disabled)"
+            ),
+        )
+        parser.add_argument(
+            "--progress",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to report the progress, throughput and ETA of the run every few seconds, on the console"
+                " and in a status.json file in the root of the archive."
+            ),
+        )
+        parser.add_argument(
+            "--metrics_file",
+            type=str,
+            required=False,
+            default=None,
+            help=(
+                "The path to write Prometheus metrics of the run to once it completes, eg: in the textfile collector"
+                " directory of node-exporter."
+            ),
+        )
+        parser.add_argument(
+            "--metrics_port",
+            type=int,
+            required=False,
+            default=None,
+            help="The port to serve Prometheus metrics of the run on (at /metrics) while it runs.",
+        )
+        parser.add_argument(
+            "--metrics_host",
+            type=str,
+            required=False,
+            default=DEFAULT_METRICS_HOST,
+            help=(
+                "The host (interface) to serve metrics on with --metrics_port, eg: 0.0.0.0 to let other machines"
+                f" scrape them. Default: {DEFAULT_METRICS_HOST}"
+            ),
+        )
+        parser.add_argument(
+            "--report_file",
+            type=str,
+            required=False,
+            default=None,
+            help=(
+                "The path to write the JSON Lines report of the run to, with the outcome and timings of every git"
+                " operation. Default: a timestamped file in the reports folder of the archive"
+            ),
+        )
+        parser.add_argument(
+            "--engine",
+            type=str,
+            required=False,
+            default=DEFAULT_ENGINE,
+            choices=set(get_args(ENGINE_CHOICES)),
+            help=(
+                "How git operations run concurrently: one thread each or as asyncio subprocesses, which lets --threads"
+                f" go far higher. Default: {DEFAULT_ENGINE}"
+            ),
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            required=False,
+            default=1,
+            help=(
+                "The number of worker processes to split the git assets of the run across, each running its own"
+                " --threads. Default: 1"
+            ),
+        )
+        parser.add_argument(
+            "--http_config",
+            type=str,
+            action="append",
+            required=False,
+            default=None,
+            help=(
+                "An http.* git setting passed to every git command to tune the HTTPS transport (eg:"
+                " http.version=HTTP/2). Pass the flag once per setting."
+            ),
+        )
+        parser.add_argument(
+            "--ssh_multiplex",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to share a pool of SSH connections (sized to --threads) between git commands instead"
+                " of connecting for each of them."
+            ),
+        )
+        parser.add_argument(
+            "--ssh_command",
+            type=str,
+            required=False,
+            default=None,
+            help=(
+                "The SSH command git connects with when using --ssh_multiplex. Default: GIT_SSH_COMMAND or"
+                " core.sshCommand if set, otherwise ssh"
+            ),
+        )
+        parser.add_argument(
+            "--queue",
+            type=str,
+            required=False,
+            default=None,
+            help=(
+                "The path of the work queue shared by a coordinator and its worker nodes: a SQLite database or a"
+                " folder depending on --queue_backend."
+            ),
+        )
+        parser.add_argument(
+            "--queue_backend",
+            type=str,
+            required=False,
+            default=DEFAULT_QUEUE_BACKEND,
+            choices=set(get_args(QUEUE_BACKEND_CHOICES)),
+            help=f"Where the work queue is stored. Default: {DEFAULT_QUEUE_BACKEND}",
+        )
+        parser.add_argument(
+            "--nodes",
+            type=str,
+            required=False,
+            default=None,
+            help=(
+                "Run as a coordinator: list the git assets and publish them to --queue for these worker nodes"
+                " (comma separated names) to archive."
+            ),
+        )
+        parser.add_argument(
+            "--node",
+            type=str,
+            required=False,
+            default=None,
+            help="Run as a worker: archive the git assets published to --queue for the node of this name.",
+        )
         parser.add_argument(
             "--threads",
             type=int,
@@ -151,6 +430,121 @@ class GithubArchiveCli:
             default=DEFAULT_NUM_THREADS,
             help=f"The number of concurrent threads to run. Default: {DEFAULT_NUM_THREADS}",
         )
+        parser.add_argument(
+            "--adaptive",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to adapt the number of concurrent git operations (between --min_threads and --threads)"
+                " to the measured throughput, CPU load, disk latency and error rate."
+            ),
+        )
+        parser.add_argument(
+            "--min_threads",
+            type=int,
+            required=False,
+            default=DEFAULT_MIN_THREADS,
+            help=(
+                f"The minimum number of concurrent git operations when using --adaptive. Default: {DEFAULT_MIN_THREADS}"
+            ),
+        )
+        parser.add_argument(
+            "--schedule",
+            type=str,
+            required=False,
+            default=DEFAULT_SCHEDULE,
+            choices=set(get_args(SCHEDULE_CHOICES)),
+            help=(
+                "The order git assets are archived in: as they are listed or from the largest repo to the smallest."
+                f" Default: {DEFAULT_SCHEDULE}"
+            ),
+        )
+        parser.add_argument(
+            "--giant_threshold",
+            type=int,
+            required=False,
+            default=0,
+            help=(
+                "Repos at least this size in KB (as reported by GitHub) are archived in a dedicated lane with their"
+                " own threads and timeout. Default: 0 (disabled)"
+            ),
+        )
+        parser.add_argument(
+            "--giant_threads",
+            type=int,
+            required=False,
+            default=DEFAULT_GIANT_THREADS,
+            help=f"The number of concurrent threads of the giant repo lane. Default: {DEFAULT_GIANT_THREADS}",
+        )
+        parser.add_argument(
+            "--giant_timeout",
+            type=int,
+            required=False,
+            default=DEFAULT_GIANT_TIMEOUT,
+            help=(
+                "The number of seconds before a git operation in the giant repo lane times out. Default:"
+                f" {DEFAULT_GIANT_TIMEOUT}"
+            ),
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            required=False,
+            default=DEFAULT_RETRIES,
+            help=(
+                "The number of times a git operation that fails with a transient error (eg: a timeout or dropped"
+                f" connection) is retried during the run. Default: {DEFAULT_RETRIES}"
+            ),
+        )
+        parser.add_argument(
+            "--retry_backoff",
+            type=int,
+            required=False,
+            default=DEFAULT_RETRY_BACKOFF,
+            help=(
+                "The number of seconds to wait before the first retry of a git operation, doubled (with jitter) for"
+                f" each retry after it. Default: {DEFAULT_RETRY_BACKOFF}"
+            ),
+        )
+        parser.add_argument(
+            "--api_threads",
+            type=int,
+            required=False,
+            default=DEFAULT_API_THREADS,
+            help=(
+                "The number of users/orgs to list concurrently via the GitHub API (separate from --threads). Default:"
+                f" {DEFAULT_API_THREADS}"
+            ),
+        )
+        parser.add_argument(
+            "--backend",
+            type=str,
+            required=False,
+            default=DEFAULT_BACKEND,
+            choices=set(get_args(BACKEND_CHOICES)),
+            help=(
+                "The GitHub API used to list git assets, the GraphQL API only fetches the fields needed to archive"
+                f" them (requires a token). Default: {DEFAULT_BACKEND}"
+            ),
+        )
+        parser.add_argument(
+            "--no_cache",
+            action="store_true",
+            required=False,
+            default=False,
+            help="Pass this flag to skip the on-disk cache of API responses and list every git asset in full.",
+        )
+        parser.add_argument(
+            "--cache_ttl",
+            type=int,
+            required=False,
+            default=DEFAULT_CACHE_TTL,
+            help=(
+                "The number of seconds an unused API response is kept in the cache before being evicted. Default:"
+                f" {DEFAULT_CACHE_TTL}"
+            ),
+        )
         parser.add_argument(
             "--base_url",
             type=str,
@@ -161,6 +555,16 @@ class GithubArchiveCli:
                 f" {DEFAULT_BASE_URL}"
             ),
         )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            required=False,
+            default=False,
+            help=(
+                "Pass this flag to start cloning/pulling git assets as soon as each page is listed instead of waiting"
+                " for the full list (git assets will not be sorted by owner)."
+            ),
+        )
         parser.add_argument(
             "--log_level",
             type=str,
@@ -190,6 +594,30 @@ class GithubArchiveCli:
             include=self.include,
             exclude=self.exclude,
             languages=self.languages,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            archived=self.archived,
+            pushed_since=self.pushed_since,
+            resume=self.resume,
+            retries=self.retries,
+            retry_backoff=self.retry_backoff,
+            resumable_clones=self.resumable_clones,
+            scaled_timeouts=self.scaled_timeouts,
+            stall_timeout=self.stall_timeout,
+            progress=self.progress,
+            metrics_file=self.metrics_file,
+            metrics_port=self.metrics_port,
+            metrics_host=self.metrics_host,
+            report_file=self.report_file,
+            engine=self.engine,
+            shards=self.shards,
+            http_config=self.http_config,
+            ssh_multiplex=self.ssh_multiplex,
+            ssh_command=self.ssh_command,
+            queue=self.queue,
+            queue_backend=self.queue_backend,
+            nodes=self.nodes,
+            node=self.node,
             forks=self.forks,
             location=self.location,
             use_https=self.https,
@@ -197,6 +625,23 @@ class GithubArchiveCli:
             threads=self.threads,
             base_url=self.base_url,
             log_level=self.log_level,
+            stream=self.stream,
+            api_threads=self.api_threads,
+            cache=not self.no_cache,
+            cache_ttl=self.cache_ttl,
+            force_pull=self.force_pull,
+            mirror=self.mirror,
+            depth=self.depth,
+            clone_filter=self.clone_filter,
+            strategy_threshold=self.strategy_threshold,
+            deepen=self.deepen,
+            schedule=self.schedule,
+            giant_threshold=self.giant_threshold,
+            giant_threads=self.giant_threads,
+            giant_timeout=self.giant_timeout,
+            adaptive=self.adaptive,
+            min_threads=self.min_threads,
+            backend=self.backend,
         )
         github_archive.run()
 
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    ADAPTIVE_INTERVAL,
+    DISK_LATENCY_THRESHOLD,
+    ERROR_RATE_THRESHOLD,
+    LOAD_THRESHOLD,
+    LOGGER_NAME,
+)
+
+
+class AdaptiveLimiter:
+    """A limit on the number of in-flight git operations that can be resized while operations are running.
+
+    Shrinking the limit never interrupts running operations, new operations simply wait until enough of
+    them finish to fit under the new limit.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def try_acquire(self) -> bool:
+        """Take a slot without waiting for one, returns False if the limit has been reached."""
+        with self.condition:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+
+        return True
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def resize(self, limit: int):
+        with self.condition:
+            self.limit = limit
+            self.condition.notify_all()
+
+
+class Sample:
+    """The measurements of a run over one interval of the concurrency controller."""
+
+    def __init__(
+        self,
+        throughput: float,
+        error_rate: float,
+        load_per_cpu: float,
+        disk_latency: float,
+        saturated: bool,
+    ):
+        self.throughput = throughput
+        self.error_rate = error_rate
+        self.load_per_cpu = load_per_cpu
+        self.disk_latency = disk_latency
+        self.saturated = saturated
+
+
+class ConcurrencyController:
+    """Grows or shrinks the number of in-flight git operations based on how the run is going.
+
+    Every interval we sample throughput (operations completed per second), the error/timeout rate, the CPU
+    load and the disk latency of the archive. Errors halve the limit, an overloaded machine or disk removes a
+    worker and otherwise a worker is added as long as the previous one improved throughput (additive increase,
+    multiplicative decrease). The limit always stays between `min_threads` and `threads`.
+    """
+
+    def __init__(self, github_archive: GithubArchive, interval: float = ADAPTIVE_INTERVAL):
+        self.github_archive = github_archive
+        self.interval = interval
+        self.minimum = max(1, min(github_archive.min_threads, github_archive.threads))
+        self.maximum = github_archive.threads
+        self.limiter = AdaptiveLimiter(max(self.minimum, min(self.maximum, os.cpu_count() or 1)))
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.last_throughput = 0.0
+        self.last_change = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def record(self, failed: bool):
+        """Record the outcome of a git operation."""
+        with self.lock:
+            self.completed += 1
+            if failed:
+                self.failed += 1
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.adjust(self.sample())
+
+    def sample(self) -> Sample:
+        """Measure the run since the previous sample."""
+        with self.lock:
+            completed, failed = self.completed, self.failed
+            self.completed = self.failed = 0
+
+        return Sample(
+            throughput=completed / self.interval,
+            error_rate=failed / completed if completed else 0.0,
+            load_per_cpu=os.getloadavg()[0] / (os.cpu_count() or 1) if hasattr(os, "getloadavg") else 0.0,
+            disk_latency=self._measure_disk_latency(),
+            saturated=self.limiter.in_flight >= self.limiter.limit,
+        )
+
+    def adjust(self, sample: Sample):
+        """Resize the limiter based on a sample."""
+        logger = woodchips.get(LOGGER_NAME)
+        limit = self.limiter.limit
+
+        if sample.error_rate > ERROR_RATE_THRESHOLD:
+            new_limit = limit // 2
+            reason = f"error rate of {sample.error_rate:.0%}"
+        elif sample.load_per_cpu > LOAD_THRESHOLD:
+            new_limit = limit - 1
+            reason = f"CPU load of {sample.load_per_cpu:.2f} per core"
+        elif sample.disk_latency > DISK_LATENCY_THRESHOLD:
+            new_limit = limit - 1
+            reason = f"disk latency of {sample.disk_latency:.2f}s"
+        elif self.last_change > 0 and sample.throughput < self.last_throughput:
+            new_limit = limit - 1
+            reason = "throughput dropped after adding a worker"
+        elif sample.saturated:
+            new_limit = limit + 1
+            reason = f"throughput of {sample.throughput:.2f} operations/s"
+        else:
+            new_limit = limit
+            reason = ""
+
+        new_limit = max(self.minimum, min(self.maximum, new_limit))
+        self.last_change = new_limit - limit
+        self.last_throughput = sample.throughput
+
+        if new_limit != limit:
+            logger.debug(f"Adjusting concurrent git operations from {limit} to {new_limit} ({reason})")
+            self.limiter.resize(new_limit)
+
+    def _measure_disk_latency(self) -> float:
+        """Time a small synced write to the archive, a slow disk shows up here long before it shows up in git."""
+        probe_path = os.path.join(self.github_archive.location, ".latency-probe")
+        start = time.monotonic()
+
+        try:
+            with open(probe_path, "wb") as probe_file:
+                probe_file.write(os.urandom(4096))
+                probe_file.flush()
+                os.fsync(probe_file.fileno())
+            os.remove(probe_path)
+        except OSError:
+            return 0.0
+
+        return time.monotonic() - start
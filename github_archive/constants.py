@@ -4,9 +4,17 @@ from typing import Literal
 DEFAULT_BASE_URL = "https://api.github.com"
 DEFAULT_LOCATION = os.path.join("~", "github-archive")
 DEFAULT_NUM_THREADS = 10
+DEFAULT_MIN_THREADS = 2
+DEFAULT_API_THREADS = 4
 DEFAULT_TIMEOUT = 300
+DEFAULT_CACHE_TTL = 604800  # 1 week
+DEFAULT_GIANT_THREADS = 1
+DEFAULT_GIANT_TIMEOUT = 3600
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 5
 
 DEFAULT_LOG_LEVEL = "info"
+DEFAULT_METRICS_HOST = "127.0.0.1"
 LOG_LEVEL_CHOICES = Literal[
     "debug",
     "info",
@@ -15,8 +23,138 @@ LOG_LEVEL_CHOICES = Literal[
     "critical",
 ]
 
+CLONE_FILTER_CHOICES = Literal[
+    "blob:none",
+    "tree:0",
+]
+
+# Rate limits
+API_BUDGET_RESERVE = 0.1  # fraction of the rate limit under which API calls are paced
+RATE_LIMIT_ATTEMPTS = 3
+
+# Timeouts
+MIN_SCALED_TIMEOUT = 60
+MAX_SCALED_TIMEOUT = 86400  # 1 day
+SCALED_TIMEOUT_THROUGHPUT = 512  # The slowest transfer rate (in KB/s) we expect a clone to keep up
+HISTORICAL_TIMEOUT_FACTOR = 3
+TIMED_OUT_GROWTH_FACTOR = 2  # How much longer an operation gets after it ran out of time
+STREAM_OUTPUT_CHUNKS = 256
+
+# Progress
+PROGRESS_INTERVAL = 10
+
+# Metrics
+API_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+GIT_DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 14400)
+
+# Resumable clones
+INCOMPLETE_CLONE_MARKER = "github-archive-incomplete"
+
+# Retries
+MAX_RETRY_BACKOFF = 300
+# Git errors that retrying won't fix, anything else (timeouts, dropped connections, etc) is considered transient
+PERMANENT_GIT_ERRORS = (
+    "repository not found",
+    "' not found",
+    "access denied",
+    "permission denied",
+    "authentication failed",
+    "could not read username",
+    "access to this repository has been disabled",
+    "returned error: 401",
+    "returned error: 403",
+    "returned error: 404",
+    "does not appear to be a git repository",
+    "not a git repository",
+    "already exists and is not an empty directory",
+    "conflict",
+    "could not apply",
+    "unstaged changes",
+    "not possible to fast-forward",
+)
+
+# Adaptive concurrency
+ADAPTIVE_INTERVAL = 5  # seconds between samples
+DISK_LATENCY_THRESHOLD = 0.5  # seconds for a small synced write
+ERROR_RATE_THRESHOLD = 0.25
+LOAD_THRESHOLD = 1.5  # 1 minute load average per CPU
+
+REGEX_PATTERN_PREFIX = "re:"
+INCLUDE_ARCHIVED = "include"
+EXCLUDE_ARCHIVED = "exclude"
+ONLY_ARCHIVED = "only"
+DEFAULT_ARCHIVED = INCLUDE_ARCHIVED
+ARCHIVED_CHOICES = Literal[
+    "include",
+    "exclude",
+    "only",
+]
+
+REST_BACKEND = "rest"
+GRAPHQL_BACKEND = "graphql"
+DEFAULT_BACKEND = REST_BACKEND
+BACKEND_CHOICES = Literal[
+    "rest",
+    "graphql",
+]
+GRAPHQL_PAGE_SIZE = 100
+# The git assets an owner listed ahead of the owners before it may buffer before its listing pauses
+OWNER_QUEUE_SIZE = 1000
+OWNER_QUEUE_PUT_INTERVAL = 0.5  # seconds
+
+LISTING_SCHEDULE = "listing"
+SIZE_SCHEDULE = "size"
+DEFAULT_SCHEDULE = LISTING_SCHEDULE
+SCHEDULE_CHOICES = Literal[
+    "listing",
+    "size",
+]
+
+THREADS_ENGINE = "threads"
+ASYNCIO_ENGINE = "asyncio"
+DEFAULT_ENGINE = THREADS_ENGINE
+ENGINE_CHOICES = Literal[
+    "threads",
+    "asyncio",
+]
+
+SQLITE_QUEUE_BACKEND = "sqlite"
+FILESYSTEM_QUEUE_BACKEND = "filesystem"
+DEFAULT_QUEUE_BACKEND = SQLITE_QUEUE_BACKEND
+QUEUE_BACKEND_CHOICES = Literal[
+    "sqlite",
+    "filesystem",
+]
+QUEUE_POLL_INTERVAL = 1  # seconds
+QUEUE_PUBLISH_BATCH_SIZE = 100
+HASH_RING_REPLICAS = 100
+
+DEFAULT_SSH_COMMAND = "ssh"
+SSH_SESSIONS_PER_CONNECTION = 10  # The default `MaxSessions` of sshd
+SSH_CONTROL_PERSIST = 60  # seconds
+SSH_EXIT_TIMEOUT = 10  # seconds
+SSH_SOCKET_DIRECTORY = "/tmp"  # nosec, kept short as the path of a Unix socket is limited
+SSH_SOCKET_PATH_LIMIT = 104  # The size of `sun_path` on macOS, Linux allows 108
+SSH_CONTROL_PATH_HASH_LENGTH = 40  # The length of `%C`, a SHA1 hash
+SSH_TEMP_SOCKET_SUFFIX_LENGTH = 17  # OpenSSH binds a master to `<path>.<16 random characters>` before renaming it
+
 LOGGER_NAME = "github-archive"
 
+MIRROR_SUFFIX = ".git"
+
+JOURNAL_QUEUED = "queued"
+JOURNAL_STARTED = "started"
+JOURNAL_SUCCEEDED = "succeeded"
+JOURNAL_FAILED = "failed"
+JOURNAL_FINISHED = "finished"
+
+REPORTS_DIR = "reports"
+# The number of timestamped reports kept in the reports folder, older ones are removed as new runs start
+REPORTS_KEPT = 100
+REPORT_SUCCEEDED = "succeeded"
+REPORT_FAILED = "failed"
+REPORT_SKIPPED = "skipped"
+
 CLONE_OPERATION = "clone"
 PULL_OPERATION = "pull"
 
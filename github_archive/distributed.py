@@ -0,0 +1,487 @@
+from __future__ import annotations
+
+import abc
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    FILESYSTEM_QUEUE_BACKEND,
+    HASH_RING_REPLICAS,
+    LOGGER_NAME,
+    QUEUE_POLL_INTERVAL,
+    QUEUE_PUBLISH_BATCH_SIZE,
+)
+from github_archive.gists import queue_gists_to_archive
+from github_archive.pipeline import ArchivePipeline
+from github_archive.records import (
+    GistRecord,
+    OwnerRecord,
+    RepoRecord,
+)
+from github_archive.repos import queue_repos_to_archive
+
+_PENDING = "pending"
+_CLAIMED = "claimed"
+_DONE = "done"
+
+
+class HashRing:
+    """A consistent hash ring of worker nodes.
+
+    Each node is placed on the ring many times so work spreads evenly, and adding or removing a node only moves the
+    assets of that node instead of reshuffling every asset across the others.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = HASH_RING_REPLICAS):
+        self.ring = sorted((_hash(f"{node}#{replica}"), node) for node in nodes for replica in range(replicas))
+        self.hashes = [node_hash for node_hash, _ in self.ring]
+
+    def get_node(self, key: str) -> str:
+        """Returns the node an asset belongs to, the first one clockwise from the hash of its key."""
+        index = bisect.bisect(self.hashes, _hash(key)) % len(self.ring)
+
+        return self.ring[index][1]
+
+
+class WorkQueue(abc.ABC):
+    """The queue a coordinator publishes the git assets of a run to, partitioned by the worker node that archives
+    them.
+
+    A queue holds a single run: the coordinator opens it with the git operations to run (dropping whatever the
+    previous run left behind and giving the run a new id), publishes every asset it lists and closes it once listing
+    is done. Workers claim the pending assets of their node until the queue is closed and they have claimed
+    everything, then mark their claimed assets as done and the run as completed by their node once archived. A
+    worker that restarts puts the assets it had claimed but not finished back in the queue.
+    """
+
+    @abc.abstractmethod
+    def open(self, operations: List[str]):
+        """Start a new run of the given git operations, dropping whatever the previous run left behind."""
+
+    @abc.abstractmethod
+    def get_run(self) -> Optional[Tuple[str, List[str]]]:
+        """Returns the id and git operations of the run, None until a coordinator opened the queue."""
+
+    @abc.abstractmethod
+    def publish(self, tasks: List[Tuple[str, Dict[str, Any]]]):
+        """Publish assets along with the node each of them belongs to."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Mark the run as fully published."""
+
+    @abc.abstractmethod
+    def is_closed(self) -> bool:
+        """Returns True once the coordinator published every asset of the run."""
+
+    @abc.abstractmethod
+    def claim(self, node: str) -> List[Dict[str, Any]]:
+        """Claim every pending asset of a node, each asset is only ever claimed once."""
+
+    @abc.abstractmethod
+    def recover(self, node: str):
+        """Put the assets a node claimed back in the queue."""
+
+    @abc.abstractmethod
+    def complete(self, node: str, run_id: str):
+        """Mark the assets a node claimed as done and the run as completed by the node, unless another run has
+        started since.
+        """
+
+    @abc.abstractmethod
+    def is_completed(self, node: str, run_id: str) -> bool:
+        """Returns True if a node already completed a run."""
+
+
+class SqliteWorkQueue(WorkQueue):
+    """A work queue stored in a SQLite database, for nodes that can all reach the same database file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def open(self, operations: List[str]):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM tasks")
+            connection.execute("DELETE FROM run")
+            connection.execute("DELETE FROM completed")
+            connection.execute(
+                "INSERT INTO run (id, operations, closed) VALUES (?, ?, 0)",
+                (uuid.uuid4().hex, json.dumps(operations)),
+            )
+
+    def get_run(self) -> Optional[Tuple[str, List[str]]]:
+        with self._transaction() as connection:
+            row = connection.execute("SELECT id, operations FROM run").fetchone()
+
+        return (row[0], json.loads(row[1])) if row else None
+
+    def publish(self, tasks: List[Tuple[str, Dict[str, Any]]]):
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO tasks (node, status, payload) VALUES (?, ?, ?)",
+                [(node, _PENDING, json.dumps(task)) for node, task in tasks],
+            )
+
+    def close(self):
+        with self._transaction() as connection:
+            connection.execute("UPDATE run SET closed = 1")
+
+    def is_closed(self) -> bool:
+        with self._transaction() as connection:
+            row = connection.execute("SELECT closed FROM run").fetchone()
+
+        return bool(row and row[0])
+
+    def claim(self, node: str) -> List[Dict[str, Any]]:
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, payload FROM tasks WHERE node = ? AND status = ? ORDER BY id",
+                (node, _PENDING),
+            ).fetchall()
+            connection.executemany("UPDATE tasks SET status = ? WHERE id = ?", [(_CLAIMED, row[0]) for row in rows])
+
+        return [json.loads(payload) for _, payload in rows]
+
+    def recover(self, node: str):
+        with self._transaction() as connection:
+            self._set_claimed_status(connection, node, _PENDING)
+
+    def complete(self, node: str, run_id: str):
+        with self._transaction() as connection:
+            self._set_claimed_status(connection, node, _DONE)
+            connection.execute(
+                "INSERT INTO completed (node, run_id) SELECT ?, id FROM run WHERE id = ?", (node, run_id)
+            )
+
+    def is_completed(self, node: str, run_id: str) -> bool:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM completed WHERE node = ? AND run_id = ?",
+                (node, run_id),
+            ).fetchone()
+
+        return row is not None
+
+    @staticmethod
+    def _set_claimed_status(connection: sqlite3.Connection, node: str, status: str):
+        connection.execute(
+            "UPDATE tasks SET status = ? WHERE node = ? AND status = ?",
+            (status, node, _CLAIMED),
+        )
+
+    def _transaction(self) -> _SqliteTransaction:
+        """Returns a transaction that holds the write lock of the database, so claiming assets is atomic across
+        processes.
+        """
+        with self.lock:
+            if not self.connection:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                # Autocommit so transactions can be started explicitly, a connection is shared by the threads of a
+                # process behind a lock. The default rollback journal is kept as WAL doesn't work over network shares
+                self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS tasks"
+                    " (id INTEGER PRIMARY KEY AUTOINCREMENT, node TEXT, status TEXT, payload TEXT)"
+                )
+                self.connection.execute("CREATE INDEX IF NOT EXISTS tasks_node_status ON tasks (node, status)")
+                self.connection.execute("CREATE TABLE IF NOT EXISTS run (id TEXT, operations TEXT, closed INTEGER)")
+                self.connection.execute("CREATE TABLE IF NOT EXISTS completed (node TEXT, run_id TEXT)")
+
+        return _SqliteTransaction(self.connection, self.lock)
+
+
+class _SqliteTransaction:
+    def __init__(self, connection: sqlite3.Connection, lock: threading.Lock):
+        self.connection = connection
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        self.connection.execute("BEGIN IMMEDIATE")
+
+        return self.connection
+
+    def __exit__(self, exception_type, exception, traceback):
+        try:
+            self.connection.execute("ROLLBACK" if exception_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class FilesystemWorkQueue(WorkQueue):
+    """A work queue stored as a folder of JSON files, for nodes that share a filesystem (eg: over NFS).
+
+    Each asset is a file that moves between the `pending`, `claimed` and `done` folders of its node, moving a file
+    is atomic so an asset is only ever claimed once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sequence = itertools.count()
+
+    def open(self, operations: List[str]):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path)
+        self._write_atomically(os.path.join(self.path, "run.json"), {"id": uuid.uuid4().hex, "operations": operations})
+
+    def get_run(self) -> Optional[Tuple[str, List[str]]]:
+        try:
+            with open(os.path.join(self.path, "run.json")) as run_file:
+                run = json.load(run_file)
+        except FileNotFoundError:
+            # Not opened yet, or being opened again by the coordinator
+            return None
+
+        return run["id"], run["operations"]
+
+    def publish(self, tasks: List[Tuple[str, Dict[str, Any]]]):
+        # Assets are named in the order they were published so they are claimed in that order too
+        for node, task in tasks:
+            self._write_atomically(os.path.join(self.path, node, _PENDING, f"{next(self.sequence):012d}.json"), task)
+
+    def close(self):
+        self._write_atomically(os.path.join(self.path, "closed.json"), {"closed_at": time.time()})
+
+    def is_closed(self) -> bool:
+        return os.path.isfile(os.path.join(self.path, "closed.json"))
+
+    def claim(self, node: str) -> List[Dict[str, Any]]:
+        tasks = []
+        for filename in self._list(node, _PENDING):
+            claimed_path = os.path.join(self.path, node, _CLAIMED, filename)
+            try:
+                os.replace(os.path.join(self.path, node, _PENDING, filename), claimed_path)
+            except FileNotFoundError:
+                # Another worker of the node claimed it first
+                continue
+
+            with open(claimed_path) as task_file:
+                tasks.append(json.load(task_file))
+
+        return tasks
+
+    def recover(self, node: str):
+        self._move_claimed(node, _PENDING)
+
+    def complete(self, node: str, run_id: str):
+        self._move_claimed(node, _DONE)
+        run = self.get_run()
+        if run and run[0] == run_id:
+            self._write_atomically(os.path.join(self.path, node, "completed.json"), {"run_id": run_id})
+
+    def is_completed(self, node: str, run_id: str) -> bool:
+        try:
+            with open(os.path.join(self.path, node, "completed.json")) as completed_file:
+                return json.load(completed_file)["run_id"] == run_id
+        except FileNotFoundError:
+            return False
+
+    def _move_claimed(self, node: str, status: str):
+        for filename in self._list(node, _CLAIMED):
+            os.replace(
+                os.path.join(self.path, node, _CLAIMED, filename), os.path.join(self.path, node, status, filename)
+            )
+
+    def _list(self, node: str, status: str) -> List[str]:
+        for directory in (_PENDING, _CLAIMED, _DONE):
+            os.makedirs(os.path.join(self.path, node, directory), exist_ok=True)
+
+        return sorted(
+            filename for filename in os.listdir(os.path.join(self.path, node, status)) if filename.endswith(".json")
+        )
+
+    def _write_atomically(self, path: str, content: Dict[str, Any]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as temp_file:
+            json.dump(content, temp_file)
+        os.replace(temp_path, path)
+
+
+class QueuePipeline(ArchivePipeline):
+    """Publishes the git assets of a run to a work queue for worker nodes to archive instead of archiving them.
+
+    Each asset is published to the node picked by consistent hashing of its `owner/name` (or `owner/id` for gists),
+    so an asset is always archived by the same node while the list of nodes stays the same.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        self.github_archive = github_archive
+        self.work_queue = get_work_queue(github_archive)
+        self.ring = HashRing(github_archive.nodes)
+        self.tasks: List[Tuple[str, Dict[str, Any]]] = []
+        self.published = 0
+        self.work_queue.open(github_archive.get_git_operations())
+
+    def submit(  # type: ignore[override]
+        self,
+        context: str,
+        archive_function: Callable[..., Any],
+        operations: List[str],
+        size: Optional[int] = None,
+        asset_path: Optional[str] = None,
+        **kwargs,
+    ) -> None:
+        """Publish a single git asset with every operation to run on it."""
+        asset = kwargs.get("repo") or kwargs["gist"]
+        task = {"context": context, "operations": operations, "asset": _dump_asset(asset)}
+        self.tasks.append((self.ring.get_node(_get_asset_key(asset)), task))
+        # Publishing in batches saves a write to the queue per asset while workers still get going during listing
+        if len(self.tasks) >= QUEUE_PUBLISH_BATCH_SIZE:
+            self._publish()
+
+    def _publish(self):
+        self.work_queue.publish(self.tasks)
+        self.published += len(self.tasks)
+        self.tasks = []
+
+    def wait(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Close the queue once everything was published, failures are reported by the workers."""
+        logger = woodchips.get(LOGGER_NAME)
+
+        self._publish()
+        self.work_queue.close()
+        logger.info(f"# Published {self.published} git assets for {len(self.github_archive.nodes)} worker nodes.")
+
+        return {}
+
+
+def get_work_queue(github_archive: GithubArchive) -> WorkQueue:
+    """Returns the work queue of the run based on its queue backend."""
+    if github_archive.queue_backend == FILESYSTEM_QUEUE_BACKEND:
+        return FilesystemWorkQueue(github_archive.queue)
+
+    return SqliteWorkQueue(github_archive.queue)
+
+
+def wait_for_run(work_queue: WorkQueue, node: str) -> Tuple[str, List[str]]:
+    """Block until a coordinator opened the work queue for a run this worker node hasn't completed yet, and return
+    the id and git operations of that run.
+
+    A worker started before its coordinator would otherwise find the previous run, already closed, and exit.
+    """
+    logger = woodchips.get(LOGGER_NAME)
+    waiting = False
+
+    while True:
+        run = work_queue.get_run()
+        if run and not work_queue.is_completed(node, run[0]):
+            return run
+        if not waiting:
+            logger.info("# Waiting for a coordinator to start a run...")
+            waiting = True
+        time.sleep(QUEUE_POLL_INTERVAL)
+
+
+def consume_work_queue(github_archive: GithubArchive, work_queue: WorkQueue, pipeline: ArchivePipeline):
+    """Queue the git assets published for this worker node on its pipeline as they arrive, until the coordinator
+    closes the queue and every asset of the node was claimed.
+    """
+    logger = woodchips.get(LOGGER_NAME)
+    node = github_archive.node
+    claimed = 0
+
+    # Anything claimed by a previous worker of this node that didn't finish needs archiving again
+    work_queue.recover(node)
+    while True:
+        # Checked before claiming so an asset published right before the queue was closed can't be missed
+        closed = work_queue.is_closed()
+        tasks = work_queue.claim(node)
+        for task in tasks:
+            asset = _load_asset(task["asset"])
+            if isinstance(asset, GistRecord):
+                queue_gists_to_archive(github_archive, pipeline, task["context"], [asset], task["operations"])
+            else:
+                queue_repos_to_archive(github_archive, pipeline, task["context"], [asset], task["operations"])
+        claimed += len(tasks)
+
+        if closed and not tasks:
+            break
+        elif not tasks:
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+    logger.info(f"# Claimed {claimed} git assets for node {node}.")
+
+
+def _hash(key: str) -> int:
+    """A hash of a key that is the same on every node, unlike `hash()`."""
+    return int.from_bytes(hashlib.md5(key.encode(), usedforsecurity=False).digest()[:8], "big")
+
+
+def _get_asset_key(asset: Union[RepoRecord, GistRecord]) -> str:
+    name = asset.id if isinstance(asset, GistRecord) else asset.name
+
+    return f"{asset.owner.login.lower()}/{name}"
+
+
+def _dump_asset(asset: Union[RepoRecord, GistRecord]) -> Dict[str, Any]:
+    """Returns the fields needed to archive an asset in a form that can be published."""
+    if isinstance(asset, GistRecord):
+        return {
+            "type": "gist",
+            "id": asset.id,
+            "owner": asset.owner.login,
+            "html_url": asset.html_url,
+            "updated_at": _dump_datetime(asset.updated_at),
+        }
+
+    return {
+        "type": "repo",
+        "name": asset.name,
+        "full_name": asset.full_name,
+        "owner": asset.owner.login,
+        "fork": asset.fork,
+        "archived": asset.archived,
+        "language": asset.language,
+        "html_url": asset.html_url,
+        "ssh_url": asset.ssh_url,
+        "pushed_at": _dump_datetime(asset.pushed_at),
+        "size": asset.size,
+    }
+
+
+def _load_asset(fields: Dict[str, Any]) -> Union[RepoRecord, GistRecord]:
+    fields = dict(fields)
+    asset_type = fields.pop("type")
+    owner = OwnerRecord(fields.pop("owner"))
+
+    if asset_type == "gist":
+        return GistRecord(owner=owner, updated_at=_load_datetime(fields.pop("updated_at")), **fields)
+
+    return RepoRecord(owner=owner, pushed_at=_load_datetime(fields.pop("pushed_at")), **fields)
+
+
+def _dump_datetime(timestamp: Optional[datetime]) -> Optional[str]:
+    return timestamp.isoformat() if isinstance(timestamp, datetime) else None
+
+
+def _load_datetime(timestamp: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(timestamp) if timestamp else None
@@ -0,0 +1,170 @@
+import fnmatch
+import re
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Set,
+)
+
+from github_archive.constants import (
+    EXCLUDE_ARCHIVED,
+    ONLY_ARCHIVED,
+    REGEX_PATTERN_PREFIX,
+)
+from github_archive.records import (
+    GistRecord,
+    RepoRecord,
+)
+
+GLOB_CHARACTERS = ("*", "?", "[")
+
+
+class NamePatterns:
+    """A compiled list of name patterns, each pattern can be:
+
+    - an exact name (eg: `github-archive`), looked up in a set
+    - a glob (eg: `github-*`)
+    - a regular expression prefixed with `re:` (eg: `re:^github-(archive|serve)$`)
+
+    Patterns containing a `/` are matched against the owner-qualified name (eg: `justintime50/github-*`).
+    Matching is case insensitive. Each glob and regex is compiled on its own, merging them into one expression
+    would break the inline flags and backreferences of the regexes.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.names: Set[str] = set()
+        self.qualified_names: Set[str] = set()
+        self.name_regexes: List[Pattern] = []
+        self.qualified_regexes: List[Pattern] = []
+
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+
+            if pattern.startswith(REGEX_PATTERN_PREFIX):
+                expression = pattern[len(REGEX_PATTERN_PREFIX) :]
+            elif any(character in pattern for character in GLOB_CHARACTERS):
+                # Globs match the whole name while regexes match anywhere in it unless anchored
+                expression = rf"\A{fnmatch.translate(pattern)}"
+            else:
+                names = self.qualified_names if "/" in pattern else self.names
+                names.add(pattern.lower())
+                continue
+
+            regexes = self.qualified_regexes if "/" in expression else self.name_regexes
+            regexes.append(_compile_expression(expression))
+
+    def __bool__(self) -> bool:
+        return bool(self.names or self.qualified_names or self.name_regexes or self.qualified_regexes)
+
+    def matches(self, owner: str, name: str) -> bool:
+        name = name.lower()
+        qualified_name = f"{owner.lower()}/{name}"
+
+        return (
+            name in self.names
+            or qualified_name in self.qualified_names
+            or any(regex.search(name) for regex in self.name_regexes)
+            or any(regex.search(qualified_name) for regex in self.qualified_regexes)
+        )
+
+
+class AssetFilter:
+    """Decides which listed git assets are archived, compiled once per run from the filtering options.
+
+    Every option that is set must match for an asset to be kept. Name patterns and `pushed_since` apply to repos
+    and gists, the other predicates only exist for repos and are ignored for gists.
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+        languages: Iterable[str] = (),
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        archived: Optional[str] = None,
+        pushed_since: Optional[datetime] = None,
+    ):
+        self.include = NamePatterns(include)
+        self.exclude = NamePatterns(exclude)
+        self.languages = frozenset(language.strip().lower() for language in languages if language.strip())
+
+        # Only the options that are set become predicates so an unfiltered run checks nothing
+        self.shared_predicates: List[Callable[[str, str], bool]] = []
+        if self.include:
+            self.shared_predicates.append(lambda owner, name: self.include.matches(owner, name))
+        if self.exclude:
+            self.shared_predicates.append(lambda owner, name: not self.exclude.matches(owner, name))
+
+        self.repo_predicates: List[Callable[[RepoRecord], bool]] = []
+        if self.languages:
+            self.repo_predicates.append(lambda repo: (repo.language or "").lower() in self.languages)
+        if min_size is not None:
+            self.repo_predicates.append(lambda repo: (repo.size or 0) >= min_size)
+        if max_size is not None:
+            self.repo_predicates.append(lambda repo: (repo.size or 0) <= max_size)
+        if archived == EXCLUDE_ARCHIVED:
+            self.repo_predicates.append(lambda repo: not repo.archived)
+        elif archived == ONLY_ARCHIVED:
+            self.repo_predicates.append(lambda repo: bool(repo.archived))
+        if pushed_since:
+            since = _as_utc(pushed_since)
+            self.repo_predicates.append(lambda repo: _is_since(repo.pushed_at, since))
+
+        self.gist_predicates: List[Callable[[GistRecord], bool]] = []
+        if pushed_since:
+            self.gist_predicates.append(lambda gist: _is_since(gist.updated_at, since))
+
+    def matches_repo(self, repo: RepoRecord) -> bool:
+        return all(predicate(repo.owner.login, repo.name) for predicate in self.shared_predicates) and all(
+            predicate(repo) for predicate in self.repo_predicates
+        )
+
+    def matches_gist(self, gist: GistRecord) -> bool:
+        return all(predicate(gist.owner.login, gist.id) for predicate in self.shared_predicates) and all(
+            predicate(gist) for predicate in self.gist_predicates
+        )
+
+
+def parse_date(date: str) -> Optional[datetime]:
+    """Parse a `YYYY-MM-DD` date (or a full ISO 8601 timestamp), returns None if it can't be parsed."""
+    try:
+        return _as_utc(datetime.fromisoformat(date))
+    except ValueError:
+        return None
+
+
+def get_invalid_patterns(patterns: Iterable[str]) -> List[str]:
+    """Returns the regex patterns of a list that don't compile, exactly as `NamePatterns` will compile them."""
+    invalid_patterns = []
+
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if pattern.startswith(REGEX_PATTERN_PREFIX):
+            try:
+                _compile_expression(pattern[len(REGEX_PATTERN_PREFIX) :])
+            except re.error:
+                invalid_patterns.append(pattern)
+
+    return invalid_patterns
+
+
+def _compile_expression(expression: str) -> Pattern:
+    return re.compile(expression, re.IGNORECASE)
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
+
+def _is_since(timestamp: Optional[datetime], since: datetime) -> bool:
+    return isinstance(timestamp, datetime) and _as_utc(timestamp) >= since
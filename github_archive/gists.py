@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import os
-import subprocess  # nosec
 from concurrent.futures import (
     ALL_COMPLETED,
     ThreadPoolExecutor,
@@ -9,6 +8,7 @@ from concurrent.futures import (
 )
 from typing import (
     TYPE_CHECKING,
+    Iterable,
     List,
     Optional,
 )
@@ -19,42 +19,49 @@ from github import Gist
 if TYPE_CHECKING:
     # This is needed to get around circular imports while allowing `mypy` to be happy
     from github_archive.archive import GithubArchive  # pragma: no cover
+    from github_archive.pipeline import ArchivePipeline  # pragma: no cover
+    from github_archive.records import GistRecord  # pragma: no cover
 
 from github_archive.constants import (
+    ASYNCIO_ENGINE,
     CLONE_OPERATION,
     LOGGER_NAME,
     PULL_OPERATION,
 )
+from github_archive.git import (
+    GitJob,
+    build_git_command,
+    get_asset_dir_name,
+    get_git_timeout,
+    is_incomplete_clone,
+    is_shallow_clone,
+    run_git_job,
+    run_git_job_async,
+)
 
 
-def iterate_gists_to_archive(
+def queue_gists_to_archive(
     github_archive: GithubArchive,
-    gists: List[Gist.Gist],
-    operation: str,
-) -> List[Optional[str]]:
-    """Iterate over each gist and start a thread if it can be archived."""
-    pool = ThreadPoolExecutor(github_archive.threads)
-    thread_list = []
-
+    pipeline: ArchivePipeline,
+    context: str,
+    gists: Iterable[GistRecord],
+    operations: List[str],
+):
+    """Iterate over each gist and queue it on the shared pipeline so it can be archived."""
     for gist in gists:
-        gist_path = os.path.join(github_archive.location, "gists", gist.id)
-        thread_list.append(
-            pool.submit(
-                _archive_gist,
-                github_archive=github_archive,
-                gist=gist,
-                gist_path=gist_path,
-                operation=operation,
-            )
+        gist_path = os.path.join(github_archive.location, "gists", get_asset_dir_name(github_archive, gist.id))
+        pipeline.submit(
+            context,
+            _archive_gist_async if github_archive.engine == ASYNCIO_ENGINE else _archive_gist,
+            operations,
+            asset_path=gist_path,
+            github_archive=github_archive,
+            gist=gist,
+            gist_path=gist_path,
         )
 
-    wait(thread_list, return_when=ALL_COMPLETED)
-    failed_gists = [gist.result() for gist in thread_list if gist.result()]
-
-    return failed_gists
-
 
-def view_gists(gists: List[Gist.Gist]):
+def view_gists(gists: List[GistRecord]):
     """View a list of gists that will be cloned/pulled."""
     logger = woodchips.get(LOGGER_NAME)
 
@@ -63,7 +70,7 @@ def view_gists(gists: List[Gist.Gist]):
         logger.info(gist_id)
 
 
-def iterate_gists_to_fork(github_archive: GithubArchive, gists: List[Gist.Gist]) -> List[Optional[str]]:
+def iterate_gists_to_fork(github_archive: GithubArchive, gists: List[GistRecord]) -> List[Optional[str]]:
     """Iterates through a list of gists and attempts to fork them."""
     pool = ThreadPoolExecutor(github_archive.threads)
     thread_list = []
@@ -72,6 +79,7 @@ def iterate_gists_to_fork(github_archive: GithubArchive, gists: List[Gist.Gist])
         thread_list.append(
             pool.submit(
                 _fork_gist,
+                github_archive=github_archive,
                 gist=gist,
             )
         )
@@ -82,52 +90,95 @@ def iterate_gists_to_fork(github_archive: GithubArchive, gists: List[Gist.Gist])
     return failed_gists
 
 
-def _fork_gist(gist: Gist.Gist):
-    """Forks a gist to the authenticated user's GitHub instance."""
+def _fork_gist(github_archive: GithubArchive, gist: GistRecord):
+    """Forks a gist to the authenticated user's GitHub instance.
+
+    The record doesn't carry an API handle so we build a partial gist from its ID, forking it is then a single
+    request instead of fetching the gist first. It shares the requester of the run so that the fork goes through
+    its rate limiting and metrics.
+    """
     logger = woodchips.get(LOGGER_NAME)
 
     gist_id = f"{gist.owner.login}/{gist.id}"
 
     try:
-        gist.create_fork()
+        Gist.Gist(github_archive.github_instance.requester, completed=False, url=f"/gists/{gist.id}").create_fork()
         logger.info(f"{gist_id} forked!")
     except Exception:
         logger.warning(f"{gist_id} failed to fork!")
 
 
-def _archive_gist(github_archive: GithubArchive, gist: Gist.Gist, gist_path: str, operation: str) -> Optional[str]:
-    """Clone and pull gists based on the operation passed.
+def _archive_gist(
+    github_archive: GithubArchive,
+    gist: GistRecord,
+    gist_path: str,
+    operation: str,
+    timeout: Optional[int] = None,
+) -> Optional[str]:
+    """Clone and pull gists based on the operation passed, the timeout defaults to the timeout policy of the run.
 
     We return the name of the gist if its git operation fails, otherwise return None.
     """
+    job = _get_gist_job(github_archive, gist, gist_path, operation, timeout)
+
+    return run_git_job(github_archive, job) if job else None
+
+
+async def _archive_gist_async(
+    github_archive: GithubArchive,
+    gist: GistRecord,
+    gist_path: str,
+    operation: str,
+    timeout: Optional[int] = None,
+) -> Optional[str]:
+    """The asyncio engine counterpart of `_archive_gist`."""
+    job = _get_gist_job(github_archive, gist, gist_path, operation, timeout)
+
+    return await run_git_job_async(github_archive, job) if job else None
+
+
+def _get_gist_job(
+    github_archive: GithubArchive,
+    gist: GistRecord,
+    gist_path: str,
+    operation: str,
+    timeout: Optional[int],
+) -> Optional[GitJob]:
+    """Returns the git job of a gist operation or None if the operation doesn't need to run."""
     logger = woodchips.get(LOGGER_NAME)
-    failed_gist = None
-    full_gist_id = os.path.join(gist.owner.login, gist.id)  # We use a path here to properly remove failed dirs
+    # We use a path here to properly remove failed dirs
+    full_gist_id = os.path.join(gist.owner.login, get_asset_dir_name(github_archive, gist.id))
+    state_key = f"gists/{gist.id}"
+
+    incomplete_clone = is_incomplete_clone(gist_path)
 
-    if (os.path.exists(gist_path) and operation == CLONE_OPERATION) or (
-        not os.path.exists(gist_path) and operation == PULL_OPERATION
+    if (os.path.exists(gist_path) and operation == CLONE_OPERATION and not incomplete_clone) or (
+        operation == PULL_OPERATION and (not os.path.exists(gist_path) or incomplete_clone)
     ):
-        pass
-    else:
-        commands = {
-            CLONE_OPERATION: ["git", "clone", gist.html_url, gist_path],
-            PULL_OPERATION: ["git", "-C", gist_path, "pull", "--rebase"],
-        }
-        git_command = commands[operation]
-
-        try:
-            subprocess.check_output(  # nosec
-                git_command,
-                stderr=subprocess.STDOUT,
-                text=True,
-                timeout=github_archive.timeout,
-            )
-            logger.info(f"Gist: {full_gist_id} {operation} success!")
-        except subprocess.TimeoutExpired:
-            logger.error(f"Git operation timed out archiving {gist.id}.")
-            failed_gist = full_gist_id
-        except subprocess.CalledProcessError as error:
-            logger.error(f"Failed to {operation} {gist.id}\n{error.output}")
-            failed_gist = full_gist_id
-
-    return failed_gist
+        return None
+    elif (
+        operation == PULL_OPERATION
+        and not github_archive.force_pull
+        # Deepening a shallow clone fetches history even if nothing was pushed since the last sync
+        and not (github_archive.deepen and is_shallow_clone(gist_path))
+        and github_archive.state.is_unchanged(state_key, gist.updated_at)
+    ):
+        logger.debug(f"Gist: {full_gist_id} pull skipped, unchanged since the last sync.")
+        github_archive.metrics.record_skipped(gist_path)
+        github_archive.report.record_skipped(gist_path, operation)
+        return None
+
+    return GitJob(
+        asset_type="Gist",
+        full_name=full_gist_id,
+        name=gist.id,
+        operation=operation,
+        url=gist.html_url,
+        path=gist_path,
+        command=build_git_command(github_archive, operation, gist.html_url, gist_path),
+        timeout=timeout or get_git_timeout(github_archive, operation, state_key),
+        size=None,
+        resume=operation == CLONE_OPERATION and (github_archive.resumable_clones or incomplete_clone),
+        state_key=state_key,
+        updated_at=gist.updated_at,
+    )
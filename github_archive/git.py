@@ -0,0 +1,769 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import glob
+import os
+import random
+import re
+import shutil
+import signal
+import stat
+import subprocess  # nosec
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    CLONE_OPERATION,
+    HISTORICAL_TIMEOUT_FACTOR,
+    INCOMPLETE_CLONE_MARKER,
+    LOGGER_NAME,
+    MAX_RETRY_BACKOFF,
+    MAX_SCALED_TIMEOUT,
+    MIN_SCALED_TIMEOUT,
+    MIRROR_SUFFIX,
+    PERMANENT_GIT_ERRORS,
+    SCALED_TIMEOUT_THROUGHPUT,
+    STREAM_OUTPUT_CHUNKS,
+    TIMED_OUT_GROWTH_FACTOR,
+)
+
+PROGRESS_FLAG = "--progress"
+# How long to wait for the output of a command that exited (or was killed) to be read
+STREAM_JOIN_TIMEOUT = 5
+STREAM_READ_SIZE = 65536
+SNAPSHOT_STAGE = "snapshot"
+HISTORY_STAGE = "history"
+CHECKOUT_STAGE = "checkout"
+
+
+class GitStalledError(subprocess.TimeoutExpired):
+    """Raised when a git command is killed after reporting no progress for too long."""
+
+    def __str__(self):
+        return f"Command '{self.cmd}' stalled, no progress was reported for {self.timeout} seconds"
+
+
+class GitJob:
+    """A git operation an asset needs, along with what is needed to record its outcome.
+
+    The archive function of each type of asset decides whether an operation needs to run and builds its job, jobs
+    are then run the same way for every type of asset by either engine.
+    """
+
+    __slots__ = (
+        "asset_type",
+        "full_name",
+        "name",
+        "operation",
+        "url",
+        "path",
+        "command",
+        "timeout",
+        "size",
+        "resume",
+        "state_key",
+        "updated_at",
+    )
+
+    def __init__(
+        self,
+        asset_type: str,
+        full_name: str,
+        name: str,
+        operation: str,
+        url: str,
+        path: str,
+        command: List[str],
+        timeout: int,
+        size: Optional[int],
+        resume: bool,
+        state_key: str,
+        updated_at: Any,
+    ):
+        self.asset_type = asset_type
+        self.full_name = full_name
+        self.name = name
+        self.operation = operation
+        self.url = url
+        self.path = path
+        self.command = command
+        self.timeout = timeout
+        self.size = size
+        self.resume = resume
+        self.state_key = state_key
+        self.updated_at = updated_at
+
+
+def get_asset_dir_name(github_archive: GithubArchive, name: str) -> str:
+    """Returns the name of the directory a git asset is archived to, mirrors are bare repos and get a `.git` suffix."""
+    return f"{name}{MIRROR_SUFFIX}" if github_archive.mirror else name
+
+
+def build_git_command(
+    github_archive: GithubArchive,
+    operation: str,
+    url: str,
+    path: str,
+    size: Optional[int] = None,
+) -> List[str]:
+    """Build the git command used to clone or pull a git asset.
+
+    In mirror mode we keep bare mirror clones without a working tree and update every ref (pruning deleted ones)
+    instead of rebasing a checked out branch.
+
+    Shallow (`--depth`) and partial (`--filter`) clone strategies are only applied to assets at least
+    `strategy_threshold` KB in size (the size reported by the GitHub API) and a pull can deepen the history of a
+    shallow clone by `--deepen` commits at a time.
+
+    With stall detection or progress reports, commands that can report their progress are asked to.
+    """
+    if operation == CLONE_OPERATION:
+        command = ["git", "clone", *_get_progress_flag(github_archive)]
+        if github_archive.mirror:
+            command.append("--mirror")
+        if _use_clone_strategy(github_archive, size):
+            if github_archive.depth:
+                command.extend(["--depth", str(github_archive.depth)])
+            if github_archive.clone_filter:
+                command.append(f"--filter={github_archive.clone_filter}")
+        command.extend([url, path])
+    else:
+        if github_archive.mirror and github_archive.deepen:
+            command = ["git", "-C", path, "fetch", "--prune", *_get_progress_flag(github_archive)]
+        elif github_archive.mirror:
+            # `git remote update` can't report its progress
+            command = ["git", "-C", path, "remote", "update", "--prune"]
+        else:
+            command = ["git", "-C", path, "pull", "--rebase", *_get_progress_flag(github_archive)]
+        if github_archive.deepen:
+            command.extend(["--deepen", str(github_archive.deepen)])
+
+    return command
+
+
+def _use_clone_strategy(github_archive: GithubArchive, size: Optional[int]) -> bool:
+    """Returns True if a shallow or partial clone strategy applies to an asset of the given size (in KB).
+
+    Assets without a known size (such as gists) only use a strategy when there is no size threshold.
+    """
+    if not github_archive.strategy_threshold:
+        return True
+
+    return isinstance(size, int) and size >= github_archive.strategy_threshold
+
+
+def is_giant_asset(github_archive: GithubArchive, size: Optional[int]) -> bool:
+    """Returns True if an asset runs in the giant repo lane, whose concurrency the controller doesn't manage."""
+    return bool(github_archive.giant_threshold) and isinstance(size, int) and size >= github_archive.giant_threshold
+
+
+def run_git_job(github_archive: GithubArchive, job: GitJob) -> Optional[str]:
+    """Run the git operation of an asset and record its outcome.
+
+    We return the full name of the asset if its git operation fails, otherwise return None.
+    """
+    start_time = time.monotonic()
+    error = None
+
+    try:
+        if job.resume:
+            resume_clone(github_archive, job.url, job.path, job.name, timeout=job.timeout, size=job.size)
+        else:
+            run_git_command(
+                github_archive,
+                job.command,
+                job.name,
+                timeout=job.timeout,
+                clone_path=job.path if job.operation == CLONE_OPERATION else None,
+            )
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as git_error:
+        error = git_error
+
+    return _finish_git_job(github_archive, job, time.monotonic() - start_time, error)
+
+
+async def run_git_job_async(github_archive: GithubArchive, job: GitJob) -> Optional[str]:
+    """The asyncio counterpart of `run_git_job`, the git command runs as a subprocess of the event loop.
+
+    Resumable clones run a series of git commands that depend on each other's results and still run on a thread.
+    """
+    if job.resume:
+        return await asyncio.to_thread(run_git_job, github_archive, job)
+
+    start_time = time.monotonic()
+    error = None
+
+    try:
+        await run_git_command_async(
+            github_archive,
+            job.command,
+            job.name,
+            timeout=job.timeout,
+            clone_path=job.path if job.operation == CLONE_OPERATION else None,
+        )
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as git_error:
+        error = git_error
+
+    return _finish_git_job(github_archive, job, time.monotonic() - start_time, error)
+
+
+def _finish_git_job(
+    github_archive: GithubArchive,
+    job: GitJob,
+    duration: float,
+    error: Optional[Union[subprocess.TimeoutExpired, subprocess.CalledProcessError]],
+) -> Optional[str]:
+    logger = woodchips.get(LOGGER_NAME)
+
+    if isinstance(error, subprocess.TimeoutExpired):
+        logger.error(f"Git operation timed out archiving {job.name}.")
+        if not isinstance(error, GitStalledError):
+            # The next attempt gets longer, a stall says nothing about how much time the operation needs
+            github_archive.state.record_timeout(job.state_key, job.operation, job.timeout)
+    elif error:
+        logger.error(f"Failed to {job.operation} {job.name}\n{error.output}")
+    else:
+        logger.info(f"{job.asset_type}: {job.full_name} {job.operation} success!")
+        github_archive.state.record_duration(job.state_key, job.operation, duration)
+        github_archive.state.record(job.state_key, job.updated_at)
+
+    # Only operations that ran git are sampled, a skipped one would pass for an instant success
+    if github_archive.controller and not is_giant_asset(github_archive, job.size):
+        github_archive.controller.record(failed=error is not None)
+    github_archive.metrics.record_git_operation(job.path, job.operation, duration, failed=error is not None)
+    github_archive.report.record(job.path, job.operation, duration, type(error).__name__ if error else None)
+
+    return job.full_name if error else None
+
+
+def _get_progress_flag(github_archive: GithubArchive) -> List[str]:
+    """Git only reports its progress to a terminal unless asked to."""
+    return [PROGRESS_FLAG] if github_archive.tracks_git_progress else []
+
+
+def get_git_timeout(
+    github_archive: GithubArchive,
+    operation: str,
+    state_key: str,
+    size: Optional[int] = None,
+) -> int:
+    """Returns the number of seconds a git operation of an asset may run for.
+
+    With scaled timeouts, the timeout is a multiple of how long the operation took the last time it succeeded and
+    at least the time needed to receive the size of the asset (in KB, as reported by the GitHub API) at a slow
+    transfer rate. An operation that ran out of time gets twice as long as it was given on its next attempt. Assets
+    with none of these use the timeout of the run.
+    """
+    if not github_archive.scaled_timeouts:
+        return github_archive.timeout
+
+    estimates = []
+    duration = github_archive.state.get_duration(state_key, operation)
+    if duration is not None:
+        estimates.append(duration * HISTORICAL_TIMEOUT_FACTOR)
+    if isinstance(size, int):
+        estimates.append(size / SCALED_TIMEOUT_THROUGHPUT)
+    timed_out_after = github_archive.state.get_timeout(state_key, operation)
+    if timed_out_after is not None:
+        estimates.append(timed_out_after * TIMED_OUT_GROWTH_FACTOR)
+    if not estimates:
+        return github_archive.timeout
+
+    return int(min(max(*estimates, MIN_SCALED_TIMEOUT), MAX_SCALED_TIMEOUT))
+
+
+def run_git_command(
+    github_archive: GithubArchive,
+    command: List[str],
+    name: str,
+    timeout: int,
+    clone_path: Optional[str] = None,
+) -> str:
+    """Run a git command, retrying it with exponential backoff (and jitter) when it fails with a transient error.
+
+    A clone killed by its timeout leaves a partial directory behind, when `clone_path` is passed it is removed
+    before the clone is retried. The error of the last attempt is raised if every attempt fails or if the error is
+    permanent.
+
+    We return the output of the command.
+    """
+    command = _add_http_config(github_archive, command)
+    env = _get_env(github_archive)
+    # Commands only get an environment of their own when sharing SSH connections
+    env_kwargs: Dict[str, Any] = {"env": env} if env else {}
+    for attempt in range(github_archive.retries + 1):
+        try:
+            if PROGRESS_FLAG in command:
+                return _run_tracked(github_archive, command, name, timeout, env)
+
+            return subprocess.check_output(  # nosec
+                command,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=timeout,
+                **env_kwargs,
+            )
+        except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as error:
+            if attempt == github_archive.retries or not is_transient_git_error(error):
+                raise
+
+            delay = get_retry_delay(github_archive.retry_backoff, attempt)
+            _log_retry(github_archive, error, name, attempt, delay)
+            if clone_path and os.path.exists(clone_path):
+                remove_dir(clone_path)
+            time.sleep(delay)
+
+    return ""  # pragma: no cover, the last attempt either returns or raises
+
+
+async def run_git_command_async(
+    github_archive: GithubArchive,
+    command: List[str],
+    name: str,
+    timeout: int,
+    clone_path: Optional[str] = None,
+) -> str:
+    """The asyncio counterpart of `run_git_command`, the command runs as a subprocess of the event loop instead of
+    blocking a thread. Cancelling the task kills the command.
+
+    We return the output of the command.
+    """
+    command = _add_http_config(github_archive, command)
+    env = _get_env(github_archive)
+    for attempt in range(github_archive.retries + 1):
+        try:
+            return await _run_tracked_async(github_archive, command, name, timeout, env)
+        except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as error:
+            if attempt == github_archive.retries or not is_transient_git_error(error):
+                raise
+
+            delay = get_retry_delay(github_archive.retry_backoff, attempt)
+            _log_retry(github_archive, error, name, attempt, delay)
+            if clone_path and os.path.exists(clone_path):
+                await asyncio.to_thread(remove_dir, clone_path)
+            await asyncio.sleep(delay)
+
+    return ""  # pragma: no cover, the last attempt either returns or raises
+
+
+def _add_http_config(github_archive: GithubArchive, command: List[str]) -> List[str]:
+    """Pass the HTTPS transport settings of the run to a git command, `-c` must come before its subcommand."""
+    if not github_archive.http_config:
+        return command
+
+    return [command[0], *(flag for setting in github_archive.http_config for flag in ("-c", setting)), *command[1:]]
+
+
+def _get_env(github_archive: GithubArchive) -> Optional[Dict[str, str]]:
+    """Returns the environment of a git command, which only differs from ours to share SSH connections."""
+    return github_archive.ssh_pool.get_env() if github_archive.ssh_pool else None
+
+
+def _log_retry(
+    github_archive: GithubArchive,
+    error: Union[subprocess.TimeoutExpired, subprocess.CalledProcessError],
+    name: str,
+    attempt: int,
+    delay: float,
+):
+    logger = woodchips.get(LOGGER_NAME)
+
+    if isinstance(error, GitStalledError):
+        reason = "stalled"
+    elif isinstance(error, subprocess.TimeoutExpired):
+        reason = "timed out"
+    else:
+        reason = "failed"
+    logger.warning(
+        f"Git operation {reason} archiving {name}, retrying in {delay:.1f}s ({attempt + 1}/{github_archive.retries})..."
+    )
+
+
+def _run_tracked(
+    github_archive: GithubArchive,
+    command: List[str],
+    name: str,
+    timeout: int,
+    env: Optional[Dict[str, str]] = None,
+) -> str:
+    """Stream a git command that reports its progress, feeding the progress to the tracker of the run if any."""
+    tracker = github_archive.progress_tracker
+    if not tracker:
+        return _run_streaming(command, timeout, github_archive.stall_timeout, env=env)
+
+    command_id = tracker.command_started(name)
+    try:
+        return _run_streaming(
+            command,
+            timeout,
+            github_archive.stall_timeout,
+            on_output=functools.partial(tracker.update, command_id),
+            env=env,
+        )
+    finally:
+        tracker.command_finished(command_id)
+
+
+def _run_streaming(
+    command: List[str],
+    timeout: int,
+    stall_timeout: int = 0,
+    on_output: Optional[Callable[[str], None]] = None,
+    env: Optional[Dict[str, str]] = None,
+) -> str:
+    """Run a git command, streaming its output line by line (progress lines end in a carriage return) as it runs.
+
+    The command is killed once it runs out of time or, with a `stall_timeout`, when it stops reporting progress for
+    that many seconds (eg: a connection that hangs without being dropped).
+
+    Only the tail of the output is kept, progress reports of a long clone add up.
+    """
+    # The command leads a process group of its own so its helpers (eg: ssh) are killed along with it
+    process = subprocess.Popen(  # nosec
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        start_new_session=True,
+    )
+    output: Deque[bytes] = collections.deque(maxlen=STREAM_OUTPUT_CHUNKS)
+    last_output = time.monotonic()
+
+    def read_output():
+        nonlocal last_output
+        partial_line = b""
+        for chunk in iter(lambda: process.stdout.read1(), b""):  # type: ignore[union-attr]
+            output.append(chunk)
+            last_output = time.monotonic()
+            if on_output:
+                *lines, partial_line = re.split(rb"[\r\n]", partial_line + chunk)
+                for line in lines:
+                    on_output(line.decode(errors="replace"))
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    deadline = time.monotonic() + timeout
+
+    while True:
+        now = time.monotonic()
+        stalled = bool(stall_timeout) and now - last_output >= stall_timeout
+        if now >= deadline or stalled:
+            _kill_process_group(process)
+            process.wait()
+            # A helper that escaped the kill may still hold the output open, we don't wait for it
+            reader.join(STREAM_JOIN_TIMEOUT)
+            if stalled:
+                raise GitStalledError(command, stall_timeout, output=_decode(output))
+            raise subprocess.TimeoutExpired(command, timeout, output=_decode(output))
+
+        # Wake up when the command exits, runs out of time or would stall, whichever comes first
+        check_at = min(deadline, last_output + stall_timeout) if stall_timeout else deadline
+        try:
+            process.wait(timeout=max(check_at - now, 0))
+            break
+        except subprocess.TimeoutExpired:
+            pass
+
+    reader.join(STREAM_JOIN_TIMEOUT)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, output=_decode(output))
+
+    return _decode(output)
+
+
+def _kill_process_group(process: Union[subprocess.Popen, asyncio.subprocess.Process]):
+    """Kill a command along with every process it started, those would otherwise keep its output open."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()  # pragma: no cover, Windows has no process groups
+    except ProcessLookupError:
+        pass
+
+
+async def _run_tracked_async(
+    github_archive: GithubArchive,
+    command: List[str],
+    name: str,
+    timeout: int,
+    env: Optional[Dict[str, str]] = None,
+) -> str:
+    """The asyncio counterpart of `_run_tracked`, commands that don't report their progress can't stall."""
+    tracker = github_archive.progress_tracker
+    if PROGRESS_FLAG not in command:
+        return await _run_streaming_async(command, timeout, env=env)
+    if not tracker:
+        return await _run_streaming_async(command, timeout, github_archive.stall_timeout, env=env)
+
+    command_id = tracker.command_started(name)
+    try:
+        return await _run_streaming_async(
+            command,
+            timeout,
+            github_archive.stall_timeout,
+            on_output=functools.partial(tracker.update, command_id),
+            env=env,
+        )
+    finally:
+        tracker.command_finished(command_id)
+
+
+async def _run_streaming_async(
+    command: List[str],
+    timeout: int,
+    stall_timeout: int = 0,
+    on_output: Optional[Callable[[str], None]] = None,
+    env: Optional[Dict[str, str]] = None,
+) -> str:
+    """The asyncio counterpart of `_run_streaming`, output is read as it arrives instead of on a reader thread.
+
+    The command is killed when it runs out of time, stalls or the task running it is cancelled.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+        start_new_session=True,
+    )  # nosec
+    output: Deque[bytes] = collections.deque(maxlen=STREAM_OUTPUT_CHUNKS)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    partial_line = b""
+
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            stalling = bool(stall_timeout) and stall_timeout < remaining
+            try:
+                chunk = await asyncio.wait_for(
+                    process.stdout.read(STREAM_READ_SIZE),  # type: ignore[union-attr]
+                    stall_timeout if stalling else max(remaining, 0),
+                )
+            except asyncio.TimeoutError:
+                if stalling:
+                    raise GitStalledError(command, stall_timeout, output=_decode(output))
+                raise subprocess.TimeoutExpired(command, timeout, output=_decode(output))
+            if not chunk:
+                break
+            output.append(chunk)
+            if on_output:
+                *lines, partial_line = re.split(rb"[\r\n]", partial_line + chunk)
+                for line in lines:
+                    on_output(line.decode(errors="replace"))
+
+        try:
+            returncode = await asyncio.wait_for(process.wait(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(command, timeout, output=_decode(output))
+    finally:
+        if process.returncode is None:
+            _kill_process_group(process)
+            await process.wait()
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command, output=_decode(output))
+
+    return _decode(output)
+
+
+def _decode(output: Iterable[bytes]) -> str:
+    return b"".join(output).decode(errors="replace")
+
+
+def resume_clone(
+    github_archive: GithubArchive,
+    url: str,
+    path: str,
+    name: str,
+    timeout: int,
+    size: Optional[int] = None,
+):
+    """Clone a git asset in stages that each survive the clone being interrupted, resuming a partial clone.
+
+    Instead of `git clone`, which deletes everything it received when it fails, we init the repo and fetch into it.
+    Git can't resume a packfile that was cut short, so unless a `--depth` is used, a snapshot of the latest commits
+    is fetched first and the rest of the history afterwards. A clone that times out while fetching its history
+    keeps its snapshot and the next attempt only fetches the history.
+
+    The stage to run next is kept in a marker file in the git directory until the clone is complete. A partial
+    clone git no longer recognizes as a repo is corrupt and is cloned again from scratch.
+    """
+    logger = woodchips.get(LOGGER_NAME)
+    git_dir = path if github_archive.mirror else os.path.join(path, ".git")
+    marker_path = os.path.join(git_dir, INCOMPLETE_CLONE_MARKER)
+
+    # git init completes a git directory it was cut short creating, one it set up but no longer recognizes is corrupt
+    if is_incomplete_clone(path) and os.path.exists(os.path.join(git_dir, "HEAD")) and not _is_git_repo(git_dir):
+        logger.warning(f"Partial clone of {name} is corrupt, cloning it again from scratch...")
+        remove_dir(path)
+
+    if os.path.isfile(marker_path):
+        with open(marker_path) as marker_file:
+            stage = marker_file.read().strip() or SNAPSHOT_STAGE
+        logger.info(f"Resuming the partial clone of {name} ({stage} stage)...")
+        _remove_stale_files(git_dir)
+    else:
+        # The marker is written before anything else so a clone interrupted at any point is known to be partial
+        os.makedirs(git_dir, exist_ok=True)
+        stage = SNAPSHOT_STAGE
+        _write_clone_stage(marker_path, stage)
+
+    init_command = ["git", "init", "--quiet"]
+    if github_archive.mirror:
+        init_command.append("--bare")
+    run_git_command(github_archive, [*init_command, path], name, timeout)
+    # Configuring the remote is idempotent, it is done on every attempt in case the last one was cut short
+    for key, value in _get_remote_config(github_archive, url, size):
+        run_git_command(github_archive, ["git", "-C", path, "config", key, value], name, timeout)
+
+    remote_head = run_git_command(
+        github_archive, ["git", "-C", path, "ls-remote", "--symref", "origin", "HEAD"], name, timeout
+    )
+    # eg: `ref: refs/heads/main\tHEAD`, empty repos don't have a HEAD and have nothing to fetch or check out
+    branch = remote_head.split("\t", 1)[0][len("ref: refs/heads/") :] if remote_head.startswith("ref: ") else None
+    fetch_command = ["git", "-C", path, "fetch", *_get_progress_flag(github_archive), "origin"]
+
+    if branch and stage == SNAPSHOT_STAGE:
+        shallow = bool(github_archive.depth and _use_clone_strategy(github_archive, size))
+        depth = github_archive.depth if shallow else 1
+        run_git_command(github_archive, [*fetch_command, "--depth", str(depth)], name, timeout)
+        # A shallow clone was asked for, there is no more history to fetch after it
+        stage = CHECKOUT_STAGE if shallow else HISTORY_STAGE
+        _write_clone_stage(marker_path, stage)
+
+    if branch and stage == HISTORY_STAGE:
+        if os.path.exists(os.path.join(git_dir, "shallow")):
+            run_git_command(github_archive, [*fetch_command, "--unshallow"], name, timeout)
+        stage = CHECKOUT_STAGE
+        _write_clone_stage(marker_path, stage)
+
+    if branch and github_archive.mirror:
+        run_git_command(
+            github_archive, ["git", "-C", path, "symbolic-ref", "HEAD", f"refs/heads/{branch}"], name, timeout
+        )
+    elif branch:
+        run_git_command(github_archive, ["git", "-C", path, "remote", "set-head", "origin", branch], name, timeout)
+        run_git_command(
+            github_archive,
+            ["git", "-C", path, "checkout", "--quiet", "-B", branch, "--track", f"origin/{branch}"],
+            name,
+            timeout,
+        )
+
+    os.remove(marker_path)
+
+
+def is_incomplete_clone(path: str) -> bool:
+    """Returns True if a git asset was only partially cloned by `resume_clone`."""
+    return os.path.isfile(os.path.join(path, ".git", INCOMPLETE_CLONE_MARKER)) or os.path.isfile(
+        os.path.join(path, INCOMPLETE_CLONE_MARKER)
+    )
+
+
+def is_shallow_clone(path: str) -> bool:
+    """Returns True if a git asset only holds part of its history, ie: a pull could still deepen it."""
+    return os.path.isfile(os.path.join(path, ".git", "shallow")) or os.path.isfile(os.path.join(path, "shallow"))
+
+
+def _get_remote_config(github_archive: GithubArchive, url: str, size: Optional[int]) -> List[Tuple[str, str]]:
+    """The config `git clone` would have set up for the remote of a git asset."""
+    config = [("remote.origin.url", url)]
+    if github_archive.mirror:
+        config.extend([("remote.origin.fetch", "+refs/*:refs/*"), ("remote.origin.mirror", "true")])
+    else:
+        config.append(("remote.origin.fetch", "+refs/heads/*:refs/remotes/origin/*"))
+    if github_archive.clone_filter and _use_clone_strategy(github_archive, size):
+        config.extend(
+            [("remote.origin.promisor", "true"), ("remote.origin.partialclonefilter", github_archive.clone_filter)]
+        )
+
+    return config
+
+
+def _is_git_repo(git_dir: str) -> bool:
+    """Returns True if git recognizes a directory as a git directory (without looking at its parents)."""
+    try:
+        subprocess.check_output(  # nosec
+            ["git", f"--git-dir={git_dir}", "rev-parse", "--git-dir"],
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+def _remove_stale_files(git_dir: str):
+    """A git command killed by a timeout leaves its lock files behind (which would fail every command after it)
+    along with the packfile it was receiving, which git can't use.
+    """
+    stale_files = glob.glob(os.path.join(git_dir, "*.lock")) + glob.glob(
+        os.path.join(git_dir, "objects", "pack", "tmp_pack_*")
+    )
+    for stale_file in stale_files:
+        os.remove(stale_file)
+
+
+def _write_clone_stage(marker_path: str, stage: str):
+    with open(marker_path, "w") as marker_file:
+        marker_file.write(stage)
+
+
+def is_transient_git_error(error: Union[subprocess.TimeoutExpired, subprocess.CalledProcessError]) -> bool:
+    """Returns True if a failed git operation may succeed when retried.
+
+    Timeouts and unrecognized errors (eg: dropped connections or server errors) are transient while errors that
+    retrying won't fix (eg: a deleted repo, denied access or a merge conflict) are permanent.
+    """
+    if isinstance(error, subprocess.TimeoutExpired):
+        return True
+
+    output = str(error.output or "").lower()
+
+    return not any(message in output for message in PERMANENT_GIT_ERRORS)
+
+
+def get_retry_delay(backoff: float, attempt: int) -> float:
+    """Returns the number of seconds to wait before a retry, doubling on each attempt.
+
+    Half of the delay is random so that operations which failed together (eg: during a network blip) don't all
+    retry at the same time.
+    """
+    delay = min(backoff * 2**attempt, MAX_RETRY_BACKOFF)
+
+    return delay / 2 + random.uniform(0, delay / 2)  # nosec
+
+
+def remove_dir(path: str):
+    """Remove a directory along with its contents."""
+
+    def make_dir_writable(function, path, _):
+        """The `.git` folder on Windows cannot be gracefully removed due to being read-only,
+        so we make the directory writable on a failure and retry the original function.
+        """
+        os.chmod(path, stat.S_IWRITE)
+        function(path)
+
+    shutil.rmtree(path, onerror=make_dir_writable)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    Optional,
+    Union,
+)
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    GIST_CONTEXT,
+    GRAPHQL_PAGE_SIZE,
+    ORG_CONTEXT,
+    PERSONAL_CONTEXT,
+    STAR_CONTEXT,
+    USER_CONTEXT,
+)
+from github_archive.records import (
+    GistRecord,
+    OwnerRecord,
+    RepoRecord,
+)
+
+REPO_FIELDS = (
+    "name nameWithOwner owner { login } isFork isArchived primaryLanguage { name } url sshUrl pushedAt diskUsage"
+)
+GIST_FIELDS = "name owner { login } url updatedAt"
+
+# The owner field, connection field, extra connection arguments and node fields to query for each context
+CONNECTIONS = {
+    GIST_CONTEXT: ("user", "gists", "", GIST_FIELDS),
+    ORG_CONTEXT: ("repositoryOwner", "repositories", ", ownerAffiliations: OWNER", REPO_FIELDS),
+    PERSONAL_CONTEXT: ("viewer", "repositories", ", ownerAffiliations: OWNER", REPO_FIELDS),
+    STAR_CONTEXT: ("user", "starredRepositories", "", REPO_FIELDS),
+    USER_CONTEXT: ("repositoryOwner", "repositories", ", ownerAffiliations: OWNER", REPO_FIELDS),
+}
+
+
+def iterate_graphql_git_assets(
+    github_archive: GithubArchive,
+    context: str,
+    owner: str,
+) -> Iterator[Union[RepoRecord, GistRecord]]:
+    """Lazily retrieve the git assets of a single owner via the GraphQL API, page by page.
+
+    Each page only carries the fields we filter and archive on, which makes for far smaller responses than
+    the full objects of the REST API and saves the extra request REST needs to look up each owner.
+    """
+    owner_field, connection_field, _, _ = CONNECTIONS[context]
+    query = build_query(context)
+    variables: Dict[str, Any] = {"cursor": None}
+    if context != PERSONAL_CONTEXT:
+        variables["login"] = owner
+
+    while True:
+        _, data = github_archive.github_instance.requester.graphql_query(query, variables)
+        owner_data = data["data"][owner_field]
+        if owner_data is None:
+            raise ValueError(f"{owner} could not be found")
+
+        connection = owner_data[connection_field]
+        for node in connection["nodes"]:
+            yield _build_gist_record(node) if context == GIST_CONTEXT else _build_repo_record(node)
+
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        variables["cursor"] = connection["pageInfo"]["endCursor"]
+
+
+def build_query(context: str) -> str:
+    """Build the query listing one page of the git assets of an owner for a context."""
+    owner_field, connection_field, connection_arguments, fields = CONNECTIONS[context]
+
+    if context == PERSONAL_CONTEXT:
+        # The authenticated user is implied by the token
+        variable_definitions = "$cursor: String"
+        owner_arguments = ""
+    else:
+        variable_definitions = "$login: String!, $cursor: String"
+        owner_arguments = "(login: $login)"
+
+    return (
+        f"query({variable_definitions}) {{ {owner_field}{owner_arguments} {{"
+        f" {connection_field}(first: {GRAPHQL_PAGE_SIZE}, after: $cursor{connection_arguments}) {{"
+        f" pageInfo {{ hasNextPage endCursor }} nodes {{ {fields} }} }} }} }}"
+    )
+
+
+def _build_repo_record(node: Dict[str, Any]) -> RepoRecord:
+    return RepoRecord(
+        name=node["name"],
+        full_name=node["nameWithOwner"],
+        owner=OwnerRecord(node["owner"]["login"]),
+        fork=node["isFork"],
+        archived=node["isArchived"],
+        language=node["primaryLanguage"]["name"] if node.get("primaryLanguage") else None,
+        html_url=node["url"],
+        ssh_url=node["sshUrl"],
+        pushed_at=_parse_timestamp(node.get("pushedAt")),
+        size=node.get("diskUsage"),
+    )
+
+
+def _build_gist_record(node: Dict[str, Any]) -> GistRecord:
+    return GistRecord(
+        id=node["name"],
+        owner=OwnerRecord(node["owner"]["login"]),
+        html_url=node["url"],
+        updated_at=_parse_timestamp(node.get("updatedAt")),
+    )
+
+
+def _parse_timestamp(timestamp: Optional[str]) -> Optional[datetime]:
+    """GraphQL timestamps are ISO 8601 in UTC (eg: `2023-01-01T00:00:00Z`)."""
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")) if timestamp else None
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    IO,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+import woodchips
+
+from github_archive.constants import (
+    CLONE_OPERATION,
+    JOURNAL_FAILED,
+    JOURNAL_FINISHED,
+    JOURNAL_STARTED,
+    JOURNAL_SUCCEEDED,
+    LOGGER_NAME,
+)
+
+
+class RunJournal:
+    """A write-ahead journal in the root of the archive recording each git asset as it is queued, started,
+    succeeded or failed during a run.
+
+    Every event is a JSON line flushed as soon as it is written so the journal survives the run being killed.
+    A run that completes writes a final `finished` event, a journal without one belongs to an interrupted run
+    that can be resumed. Keys are the path of the asset relative to the archive root (eg: `repos/owner/name`).
+    """
+
+    def __init__(self, location: str):
+        self.path = os.path.join(location, "journal.jsonl")
+        self.file: Optional[IO[str]] = None
+        self.lock = threading.Lock()
+        self.completed: Set[str] = set()
+        self.interrupted_clones: Set[str] = set()
+
+    def open(self, resume: bool, shared: bool = False) -> bool:
+        """Start journaling a run, returns True if an interrupted run is being resumed.
+
+        When resuming, the events of the interrupted run are kept and new ones appended to them, otherwise the
+        journal starts out empty. A shared journal was opened by the parent process of a sharded run and is only
+        ever appended to.
+        """
+        resuming = resume and self._load()
+        self.file = open(self.path, "a" if resuming or shared else "w")
+
+        return resuming
+
+    def record(self, key: str, event: str, operation: Optional[str] = None):
+        """Append an event for an asset to the journal, this is a no-op when no run is being journaled."""
+        entry = {
+            "asset": key,
+            "event": event,
+            "operation": operation,
+            "time": datetime.now(timezone.utc).isoformat(),
+        }
+
+        with self.lock:
+            if self.file:
+                self.file.write(f"{json.dumps(entry)}\n")
+                self.file.flush()
+
+    def is_completed(self, key: str) -> bool:
+        """Returns True if the asset was archived successfully by the interrupted run being resumed."""
+        return key in self.completed
+
+    def get_interrupted_clones(self) -> List[str]:
+        """Returns the assets whose clone was started but never succeeded in the interrupted run, their
+        directories are partial clones that need to be removed before they are cloned again.
+        """
+        return sorted(self.interrupted_clones)
+
+    def finish(self):
+        """Mark the run as complete so that it won't be resumed."""
+        self.record("", JOURNAL_FINISHED)
+        self.close()
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def _load(self) -> bool:
+        """Load the events of the previous run, returns False if there isn't an interrupted run to resume."""
+        logger = woodchips.get(LOGGER_NAME)
+        last_events: Dict[str, Dict[str, Optional[str]]] = {}
+
+        try:
+            with open(self.path) as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line may have been cut short when the run was killed
+                        continue
+
+                    if entry.get("event") == JOURNAL_FINISHED:
+                        return False
+                    last_events[entry["asset"]] = entry
+        except FileNotFoundError:
+            return False
+        except OSError as error:
+            logger.warning(f"Could not read the journal at {self.path}, starting a new run: {error}")
+            return False
+
+        for key, entry in last_events.items():
+            if entry["event"] == JOURNAL_SUCCEEDED:
+                self.completed.add(key)
+            elif entry["event"] in (JOURNAL_STARTED, JOURNAL_FAILED) and entry["operation"] == CLONE_OPERATION:
+                self.interrupted_clones.add(key)
+
+        return True
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    API_DURATION_BUCKETS,
+    CLONE_OPERATION,
+    DEFAULT_METRICS_HOST,
+    GIT_DURATION_BUCKETS,
+    LOGGER_NAME,
+    PULL_OPERATION,
+)
+
+LISTED_RESULT = "listed"
+SKIPPED_RESULT = "skipped"
+FAILED_RESULT = "failed"
+# The result of a git operation that ran successfully
+OPERATION_RESULTS = {CLONE_OPERATION: "cloned", PULL_OPERATION: "pulled"}
+UNKNOWN_CONTEXT = "unknown"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Histogram:
+    """A Prometheus histogram, observations are counted in the first bucket they fit in and summed up on export."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = next((index for index, bucket in enumerate(self.buckets) if value <= bucket), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+
+    def merge(self, other: _Histogram):
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+    def render(self, name: str, labels: Dict[str, str]) -> List[str]:
+        lines = []
+        cumulative_count = 0
+        for bucket, count in zip([*map(_format_value, self.buckets), "+Inf"], self.counts):
+            cumulative_count += count
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bucket})} {cumulative_count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative_count}")
+
+        return lines
+
+
+class RunMetrics:
+    """Collects metrics about a run in the Prometheus text format, to be exported as a node-exporter textfile at the
+    end of the run and/or scraped over HTTP while it runs.
+
+    Metrics cover the git assets of each context (listed, cloned, pulled, skipped and failed), the duration of API
+    requests and git operations, the bytes received from the API and from git and the remaining rate limit budgets.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        self.github_archive = github_archive
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.asset_counts: Dict[Tuple[str, str], int] = {}
+        self.asset_contexts: Dict[str, str] = {}
+        self.git_durations: Dict[str, _Histogram] = {}
+        self.api_durations: Dict[str, _Histogram] = {}
+        self.api_received_bytes = 0
+        # Bytes received by git in the shards of a sharded run, which have progress trackers of their own
+        self.shard_git_received_bytes = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def register_asset(self, asset_path: str, context: str):
+        """Remember the context of an asset so the outcome of its git operations can be counted against it."""
+        with self.lock:
+            self.asset_contexts[asset_path] = context
+
+    def get_context(self, asset_path: str) -> str:
+        with self.lock:
+            return self.asset_contexts.get(asset_path, UNKNOWN_CONTEXT)
+
+    def record_listed(self, context: str):
+        self._count(context, LISTED_RESULT)
+
+    def record_git_operation(self, asset_path: str, operation: str, duration: float, failed: bool):
+        context = self.get_context(asset_path)
+        with self.lock:
+            self.git_durations.setdefault(operation, _Histogram(GIT_DURATION_BUCKETS)).observe(duration)
+
+        self._count(context, FAILED_RESULT if failed else OPERATION_RESULTS.get(operation, operation))
+
+    def record_skipped(self, asset_path: str):
+        """Record an asset that was left alone, it hadn't changed since the last sync or was already archived."""
+        self._count(self.get_context(asset_path), SKIPPED_RESULT)
+
+    def record_api_request(self, resource: str, duration: float, received_bytes: int):
+        with self.lock:
+            self.api_durations.setdefault(resource, _Histogram(API_DURATION_BUCKETS)).observe(duration)
+            self.api_received_bytes += received_bytes
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Returns what was measured by this process, for a shard to hand it back to the parent process."""
+        tracker = self.github_archive.progress_tracker
+
+        with self.lock:
+            return {
+                "asset_counts": dict(self.asset_counts),
+                "git_durations": dict(self.git_durations),
+                "api_durations": dict(self.api_durations),
+                "api_received_bytes": self.api_received_bytes,
+                "git_received_bytes": tracker.get_received()[1] if tracker else 0,
+            }
+
+    def merge(self, snapshot: Dict[str, Any]):
+        """Add what a shard measured to the metrics of the run."""
+        with self.lock:
+            for key, count in snapshot["asset_counts"].items():
+                self.asset_counts[key] = self.asset_counts.get(key, 0) + count
+            for histograms, shard_histograms, buckets in (
+                (self.git_durations, snapshot["git_durations"], GIT_DURATION_BUCKETS),
+                (self.api_durations, snapshot["api_durations"], API_DURATION_BUCKETS),
+            ):
+                for label, histogram in shard_histograms.items():
+                    histograms.setdefault(label, _Histogram(buckets)).merge(histogram)
+            self.api_received_bytes += snapshot["api_received_bytes"]
+            self.shard_git_received_bytes += snapshot["git_received_bytes"]
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        tracker = self.github_archive.progress_tracker
+        git_received_bytes = (tracker.get_received()[1] if tracker else 0) + self.shard_git_received_bytes
+
+        with self.lock:
+            _add_metric(
+                lines,
+                "github_archive_assets_total",
+                "counter",
+                "Git assets by context and result (listed, cloned, pulled, skipped, failed).",
+                [
+                    ({"context": context, "result": result}, count)
+                    for (context, result), count in sorted(self.asset_counts.items())
+                ],
+            )
+            _add_histograms(
+                lines,
+                "github_archive_git_operation_duration_seconds",
+                "Duration of the git operations that ran.",
+                "operation",
+                self.git_durations,
+            )
+            _add_histograms(
+                lines,
+                "github_archive_api_request_duration_seconds",
+                "Duration of GitHub API requests by rate limit resource.",
+                "resource",
+                self.api_durations,
+            )
+            _add_metric(
+                lines,
+                "github_archive_received_bytes_total",
+                "counter",
+                "Bytes received from the GitHub API and by git (when git reports its progress).",
+                [({"source": "api"}, self.api_received_bytes), ({"source": "git"}, git_received_bytes)],
+            )
+
+        budgets = self.github_archive.token_pool.get_budgets()
+        _add_metric(
+            lines,
+            "github_archive_rate_limit_remaining",
+            "gauge",
+            "Remaining GitHub API rate limit of each token by resource.",
+            [({"token": budget["token"], "resource": budget["resource"]}, budget["remaining"]) for budget in budgets],
+        )
+        _add_metric(
+            lines,
+            "github_archive_rate_limit_reset_timestamp_seconds",
+            "gauge",
+            "When the GitHub API rate limit of each token resets by resource.",
+            [({"token": budget["token"], "resource": budget["resource"]}, budget["reset"]) for budget in budgets],
+        )
+        _add_metric(
+            lines,
+            "github_archive_run_start_timestamp_seconds",
+            "gauge",
+            "When the run started.",
+            [({}, self.started_at)],
+        )
+        _add_metric(
+            lines,
+            "github_archive_run_duration_seconds",
+            "gauge",
+            "How long the run took, or has been running for.",
+            [({}, (self.finished_at or time.time()) - self.started_at)],
+        )
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Write the metrics for the node-exporter textfile collector, via a temporary file so it never reads a
+        partially written file.
+        """
+        logger = woodchips.get(LOGGER_NAME)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            with open(temp_path, "w") as metrics_file:
+                metrics_file.write(self.render())
+            os.replace(temp_path, path)
+        except OSError as error:
+            logger.warning(f"Could not write the metrics file at {path}: {error}")
+
+    def serve(self, port: int, host: str = DEFAULT_METRICS_HOST) -> int:
+        """Serve the metrics over HTTP (at any path, eg: `/metrics`) until the server is shut down, returns the
+        port being listened on. Only local clients can connect unless another host (interface) is given.
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self.server.server_address[1]
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _count(self, context: str, result: str):
+        with self.lock:
+            self.asset_counts[(context, result)] = self.asset_counts.get((context, result), 0) + 1
+
+
+def _add_metric(lines: List[str], name: str, metric_type: str, description: str, samples: List[Tuple[Dict, float]]):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        if value is not None:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+
+def _add_histograms(
+    lines: List[str],
+    name: str,
+    description: str,
+    label: str,
+    histograms: Dict[str, _Histogram],
+):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for label_value, histogram in sorted(histograms.items()):
+        lines.extend(histogram.render(name, {label: label_value}))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    escaped_labels = {
+        key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for key, value in labels.items()
+    }
+
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped_labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
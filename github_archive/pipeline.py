@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import (
+    ALL_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+    from github_archive.concurrency import ConcurrencyController  # pragma: no cover
+
+from github_archive.constants import (
+    CLONE_OPERATION,
+    JOURNAL_FAILED,
+    JOURNAL_QUEUED,
+    JOURNAL_STARTED,
+    JOURNAL_SUCCEEDED,
+    LOGGER_NAME,
+    SIZE_SCHEDULE,
+)
+from github_archive.git import is_giant_asset
+
+# How often an operation waiting for the adaptive limiter checks for a free slot with the asyncio engine
+ASYNC_LIMITER_INTERVAL = 0.1
+
+
+class _Lane:
+    """A bounded pool of workers that always picks the highest priority (lowest value) task queued on it next.
+
+    Every submitted task also submits one job to the pool, each job pops whichever task is first in line when a
+    worker frees up so that tasks queued later can still run before tasks queued earlier.
+    """
+
+    def __init__(self, threads: int):
+        self.pool = ThreadPoolExecutor(threads)
+        self.tasks: List[Tuple[int, int, Callable]] = []
+        self.lock = threading.Lock()
+
+    def submit(self, priority: int, sequence: int, task: Callable) -> Future:
+        with self.lock:
+            heapq.heappush(self.tasks, (priority, sequence, task))
+
+        return self.pool.submit(self._run_next)
+
+    def _run_next(self):
+        with self.lock:
+            _, _, task = heapq.heappop(self.tasks)
+
+        return task()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class ArchivePipeline:
+    """A single bounded pool of workers shared by every context (personal, users, orgs, stars, gists) of a run.
+
+    Assets are submitted as soon as their context has been listed so that a slow clone at the end of one
+    context never leaves the rest of the workers idle while the next context waits its turn.
+
+    When scheduling by size, the largest queued asset is always picked up next (longest-processing-time first).
+    Assets at least `giant_threshold` KB in size run in a separate lane with their own workers and timeout so
+    they never hold the workers the rest of the assets need.
+
+    With adaptive concurrency, the lane has `threads` workers but the controller decides how many of them may
+    run a git operation at once.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        self.github_archive = github_archive
+        self.lane = _Lane(github_archive.threads)
+        self.giant_lane = _Lane(github_archive.giant_threads) if github_archive.giant_threshold else None
+        self.sequence = itertools.count()
+        self.futures: List[Future] = []
+
+    def submit(
+        self,
+        context: str,
+        archive_function: Callable[..., Any],
+        operations: List[str],
+        size: Optional[int] = None,
+        asset_path: Optional[str] = None,
+        **kwargs,
+    ) -> Optional[Future]:
+        """Queue every operation for a single git asset, they will be run in order on the same worker.
+
+        The size (in KB, as reported by the GitHub API) is used to schedule the asset, it is unknown for gists.
+        Assets with a path are journaled and those completed by an interrupted run being resumed are skipped.
+        With the asyncio engine, the archive function should be a coroutine function.
+        """
+        journal_key = self._get_journal_key(asset_path)
+        if asset_path:
+            self.github_archive.metrics.register_asset(asset_path, context)
+        if journal_key and self.github_archive.journal.is_completed(journal_key):
+            woodchips.get(LOGGER_NAME).debug(f"{journal_key} skipped, it was archived by the interrupted run.")
+            self.github_archive.metrics.record_skipped(asset_path)
+            self.github_archive.report.record_skipped(asset_path)
+            return None
+
+        known_size = size if isinstance(size, int) else 0
+        priority = -known_size if self.github_archive.schedule == SIZE_SCHEDULE else 0
+
+        if self.giant_lane and is_giant_asset(self.github_archive, size):
+            lane = self.giant_lane
+            controller = None
+            kwargs["timeout"] = self.github_archive.giant_timeout
+        else:
+            lane = self.lane
+            controller = self.github_archive.controller
+
+        task = functools.partial(
+            self._archive, context, archive_function, operations, controller, journal_key, asset_path, **kwargs
+        )
+        if journal_key:
+            self.github_archive.journal.record(journal_key, JOURNAL_QUEUED)
+        if self.github_archive.progress_tracker:
+            self.github_archive.progress_tracker.asset_queued()
+        future = lane.submit(priority, next(self.sequence), task)
+        self.futures.append(future)
+
+        return future
+
+    def _archive(
+        self,
+        context: str,
+        archive_function: Callable[..., Optional[str]],
+        operations: List[str],
+        controller: Optional[ConcurrencyController],
+        journal_key: Optional[str],
+        asset_path: Optional[str],
+        **kwargs,
+    ) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """Run each operation for an asset in order so that a pull can never race the clone of the same asset.
+
+        When concurrency is adaptive, each operation waits for the controller to allow it. Its outcome is reported
+        by the git job it runs, if any, so operations that were skipped never count as completed.
+
+        We return the context of the asset along with the failed operation and the name of the asset if a git
+        operation fails (or None if every operation succeeded).
+        """
+        self._asset_started()
+
+        failure = None
+        for operation in operations:
+            self._operation_started(journal_key, asset_path, operation)
+            with controller.limiter if controller else contextlib.nullcontext():
+                failed_asset = archive_function(operation=operation, **kwargs)
+            failure = self._operation_finished(journal_key, operation, failed_asset)
+            if failure:
+                break
+
+        self._asset_finished(journal_key, failure)
+
+        return context, failure
+
+    def _asset_started(self):
+        if self.github_archive.progress_tracker:
+            self.github_archive.progress_tracker.asset_started()
+
+    def _operation_started(self, journal_key: Optional[str], asset_path: Optional[str], operation: str):
+        # A clone into an existing directory is skipped, it must never be mistaken for a partial clone
+        if journal_key and not (operation == CLONE_OPERATION and asset_path and os.path.exists(asset_path)):
+            self.github_archive.journal.record(journal_key, JOURNAL_STARTED, operation)
+
+    def _operation_finished(
+        self,
+        journal_key: Optional[str],
+        operation: str,
+        failed_asset: Optional[str],
+    ) -> Optional[Tuple[str, str]]:
+        """Record the outcome of an operation, returns the failure of the asset if the operation failed."""
+        if not failed_asset:
+            return None
+
+        if journal_key:
+            self.github_archive.journal.record(journal_key, JOURNAL_FAILED, operation)
+
+        return operation, failed_asset
+
+    def _asset_finished(self, journal_key: Optional[str], failure: Optional[Tuple[str, str]]):
+        if journal_key and not failure:
+            self.github_archive.journal.record(journal_key, JOURNAL_SUCCEEDED)
+        if self.github_archive.progress_tracker:
+            self.github_archive.progress_tracker.asset_finished(failed=bool(failure))
+
+    def _get_journal_key(self, asset_path: Optional[str]) -> Optional[str]:
+        """The journal key of an asset is its path relative to the archive root (eg: `repos/owner/name`)."""
+        if not asset_path:
+            return None
+
+        return os.path.relpath(asset_path, self.github_archive.location).replace(os.sep, "/")
+
+    def wait(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Block until every queued asset has been archived and return the failures grouped by context."""
+        wait(self.futures, return_when=ALL_COMPLETED)
+        self.lane.shutdown()
+        if self.giant_lane:
+            self.giant_lane.shutdown()
+
+        return self._get_failures()
+
+    def _get_failures(self) -> Dict[str, List[Tuple[str, str]]]:
+        failures: Dict[str, List[Tuple[str, str]]] = {}
+        for future in self.futures:
+            context, failure = future.result()
+            if failure:
+                failures.setdefault(context, []).append(failure)
+
+        return failures
+
+
+class _AsyncLane:
+    """The asyncio counterpart of `_Lane`, a bounded number of tasks run at once on the event loop and whichever
+    waiting task has the highest priority (lowest value) runs next.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, limit: int):
+        self.loop = loop
+        self.limit = limit
+        self.running = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+
+    def submit(self, priority: int, sequence: int, task: Callable) -> Future:
+        """Schedule a coroutine function on the event loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(self._run(priority, sequence, task), self.loop)
+
+    async def _run(self, priority: int, sequence: int, task: Callable):
+        await self._acquire(priority, sequence)
+        try:
+            return await task()
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int, sequence: int):
+        if self.running < self.limit and not self.waiters:
+            self.running += 1
+            return
+
+        waiter = self.loop.create_future()
+        heapq.heappush(self.waiters, (priority, sequence, waiter))
+        try:
+            # The slot of a finished task is handed over to us directly
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self.waiters:
+            _, _, waiter = heapq.heappop(self.waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.running -= 1
+
+
+class AsyncArchivePipeline(ArchivePipeline):
+    """The asyncio engine, git assets are archived by tasks on an event loop running on a thread of its own and
+    git runs as subprocesses of the loop instead of blocking a thread each.
+
+    An in-flight operation costs a task instead of a thread, so `threads` (and `giant_threads`) can be set far
+    higher and interrupting the run cancels every task, killing the git commands they were running. Scheduling,
+    journaling and adaptive concurrency work the same way as with threads. Archive functions that aren't
+    coroutine functions still run on a thread.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        self.github_archive = github_archive
+        self.loop = asyncio.new_event_loop()
+        # Only archive functions that aren't coroutine functions and resumable clones run on these threads
+        self.loop.set_default_executor(ThreadPoolExecutor(github_archive.threads + github_archive.giant_threads))
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.lane = _AsyncLane(self.loop, github_archive.threads)  # type: ignore[assignment]
+        self.giant_lane = (
+            _AsyncLane(self.loop, github_archive.giant_threads)  # type: ignore[assignment]
+            if github_archive.giant_threshold
+            else None
+        )
+        self.sequence = itertools.count()
+        self.futures: List[Future] = []
+
+    async def _archive(  # type: ignore[override]
+        self,
+        context: str,
+        archive_function: Callable[..., Any],
+        operations: List[str],
+        controller: Optional[ConcurrencyController],
+        journal_key: Optional[str],
+        asset_path: Optional[str],
+        **kwargs,
+    ) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """The asyncio counterpart of `ArchivePipeline._archive`."""
+        self._asset_started()
+
+        failure = None
+        for operation in operations:
+            self._operation_started(journal_key, asset_path, operation)
+            if controller:
+                while not controller.limiter.try_acquire():
+                    await asyncio.sleep(ASYNC_LIMITER_INTERVAL)
+            try:
+                if asyncio.iscoroutinefunction(archive_function):
+                    failed_asset = await archive_function(operation=operation, **kwargs)
+                else:
+                    failed_asset = await asyncio.to_thread(archive_function, operation=operation, **kwargs)
+            finally:
+                if controller:
+                    controller.limiter.release()
+            failure = self._operation_finished(journal_key, operation, failed_asset)
+            if failure:
+                break
+
+        self._asset_finished(journal_key, failure)
+
+        return context, failure
+
+    def wait(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Block until every queued asset has been archived and return the failures grouped by context.
+
+        Interrupting the wait cancels every task (killing the git commands they are running) before re-raising.
+        """
+        try:
+            wait(self.futures, return_when=ALL_COMPLETED)
+        except KeyboardInterrupt:
+            asyncio.run_coroutine_threadsafe(self._cancel(), self.loop).result()
+            raise
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.run_until_complete(self.loop.shutdown_default_executor())
+            self.loop.close()
+
+        return self._get_failures()
+
+    async def _cancel(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,228 @@
+import asyncio
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+import woodchips
+
+from github_archive.constants import (
+    LOGGER_NAME,
+    PROGRESS_INTERVAL,
+)
+
+# eg: `Receiving objects:  45% (450/1000), 1.20 MiB | 600.00 KiB/s`
+PROGRESS_LINE_REGEX = re.compile(
+    r"(?P<phase>[A-Za-z ]+):\s+(?P<percent>\d+)% \((?P<done>\d+)/(?P<total>\d+)\)(?:, (?P<size>[\d.]+) (?P<unit>\w+))?"
+)
+RECEIVING_PHASE = "Receiving objects"
+STATUS_FILENAME = "status.json"
+BYTE_UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024**2, "GiB": 1024**3, "TiB": 1024**4}
+
+
+class _CommandProgress:
+    """The last progress a running git command reported."""
+
+    __slots__ = ("name", "operation", "phase", "percent", "objects", "bytes")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.operation = _get_operation_id()
+        self.phase: Optional[str] = None
+        self.percent = 0
+        self.objects = 0
+        self.bytes = 0
+
+
+class ProgressTracker:
+    """Aggregates the progress of a run: the git assets queued, running and finished along with the objects and
+    bytes received by every running git command (parsed from the `--progress` output of git as it streams in).
+
+    Once started, a summary with the throughput and ETA of the run is logged every interval and written to
+    `status.json` in the root of the archive for other tools to read.
+    """
+
+    def __init__(self, location: str, interval: float = PROGRESS_INTERVAL, filename: str = STATUS_FILENAME):
+        self.path = os.path.join(location, filename)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.queued = 0
+        self.active = 0
+        self.finished = 0
+        self.failed = 0
+        self.commands: Dict[int, _CommandProgress] = {}
+        self.command_ids = itertools.count()
+        # Totals of the git commands that already exited
+        self.received_objects = 0
+        self.received_bytes = 0
+        self.operation_received_bytes: Dict[int, int] = {}
+        self.last_sample = (self.started_at, 0, 0)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Stop reporting, a final report covers the end of the run."""
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.report()
+
+    def asset_queued(self):
+        with self.lock:
+            self.queued += 1
+
+    def asset_started(self):
+        with self.lock:
+            self.active += 1
+
+    def asset_finished(self, failed: bool):
+        with self.lock:
+            self.active -= 1
+            self.finished += 1
+            if failed:
+                self.failed += 1
+
+    def command_started(self, name: str) -> int:
+        """Start tracking a git command of an asset, returns the ID to report its progress with."""
+        with self.lock:
+            command_id = next(self.command_ids)
+            self.commands[command_id] = _CommandProgress(name)
+
+        return command_id
+
+    def command_finished(self, command_id: int):
+        with self.lock:
+            command = self.commands.pop(command_id, None)
+            if command:
+                self.received_objects += command.objects
+                self.received_bytes += command.bytes
+                self.operation_received_bytes[command.operation] = (
+                    self.operation_received_bytes.get(command.operation, 0) + command.bytes
+                )
+
+    def update(self, command_id: int, line: str):
+        """Record a line of `--progress` output from a git command."""
+        match = PROGRESS_LINE_REGEX.search(line)
+        if not match:
+            return
+
+        with self.lock:
+            command = self.commands.get(command_id)
+            if not command:
+                return
+            command.phase = match.group("phase").strip()
+            command.percent = int(match.group("percent"))
+            if command.phase == RECEIVING_PHASE:
+                command.objects = int(match.group("done"))
+                if match.group("size") and match.group("unit") in BYTE_UNITS:
+                    command.bytes = int(float(match.group("size")) * BYTE_UNITS[match.group("unit")])
+
+    def get_received(self) -> Tuple[int, int]:
+        """Returns the number of objects and bytes received by git so far."""
+        with self.lock:
+            return self._get_received()
+
+    def take_received_bytes(self) -> int:
+        """Returns the bytes received by the git commands of the git operation that just ran on the calling thread
+        (or asyncio task) since it last asked.
+        """
+        with self.lock:
+            return self.operation_received_bytes.pop(_get_operation_id(), 0)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Returns a snapshot of the progress of the run, rates are measured since the previous snapshot."""
+        now = time.time()
+
+        with self.lock:
+            objects, received_bytes = self._get_received()
+            last_time, last_objects, last_bytes = self.last_sample
+            self.last_sample = (now, objects, received_bytes)
+            elapsed = now - self.started_at
+            remaining = self.queued - self.finished
+            status = {
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "elapsed_seconds": round(elapsed),
+                "queued": remaining - self.active,
+                "active": self.active,
+                "finished": self.finished,
+                "failed": self.failed,
+                "received_objects": objects,
+                "received_bytes": received_bytes,
+                "objects_per_second": round((objects - last_objects) / max(now - last_time, 0.001), 1),
+                "bytes_per_second": round((received_bytes - last_bytes) / max(now - last_time, 0.001)),
+                # Assuming the rest of the assets take as long as those archived so far on average
+                "eta_seconds": round(remaining * elapsed / self.finished) if self.finished else None,
+                "commands": [
+                    {"asset": command.name, "phase": command.phase, "percent": command.percent, "bytes": command.bytes}
+                    for command in self.commands.values()
+                ],
+            }
+
+        return status
+
+    def report(self):
+        """Log a summary of the progress of the run and write it to the status file."""
+        logger = woodchips.get(LOGGER_NAME)
+        status = self.get_status()
+
+        eta = str(timedelta(seconds=status["eta_seconds"])) if status["eta_seconds"] is not None else "unknown"
+        logger.info(
+            f"# Progress: {status['finished']} git asset(s) archived ({status['failed']} failed),"
+            f" {status['active']} active, {status['queued']} queued, {_format_bytes(status['bytes_per_second'])}/s,"
+            f" {status['objects_per_second']} objects/s, ETA {eta}"
+        )
+
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as status_file:
+                json.dump(status, status_file, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as error:
+            logger.warning(f"Could not write the status file at {self.path}: {error}")
+
+    def _get_received(self) -> Tuple[int, int]:
+        commands = self.commands.values()
+
+        return (
+            self.received_objects + sum(command.objects for command in commands),
+            self.received_bytes + sum(command.bytes for command in commands),
+        )
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.report()
+
+
+def _get_operation_id() -> int:
+    """Git operations run each of their commands on a single worker thread or, with the asyncio engine, task."""
+    try:
+        return id(asyncio.current_task())
+    except RuntimeError:
+        # There is no event loop running on this thread
+        return threading.get_ident()
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TiB"
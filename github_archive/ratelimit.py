@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import contextlib
+import re
+import threading
+import time
+import urllib.parse
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+import woodchips
+from github import Github
+from requests import (
+    PreparedRequest,
+    Response,
+)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.metrics import RunMetrics  # pragma: no cover
+
+from github_archive.constants import (
+    API_BUDGET_RESERVE,
+    LOGGER_NAME,
+    RATE_LIMIT_ATTEMPTS,
+)
+
+CORE_RESOURCE = "core"
+GRAPHQL_RESOURCE = "graphql"
+SEARCH_RESOURCE = "search"
+RATE_LIMIT_STATUSES = (403, 429)
+# Endpoints answered on behalf of the authenticated user rather than about a public resource
+USER_SCOPED_PATH = re.compile(r"^(/api/v3)?/(user|gists)(/|$)")
+
+
+class _Budget:
+    """What GitHub last told us about the rate limit of one token for one resource."""
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        self.reset = 0.0
+        self.next_request = 0.0
+
+
+class TokenPool:
+    """Schedules API requests across one or more tokens so that a run stays under the GitHub rate limit.
+
+    Each request is sent with the token that can be used the soonest, preferring the one with the most budget
+    left. Once the budget of a token drops under the reserve, its remaining requests are spread evenly until its
+    limit resets and once every token is exhausted, requests wait for the first reset instead of failing.
+    Requests made within `pin()` are all sent with the same token instead.
+
+    Budgets are tracked per resource (core, search, graphql) since GitHub limits each of them separately.
+    """
+
+    def __init__(self, tokens: List[str], reserve: float = API_BUDGET_RESERVE):
+        # An anonymous pool still paces requests against the rate limit of our IP address
+        self.tokens: List[Optional[str]] = list(tokens) or [None]
+        self.reserve = reserve
+        self.budgets: Dict[Tuple[Optional[str], str], _Budget] = {}
+        self.lock = threading.Lock()
+        self.pinned = threading.local()
+
+    @contextlib.contextmanager
+    def pin(self) -> Iterator[None]:
+        """Send every request the current thread makes within the block with the same token.
+
+        What GitHub lists depends on the account of the token (eg: the private repos of an org), so the pages of a
+        listing must all come from one token. The token pinned is the first one to answer a request of the block
+        without being rate limited, from then on an exhausted token is waited for rather than swapped for another.
+        """
+        previous_pin = getattr(self.pinned, "active", False), getattr(self.pinned, "token", None)
+        self.pinned.active, self.pinned.token = True, None
+        try:
+            yield
+        finally:
+            self.pinned.active, self.pinned.token = previous_pin
+
+    def acquire(self, resource: str = CORE_RESOURCE, primary: bool = False) -> Optional[str]:
+        """Returns the token to send the next request of a resource with, blocking until it may be sent.
+
+        A `primary` request is always sent with the first token of the pool, the one the run authenticates as.
+        """
+        logger = woodchips.get(LOGGER_NAME)
+        pinned_token = getattr(self.pinned, "token", None)
+        if primary:
+            tokens = self.tokens[:1]
+        elif pinned_token:
+            tokens = [pinned_token]
+        else:
+            tokens = self.tokens
+
+        with self.lock:
+            now = time.time()
+            token = min(tokens, key=lambda token: self._rank(self._get_budget(token, resource), now))
+            budget = self._get_budget(token, resource)
+            send_at = self._ready_at(budget, now)
+
+            # Reserve the slot before releasing the lock so concurrent requests are spread rather than bunched
+            budget.next_request = send_at + self._interval(budget, send_at)
+            if budget.remaining is not None:
+                budget.remaining -= 1
+
+        delay = send_at - now
+        if delay > 0:
+            logger.debug(f"Waiting {delay:.2f}s to stay within the {resource} API rate limit of {_mask(token)}")
+            time.sleep(delay)
+
+        return token
+
+    def update(self, token: Optional[str], resource: str, response: Response) -> bool:
+        """Record the rate limit headers of a response, returns True if the request was rejected by a rate limit."""
+        headers = response.headers
+        rate_limited = response.status_code in RATE_LIMIT_STATUSES and (
+            headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in headers
+        )
+        if not rate_limited and getattr(self.pinned, "active", False) and not self.pinned.token:
+            self.pinned.token = token
+
+        with self.lock:
+            budget = self._get_budget(token, resource)
+            try:
+                if "X-RateLimit-Remaining" in headers:
+                    budget.remaining = int(headers["X-RateLimit-Remaining"])
+                if "X-RateLimit-Limit" in headers:
+                    budget.limit = int(headers["X-RateLimit-Limit"])
+                if "X-RateLimit-Reset" in headers:
+                    budget.reset = float(headers["X-RateLimit-Reset"])
+                if rate_limited and "Retry-After" in headers:
+                    # Secondary rate limits tell us how long to back off for
+                    budget.next_request = max(budget.next_request, time.time() + float(headers["Retry-After"]))
+            except ValueError:
+                pass
+
+        return rate_limited
+
+    def get_budgets(self) -> List[Dict[str, Any]]:
+        """Returns the last known budget of each token and resource, tokens are masked so this is safe to log."""
+        with self.lock:
+            return [
+                {
+                    "token": _mask(token),
+                    "resource": resource,
+                    "remaining": budget.remaining,
+                    "limit": budget.limit,
+                    "reset": budget.reset,
+                }
+                for (token, resource), budget in self.budgets.items()
+                if budget.remaining is not None
+            ]
+
+    def log_budgets(self):
+        """Log the remaining budget of each token, useful to size the next run."""
+        logger = woodchips.get(LOGGER_NAME)
+
+        for budget in self.get_budgets():
+            reset_time = datetime.fromtimestamp(budget["reset"], timezone.utc).strftime("%H:%M:%S UTC")
+            logger.info(
+                f"API budget of {budget['token']} ({budget['resource']}): {budget['remaining']}/{budget['limit']}"
+                f" requests remaining, resets at {reset_time}"
+            )
+
+    def _get_budget(self, token: Optional[str], resource: str) -> _Budget:
+        return self.budgets.setdefault((token, resource), _Budget())
+
+    def _rank(self, budget: _Budget, now: float) -> Tuple[float, float]:
+        """Tokens that can be used the soonest come first, then those with the most budget left."""
+        remaining = budget.remaining if budget.remaining is not None else float("inf")
+        return self._ready_at(budget, now), -remaining
+
+    @staticmethod
+    def _ready_at(budget: _Budget, now: float) -> float:
+        if budget.remaining is not None and budget.reset <= now:
+            # The limit has reset since we last heard from GitHub, the next response will tell us the new budget
+            budget.remaining = None
+        if budget.remaining is not None and budget.remaining <= 0:
+            return max(budget.reset, budget.next_request)
+
+        return max(now, budget.next_request)
+
+    def _interval(self, budget: _Budget, now: float) -> float:
+        """The time to leave between two requests of a token so that its remaining budget lasts until the reset."""
+        if budget.remaining is None or budget.limit is None or budget.remaining >= budget.limit * self.reserve:
+            return 0.0
+
+        return max(0.0, budget.reset - now) / max(budget.remaining, 1)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """A `requests` transport adapter that sends every API request through a `TokenPool`.
+
+    The pool picks the token of each request (replacing the one PyGithub set) and a request rejected by a rate
+    limit is retried, with another token if there is one or once the limit resets. Only GET requests for public
+    resources are rotated, and only from one listing to the next since each owner is listed with a single token.
+    Requests about the authenticated user (`/user`, `/gists`, GraphQL `viewer` queries) and writes (eg: forks) are
+    always sent with the primary token since another token would act as someone else. The
+    duration and size of each response are recorded in the metrics of the run, if any.
+    """
+
+    def __init__(
+        self,
+        token_pool: TokenPool,
+        metrics: Optional[RunMetrics] = None,
+        max_retries: Union[Retry, int, None] = 0,
+        **kwargs,
+    ):
+        self.token_pool = token_pool
+        self.metrics = metrics
+        super().__init__(max_retries=_without_rate_limit_retries(max_retries), **kwargs)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:  # type: ignore[override]
+        resource = get_resource(request.url or "")
+        primary = is_user_scoped(request)
+
+        for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+            token = self.token_pool.acquire(resource, primary=primary)
+            authorization = str(request.headers.get("Authorization", ""))
+            if token and authorization:
+                scheme = authorization.split(" ")[0]
+                request.headers["Authorization"] = f"{scheme} {token}"
+
+            response = self._send_with_token(request, resource, token, **kwargs)
+
+            if not self.token_pool.update(token, resource, response) or attempt == RATE_LIMIT_ATTEMPTS:
+                break
+            response.close()
+
+        return response
+
+    def _send_with_token(self, request: PreparedRequest, resource: str, token: Optional[str], **kwargs) -> Response:
+        """Send a request once its token has been picked, subclasses hook in here to act on the token it uses."""
+        start_time = time.monotonic()
+        response = super().send(request, **kwargs)
+        if self.metrics:
+            received_bytes = (
+                int(response.headers.get("Content-Length", 0)) if kwargs.get("stream") else len(response.content)
+            )
+            self.metrics.record_api_request(resource, time.monotonic() - start_time, received_bytes)
+
+        return response
+
+
+def is_user_scoped(request: PreparedRequest) -> bool:
+    """Returns True if a request must be sent with the primary token, ie: it writes something or it is answered on
+    behalf of the authenticated user. Every GraphQL query is a POST so `viewer` queries are covered too.
+    """
+    path = urllib.parse.urlparse(request.url or "").path
+
+    return request.method != "GET" or bool(USER_SCOPED_PATH.match(path))
+
+
+def get_resource(url: str) -> str:
+    """Returns the rate limit resource a request to the GitHub API counts against."""
+    path = urllib.parse.urlparse(url).path
+
+    if path.endswith("/graphql"):
+        return GRAPHQL_RESOURCE
+    elif "/search/" in path:
+        return SEARCH_RESOURCE
+    else:
+        return CORE_RESOURCE
+
+
+def _without_rate_limit_retries(max_retries: Union[Retry, int, None]) -> Retry:
+    """PyGithub retries rate limited responses by sleeping until the limit resets, we drop those statuses from
+    its retry policy so the adapter sees them and can try another token instead.
+    """
+    retry = Retry.from_int(max_retries)
+    status_forcelist = [status for status in retry.status_forcelist or [] if status not in RATE_LIMIT_STATUSES]
+
+    return Retry(
+        total=retry.total,
+        connect=retry.connect,
+        read=retry.read,
+        status=retry.status,
+        other=retry.other,
+        allowed_methods=retry.allowed_methods,
+        status_forcelist=status_forcelist,
+        backoff_factor=retry.backoff_factor,
+        raise_on_status=retry.raise_on_status,
+        respect_retry_after_header=False,
+    )
+
+
+def install_adapter(github_instance: Github, adapter_class: Type[HTTPAdapter], **kwargs):
+    """Route every request of a PyGithub instance through a transport adapter.
+
+    PyGithub doesn't expose its HTTP session, so we mount the adapter on the persistent connection its
+    requester reuses for every call to the API host.
+    """
+    connection = github_instance.requester._Requester__createConnection()  # type: ignore[attr-defined]
+    adapter = adapter_class(
+        max_retries=connection.retry,
+        pool_connections=connection.pool_size,
+        pool_maxsize=connection.pool_size,
+        **kwargs,
+    )
+    connection.session.mount(f"{connection.protocol}://", adapter)
+
+
+def _mask(token: Optional[str]) -> str:
+    """Identify a token in logs without leaking it."""
+    return f"token ...{token[-4:]}" if token else "anonymous access"
@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import Optional
+
+from github import (
+    Gist,
+    Repository,
+)
+
+
+class OwnerRecord:
+    """The owner (user or org) of a git asset."""
+
+    __slots__ = ("login",)
+
+    def __init__(self, login: str):
+        self.login = login
+
+
+class RepoRecord:
+    """A lightweight repo holding only the fields needed to filter and archive it.
+
+    Attribute names match those of PyGithub's `Repository` so the rest of the tool can consume either.
+    """
+
+    __slots__ = (
+        "name",
+        "full_name",
+        "owner",
+        "fork",
+        "archived",
+        "language",
+        "html_url",
+        "ssh_url",
+        "pushed_at",
+        "size",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        full_name: str,
+        owner: OwnerRecord,
+        fork: bool,
+        archived: bool,
+        language: Optional[str],
+        html_url: str,
+        ssh_url: str,
+        pushed_at: Optional[datetime],
+        size: Optional[int],
+    ):
+        self.name = name
+        self.full_name = full_name
+        self.owner = owner
+        self.fork = fork
+        self.archived = archived
+        self.language = language
+        self.html_url = html_url
+        self.ssh_url = ssh_url
+        self.pushed_at = pushed_at
+        self.size = size
+
+
+class GistRecord:
+    """A lightweight gist holding only the fields needed to archive it.
+
+    Attribute names match those of PyGithub's `Gist` so the rest of the tool can consume either.
+    """
+
+    __slots__ = (
+        "id",
+        "owner",
+        "html_url",
+        "updated_at",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        owner: OwnerRecord,
+        html_url: str,
+        updated_at: Optional[datetime],
+    ):
+        self.id = id
+        self.owner = owner
+        self.html_url = html_url
+        self.updated_at = updated_at
+
+
+def build_repo_record(repo: Repository.Repository) -> RepoRecord:
+    """Copy the fields we need out of a repo listed via the REST API so the full object can be freed.
+
+    Every field read here is part of a listing response, reading one that isn't would make PyGithub request the
+    whole repo.
+    """
+    return RepoRecord(
+        name=repo.name,
+        full_name=repo.full_name,
+        owner=OwnerRecord(repo.owner.login),
+        fork=repo.fork,
+        archived=repo.archived,
+        language=repo.language,
+        html_url=repo.html_url,
+        ssh_url=repo.ssh_url,
+        pushed_at=repo.pushed_at,
+        size=repo.size,
+    )
+
+
+def build_gist_record(gist: Gist.Gist) -> GistRecord:
+    """Copy the fields we need out of a gist listed via the REST API so the full object can be freed."""
+    return GistRecord(
+        id=gist.id,
+        owner=OwnerRecord(gist.owner.login),
+        html_url=gist.html_url,
+        updated_at=gist.updated_at,
+    )
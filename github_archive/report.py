@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    LOGGER_NAME,
+    REPORT_FAILED,
+    REPORT_SKIPPED,
+    REPORT_SUCCEEDED,
+    REPORTS_DIR,
+    REPORTS_KEPT,
+)
+
+
+class RunReport:
+    """A JSON Lines report of a run with the outcome and timings of every git operation.
+
+    The report opens with a `run` entry, followed by an `operation` entry for each git operation as it completes
+    (the asset, its context, the start, end and duration of the operation, the bytes git received, the outcome
+    and the class of the error if it failed) and closes with a `summary` entry totalling each context. Entries are
+    flushed as they are written so a run that crashes still leaves a usable partial report.
+
+    Only the newest `REPORTS_KEPT` reports of the reports folder are kept, a `--report_file` is never removed.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        self.github_archive = github_archive
+        self.path = github_archive.report_file or os.path.join(
+            github_archive.location,
+            REPORTS_DIR,
+            f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.jsonl",
+        )
+        self.file: Optional[IO[str]] = None
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def open(self, operations: List[str], shared: bool = False):
+        """Start reporting the run, a report that can't be written is logged and the run goes on without it.
+
+        A shared report was opened by the parent process of a sharded run, shards only append their operations to it
+        and hand their totals back to the parent.
+        """
+        logger = woodchips.get(LOGGER_NAME)
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.file = open(self.path, "a" if shared else "w")
+        except OSError as error:
+            logger.warning(f"Could not write the run report at {self.path}: {error}")
+            return
+
+        self.started_at = time.time()
+        if not shared:
+            self._write({"type": "run", "started_at": _format_time(self.started_at), "operations": operations})
+            if not self.github_archive.report_file:
+                self._remove_old_reports()
+
+    def record(self, asset_path: str, operation: str, duration: float, error_class: Optional[str] = None):
+        """Record a git operation that ran, it failed if the class of its error is passed."""
+        tracker = self.github_archive.progress_tracker
+        # Git only reports the bytes it received when it is asked for its progress
+        received_bytes = tracker.take_received_bytes() if tracker and self.github_archive.tracks_git_progress else None
+        finished_at = time.time()
+
+        self._add_entry(
+            asset_path,
+            operation,
+            REPORT_FAILED if error_class else REPORT_SUCCEEDED,
+            {
+                "started_at": _format_time(finished_at - duration),
+                "finished_at": _format_time(finished_at),
+                "duration_seconds": round(duration, 3),
+                "received_bytes": received_bytes,
+                "error_class": error_class,
+            },
+        )
+
+    def record_skipped(self, asset_path: str, operation: Optional[str] = None):
+        """Record an asset that was left alone, it hadn't changed since the last sync or was already archived."""
+        self._add_entry(asset_path, operation, REPORT_SKIPPED, {})
+
+    def merge_totals(self, totals: Dict[str, Dict[str, float]]):
+        """Add the totals of each context reported by a shard to those of the run."""
+        with self.lock:
+            for context, shard_totals in totals.items():
+                context_totals = self.totals.setdefault(context, dict.fromkeys(shard_totals, 0))
+                for name, value in shard_totals.items():
+                    context_totals[name] = round(context_totals.get(name, 0) + value, 3)
+
+    def finish(self):
+        """Close the report with the totals of each context."""
+        finished_at = time.time()
+
+        with self.lock:
+            totals = {context: dict(context_totals) for context, context_totals in self.totals.items()}
+        self._write(
+            {
+                "type": "summary",
+                "finished_at": _format_time(finished_at),
+                "duration_seconds": round(finished_at - self.started_at, 3),
+                "contexts": totals,
+            }
+        )
+        self.close()
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def _add_entry(self, asset_path: str, operation: Optional[str], outcome: str, details: Dict[str, Any]):
+        context = self.github_archive.metrics.get_context(asset_path)
+        duration = details.get("duration_seconds") or 0
+        received_bytes = details.get("received_bytes") or 0
+
+        with self.lock:
+            context_totals = self.totals.setdefault(
+                context,
+                {REPORT_SUCCEEDED: 0, REPORT_FAILED: 0, REPORT_SKIPPED: 0, "duration_seconds": 0, "received_bytes": 0},
+            )
+            context_totals[outcome] += 1
+            context_totals["duration_seconds"] = round(context_totals["duration_seconds"] + duration, 3)
+            context_totals["received_bytes"] += received_bytes
+
+        self._write(
+            {
+                "type": "operation",
+                "asset": os.path.relpath(asset_path, self.github_archive.location).replace(os.sep, "/"),
+                "context": context,
+                "operation": operation,
+                "outcome": outcome,
+                **details,
+            }
+        )
+
+    def _remove_old_reports(self):
+        """Remove the oldest timestamped reports once there are more than `REPORTS_KEPT` of them."""
+        logger = woodchips.get(LOGGER_NAME)
+        directory = os.path.dirname(self.path)
+
+        # Timestamped file names sort in the order the runs started
+        reports = sorted(filename for filename in os.listdir(directory) if filename.endswith(".jsonl"))
+        for filename in reports[:-REPORTS_KEPT]:
+            try:
+                os.remove(os.path.join(directory, filename))
+                logger.debug(f"Removed the old run report {filename}")
+            except OSError:
+                # Another run may have removed the report first
+                pass
+
+    def _write(self, entry: Dict[str, Any]):
+        with self.lock:
+            if self.file:
+                self.file.write(f"{json.dumps(entry)}\n")
+                self.file.flush()
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
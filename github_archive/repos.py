@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import os
-import subprocess  # nosec
 from concurrent.futures import (
     ALL_COMPLETED,
     ThreadPoolExecutor,
@@ -9,6 +8,7 @@ from concurrent.futures import (
 )
 from typing import (
     TYPE_CHECKING,
+    Iterable,
     List,
     Optional,
 )
@@ -19,62 +19,59 @@ from github import Repository
 if TYPE_CHECKING:
     # This is needed to get around circular imports while allowing `mypy` to be happy
     from github_archive.archive import GithubArchive  # pragma: no cover
+    from github_archive.pipeline import ArchivePipeline  # pragma: no cover
+    from github_archive.records import RepoRecord  # pragma: no cover
 
 from github_archive.constants import (
+    ASYNCIO_ENGINE,
     CLONE_OPERATION,
     LOGGER_NAME,
     PULL_OPERATION,
 )
+from github_archive.git import (
+    GitJob,
+    build_git_command,
+    get_asset_dir_name,
+    get_git_timeout,
+    is_incomplete_clone,
+    is_shallow_clone,
+    run_git_job,
+    run_git_job_async,
+)
 
 
-def iterate_repos_to_archive(
+def queue_repos_to_archive(
     github_archive: GithubArchive,
-    repos: List[Repository.Repository],
-    operation: str,
-) -> List[Optional[str]]:
-    """Iterate over each repository and start a thread after filtering based on the
-    user input and attempt to archive it.
-
-    We ignore repos not in the include or in the exclude list if either are present.
+    pipeline: ArchivePipeline,
+    context: str,
+    repos: Iterable[RepoRecord],
+    operations: List[str],
+):
+    """Iterate over each repository and queue it on the shared pipeline so it can be archived.
+
+    Repos have already been filtered while they were listed.
     """
-    logger = woodchips.get(LOGGER_NAME)
-    pool = ThreadPoolExecutor(github_archive.threads)
-    thread_list = []
-
     for repo in repos:
-        if (
-            (
-                github_archive.languages
-                and repo.language
-                and repo.language.lower() in github_archive.languages
-                and not github_archive.include
-                and not github_archive.exclude
-            )
-            or (not github_archive.languages and not github_archive.include and not github_archive.exclude)
-            or (github_archive.include and repo.name in github_archive.include)
-            or (github_archive.exclude and repo.name not in github_archive.exclude)
-        ):
-            repo_owner_username = repo.owner.login.lower()
-            repo_path = os.path.join(github_archive.location, "repos", repo_owner_username, repo.name)
-            thread_list.append(
-                pool.submit(
-                    _archive_repo,
-                    github_archive=github_archive,
-                    repo=repo,
-                    repo_path=repo_path,
-                    operation=operation,
-                )
-            )
-        else:
-            logger.debug(f"{repo.name} skipped due to filtering")
-
-    wait(thread_list, return_when=ALL_COMPLETED)
-    failed_repos = [repo.result() for repo in thread_list if repo.result()]
-
-    return failed_repos
+        repo_owner_username = repo.owner.login.lower()
+        repo_path = os.path.join(
+            github_archive.location,
+            "repos",
+            repo_owner_username,
+            get_asset_dir_name(github_archive, repo.name),
+        )
+        pipeline.submit(
+            context,
+            _archive_repo_async if github_archive.engine == ASYNCIO_ENGINE else _archive_repo,
+            operations,
+            size=repo.size,
+            asset_path=repo_path,
+            github_archive=github_archive,
+            repo=repo,
+            repo_path=repo_path,
+        )
 
 
-def view_repos(repos: List[Repository.Repository]):
+def view_repos(repos: List[RepoRecord]):
     """View a list of repos that will be cloned/pulled."""
     logger = woodchips.get(LOGGER_NAME)
 
@@ -83,7 +80,7 @@ def view_repos(repos: List[Repository.Repository]):
         logger.info(repo_name)
 
 
-def iterate_repos_to_fork(github_archive: GithubArchive, repos: List[Repository.Repository]) -> List[Optional[str]]:
+def iterate_repos_to_fork(github_archive: GithubArchive, repos: List[RepoRecord]) -> List[Optional[str]]:
     """Iterates through a list of repos and attempts to fork them."""
     pool = ThreadPoolExecutor(github_archive.threads)
     thread_list = []
@@ -92,6 +89,7 @@ def iterate_repos_to_fork(github_archive: GithubArchive, repos: List[Repository.
         thread_list.append(
             pool.submit(
                 _fork_repo,
+                github_archive=github_archive,
                 repo=repo,
             )
         )
@@ -102,61 +100,104 @@ def iterate_repos_to_fork(github_archive: GithubArchive, repos: List[Repository.
     return failed_repos
 
 
-def _fork_repo(repo: Repository.Repository):
-    """Forks a repository to the authenticated user's GitHub instance."""
+def _fork_repo(github_archive: GithubArchive, repo: RepoRecord):
+    """Forks a repository to the authenticated user's GitHub instance.
+
+    The record doesn't carry an API handle so we build a partial repo from its name, forking it is then a single
+    request instead of fetching the repo first. It shares the requester of the run so that the fork goes through
+    its rate limiting and metrics.
+    """
     logger = woodchips.get(LOGGER_NAME)
 
     repo_name = f"{repo.owner.login}/{repo.name}"
 
     try:
-        repo.create_fork()
+        Repository.Repository(
+            github_archive.github_instance.requester, completed=False, url=f"/repos/{repo.full_name}"
+        ).create_fork()
         logger.info(f"{repo_name} forked!")
     except Exception:
         logger.error(f"{repo_name} failed to fork!")
 
 
 def _archive_repo(
-    github_archive: GithubArchive, repo: Repository.Repository, repo_path: str, operation: str
+    github_archive: GithubArchive,
+    repo: RepoRecord,
+    repo_path: str,
+    operation: str,
+    timeout: Optional[int] = None,
 ) -> Optional[str]:
-    """Clone and pull repos based on the operation passed.
+    """Clone and pull repos based on the operation passed, the timeout defaults to the timeout policy of the run.
 
     We return the name of the repo if its git operation fails, otherwise return None.
     """
+    job = _get_repo_job(github_archive, repo, repo_path, operation, timeout)
+
+    return run_git_job(github_archive, job) if job else None
+
+
+async def _archive_repo_async(
+    github_archive: GithubArchive,
+    repo: RepoRecord,
+    repo_path: str,
+    operation: str,
+    timeout: Optional[int] = None,
+) -> Optional[str]:
+    """The asyncio engine counterpart of `_archive_repo`."""
+    job = _get_repo_job(github_archive, repo, repo_path, operation, timeout)
+
+    return await run_git_job_async(github_archive, job) if job else None
+
+
+def _get_repo_job(
+    github_archive: GithubArchive,
+    repo: RepoRecord,
+    repo_path: str,
+    operation: str,
+    timeout: Optional[int],
+) -> Optional[GitJob]:
+    """Returns the git job of a repo operation or None if the operation doesn't need to run."""
     logger = woodchips.get(LOGGER_NAME)
-    failed_repo = None
-    full_repo_name = os.path.join(repo.owner.login, repo.name)  # We use a path here to properly remove failed dirs
+    # We use a path here to properly remove failed dirs
+    full_repo_name = os.path.join(repo.owner.login, get_asset_dir_name(github_archive, repo.name))
+    state_key = f"repos/{repo.owner.login.lower()}/{repo.name}"
+
+    incomplete_clone = is_incomplete_clone(repo_path)
 
-    if (os.path.exists(repo_path) and operation == CLONE_OPERATION) or (
-        not os.path.exists(repo_path) and operation == PULL_OPERATION
+    if (os.path.exists(repo_path) and operation == CLONE_OPERATION and not incomplete_clone) or (
+        operation == PULL_OPERATION and (not os.path.exists(repo_path) or incomplete_clone)
     ):
-        pass
+        return None
+    elif (
+        operation == PULL_OPERATION
+        and not github_archive.force_pull
+        # Deepening a shallow clone fetches history even if nothing was pushed since the last sync
+        and not (github_archive.deepen and is_shallow_clone(repo_path))
+        and github_archive.state.is_unchanged(state_key, repo.pushed_at)
+    ):
+        logger.debug(f"Repo: {full_repo_name} pull skipped, unchanged since the last sync.")
+        github_archive.metrics.record_skipped(repo_path)
+        github_archive.report.record_skipped(repo_path, operation)
+        return None
+
+    if github_archive.use_https or not github_archive.token:
+        # Will be used for unauthenticated requests or with items like GCM
+        repo_url = repo.html_url
     else:
-        commands = {
-            PULL_OPERATION: ["git", "-C", repo_path, "pull", "--rebase"],
-        }
-
-        if github_archive.use_https or not github_archive.token:
-            # Will be used for unauthenticated requests or with items like GCM
-            commands.update({CLONE_OPERATION: ["git", "clone", repo.html_url, repo_path]})
-        else:
-            # Will be used for SSH authenticated requests
-            commands.update({CLONE_OPERATION: ["git", "clone", repo.ssh_url, repo_path]})
-
-        git_command = commands[operation]
-
-        try:
-            subprocess.check_output(  # nosec
-                git_command,
-                stderr=subprocess.STDOUT,
-                text=True,
-                timeout=github_archive.timeout,
-            )
-            logger.info(f"Repo: {full_repo_name} {operation} success!")
-        except subprocess.TimeoutExpired:
-            logger.error(f"Git operation timed out archiving {repo.name}.")
-            failed_repo = full_repo_name
-        except subprocess.CalledProcessError as error:
-            logger.error(f"Failed to {operation} {repo.name}\n{error.output}")
-            failed_repo = full_repo_name
-
-    return failed_repo
+        # Will be used for SSH authenticated requests
+        repo_url = repo.ssh_url
+
+    return GitJob(
+        asset_type="Repo",
+        full_name=full_repo_name,
+        name=repo.name,
+        operation=operation,
+        url=repo_url,
+        path=repo_path,
+        command=build_git_command(github_archive, operation, repo_url, repo_path, size=repo.size),
+        timeout=timeout or get_git_timeout(github_archive, operation, state_key, size=repo.size),
+        size=repo.size,
+        resume=operation == CLONE_OPERATION and (github_archive.resumable_clones or incomplete_clone),
+        state_key=state_key,
+        updated_at=repo.pushed_at,
+    )
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.concurrency import ConcurrencyController
+from github_archive.constants import (
+    ASYNCIO_ENGINE,
+    LOGGER_NAME,
+)
+from github_archive.logger import setup_logger
+from github_archive.pipeline import (
+    ArchivePipeline,
+    AsyncArchivePipeline,
+)
+from github_archive.progress import ProgressTracker
+from github_archive.ssh import SshControlPool
+
+# The context, archive function, operations, size and path of a queued asset along with the rest of the arguments
+# of its archive function
+QueuedAsset = Tuple[str, Callable[..., Any], List[str], Optional[int], Optional[str], Dict[str, Any]]
+
+
+class ShardedPipeline(ArchivePipeline):
+    """Splits the git assets of a run across `shards` worker processes instead of archiving them in this one.
+
+    Assets are queued as they would be on an `ArchivePipeline` and assigned to a shard by a stable hash of their
+    path in the archive (eg: `repos/owner/name`), so an asset is always archived by the same shard. Once everything
+    has been listed, each shard archives its assets in a process of its own with its own pipeline and thread budget
+    (`threads`) and the failures, state, metrics and report totals of every shard are merged back into the run.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        self.github_archive = github_archive
+        self.assets: List[List[QueuedAsset]] = [[] for _ in range(github_archive.shards)]
+
+    def submit(  # type: ignore[override]
+        self,
+        context: str,
+        archive_function: Callable[..., Any],
+        operations: List[str],
+        size: Optional[int] = None,
+        asset_path: Optional[str] = None,
+        **kwargs,
+    ) -> None:
+        """Queue every operation for a single git asset on its shard, the archive function must be importable."""
+        # Each shard builds its own copy of the run
+        kwargs.pop("github_archive", None)
+        key = self._get_journal_key(asset_path) or ""
+        shard = get_shard(key, self.github_archive.shards)
+        self.assets[shard].append((context, archive_function, operations, size, asset_path, kwargs))
+
+    def wait(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Archive the assets of every shard in parallel, block until they all finish and return the failures
+        grouped by context.
+
+        A shard that crashes is raised once the others are done so the run is left to be resumed.
+        """
+        logger = woodchips.get(LOGGER_NAME)
+        shards = [(index, assets) for index, assets in enumerate(self.assets) if assets]
+        failures: Dict[str, List[Tuple[str, str]]] = {}
+        if not shards:
+            return failures
+
+        logger.info(f"# Archiving git assets in {len(shards)} shards...")
+        # Shards must append to the report this process opened instead of starting one of their own
+        options = {**self.github_archive.options, "report_file": self.github_archive.report.path}
+        shard_error = None
+        # Forking a process that runs threads (eg: the metrics server) isn't safe, shards start from scratch instead
+        with ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_archive_shard, type(self.github_archive), options, index, assets)
+                for index, assets in shards
+            ]
+            for (index, _), future in zip(shards, futures):
+                try:
+                    result = future.result()
+                except Exception as error:
+                    logger.error(f"Shard {index} crashed: {error}")
+                    shard_error = shard_error or error
+                    continue
+
+                for context, shard_failures in result["failures"].items():
+                    failures.setdefault(context, []).extend(shard_failures)
+                self.github_archive.state.merge(result["state"])
+                self.github_archive.metrics.merge(result["metrics"])
+                self.github_archive.report.merge_totals(result["report"])
+
+        if shard_error:
+            raise shard_error
+
+        return failures
+
+
+def get_shard(key: str, shards: int) -> int:
+    """Returns the shard of an asset, the hash must be the same in every process and on every run."""
+    return zlib.crc32(key.encode()) % shards
+
+
+def _archive_shard(
+    github_archive_class: Type[GithubArchive],
+    options: Dict[str, Any],
+    index: int,
+    assets: List[QueuedAsset],
+) -> Dict[str, Any]:
+    """Archive the git assets of a shard, this runs in a worker process of its own.
+
+    The class of the run is passed in as importing it here would be circular.
+    """
+    github_archive = github_archive_class(**{**options, "shard_index": index})
+    setup_logger(github_archive)
+    logger = woodchips.get(LOGGER_NAME)
+    logger.info(f"# Shard {index} is archiving {len(assets)} git assets...")
+
+    github_archive.state.load()
+    github_archive.journal.open(resume=github_archive.resume, shared=True)
+    github_archive.report.open(github_archive.get_git_operations(), shared=True)
+    github_archive.progress_tracker = ProgressTracker(github_archive.location, filename=f"status-shard-{index}.json")
+    if github_archive.progress:
+        github_archive.progress_tracker.start()
+    if github_archive.adaptive:
+        github_archive.controller = ConcurrencyController(github_archive)
+        github_archive.controller.start()
+    if github_archive.ssh_multiplex:
+        github_archive.ssh_pool = SshControlPool(github_archive)
+
+    # The SSH connections of the pool are closed even if the shard crashes
+    try:
+        pipeline = (
+            AsyncArchivePipeline(github_archive)
+            if github_archive.engine == ASYNCIO_ENGINE
+            else ArchivePipeline(github_archive)
+        )
+        for context, archive_function, operations, size, asset_path, kwargs in assets:
+            pipeline.submit(
+                context,
+                archive_function,
+                operations,
+                size=size,
+                asset_path=asset_path,
+                github_archive=github_archive,
+                **kwargs,
+            )
+        failures = pipeline.wait()
+    finally:
+        if github_archive.ssh_pool:
+            github_archive.ssh_pool.close()
+
+    if github_archive.controller:
+        github_archive.controller.stop()
+    if github_archive.progress:
+        github_archive.progress_tracker.stop()
+    github_archive.journal.close()
+    github_archive.report.close()
+
+    return {
+        "failures": failures,
+        "state": github_archive.state.get_updates(),
+        "metrics": github_archive.metrics.get_snapshot(),
+        "report": github_archive.report.totals,
+    }
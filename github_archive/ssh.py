@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import itertools
+import math
+import os
+import shlex
+import shutil
+import subprocess  # nosec
+import tempfile
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+)
+
+import woodchips
+
+if TYPE_CHECKING:
+    # This is needed to get around circular imports while allowing `mypy` to be happy
+    from github_archive.archive import GithubArchive  # pragma: no cover
+
+from github_archive.constants import (
+    DEFAULT_SSH_COMMAND,
+    LOGGER_NAME,
+    SSH_CONTROL_PATH_HASH_LENGTH,
+    SSH_CONTROL_PERSIST,
+    SSH_EXIT_TIMEOUT,
+    SSH_SESSIONS_PER_CONNECTION,
+    SSH_SOCKET_DIRECTORY,
+    SSH_SOCKET_PATH_LIMIT,
+    SSH_TEMP_SOCKET_SUFFIX_LENGTH,
+)
+from github_archive.logger import log_and_raise_value_error
+
+
+class SshControlPool:
+    """A pool of SSH connections shared by the git commands of a run through the ControlMaster feature of OpenSSH.
+
+    Without it, every git command over SSH does a full handshake and key exchange of its own. Git commands are
+    spread over the control sockets of the pool instead: the first command to use a socket opens a master connection
+    that the commands after it reuse as sessions. A connection carries up to `SSH_SESSIONS_PER_CONNECTION` sessions
+    at once, so the pool is sized to the git operations that can run at the same time. Masters close themselves once
+    idle for `SSH_CONTROL_PERSIST` seconds in case the run can't tear them down.
+    """
+
+    def __init__(self, github_archive: GithubArchive):
+        logger = woodchips.get(LOGGER_NAME)
+        self.ssh_command = github_archive.ssh_command or get_ssh_command()
+        concurrent_operations = github_archive.threads + (
+            github_archive.giant_threads if github_archive.giant_threshold else 0
+        )
+        self.size = max(1, math.ceil(concurrent_operations / SSH_SESSIONS_PER_CONNECTION))
+        # Unix socket paths are limited to about 100 characters, which an archive location or even the temporary
+        # directory of macOS (eg: `/var/folders/...`) can take up
+        self.directory = tempfile.mkdtemp(
+            prefix="gha-",
+            dir=SSH_SOCKET_DIRECTORY if os.path.isdir(SSH_SOCKET_DIRECTORY) else None,
+        )
+        longest_socket_path = len(self._get_control_path(self.size - 1)) + (
+            SSH_CONTROL_PATH_HASH_LENGTH - len("%C") + SSH_TEMP_SOCKET_SUFFIX_LENGTH
+        )
+        if longest_socket_path >= SSH_SOCKET_PATH_LIMIT:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            log_and_raise_value_error(
+                logger=logger,
+                message=f"The SSH control sockets in {self.directory} would exceed the length limit of Unix sockets.",
+            )
+        self.slots = itertools.cycle(range(self.size))
+        self.lock = threading.Lock()
+
+    def get_env(self) -> Dict[str, str]:
+        """Returns the environment of a git command, which goes through the next connection of the pool."""
+        with self.lock:
+            slot = next(self.slots)
+        control_path = self._get_control_path(slot)
+        ssh_command = (
+            f"{self.ssh_command} -o ControlMaster=auto -o {shlex.quote(f'ControlPath={control_path}')}"
+            f" -o ControlPersist={SSH_CONTROL_PERSIST}"
+        )
+
+        return {**os.environ, "GIT_SSH_COMMAND": ssh_command}
+
+    def _get_control_path(self, slot: int) -> str:
+        # `%C` is a hash of the host, port and user so each of them gets connections of its own
+        return os.path.join(self.directory, f"{slot}-%C")
+
+    def close(self):
+        """Close the master connections of the pool and remove their sockets."""
+        logger = woodchips.get(LOGGER_NAME)
+
+        for filename in sorted(os.listdir(self.directory)):
+            control_path = os.path.join(self.directory, filename)
+            try:
+                # The host is required but unused, the control path doesn't need expanding
+                subprocess.run(  # nosec
+                    [*shlex.split(self.ssh_command), "-o", f"ControlPath={control_path}", "-O", "exit", "localhost"],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=SSH_EXIT_TIMEOUT,
+                )
+            except (OSError, subprocess.TimeoutExpired) as error:
+                logger.warning(f"Could not close the SSH connection at {control_path}: {error}")
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def get_ssh_command() -> str:
+    """Returns the SSH command git would connect with on its own, so the pool keeps the user's SSH setup (eg: an
+    identity file). Like git, `GIT_SSH_COMMAND` takes precedence over `core.sshCommand`.
+    """
+    if os.environ.get("GIT_SSH_COMMAND"):
+        return os.environ["GIT_SSH_COMMAND"]
+
+    try:
+        ssh_command = subprocess.run(  # nosec
+            ["git", "config", "--get", "core.sshCommand"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        ssh_command = ""
+
+    return ssh_command or DEFAULT_SSH_COMMAND
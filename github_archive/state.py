@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Set,
+)
+
+import woodchips
+
+from github_archive.constants import LOGGER_NAME
+
+
+class StateIndex:
+    """A JSON index in the root of the archive recording, for each git asset, the last time it was pushed to
+    according to GitHub and the last time we synced it.
+
+    Keys are the path of the asset relative to the archive root (eg: `repos/justintime50/github-archive`).
+    """
+
+    def __init__(self, location: str):
+        self.path = os.path.join(location, "state.json")
+        self.assets: Dict[str, Dict[str, Any]] = {}
+        # The assets recorded during this run, so that shards can hand them back to the parent process
+        self.updated: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load the index from disk, a missing or unreadable index starts out empty."""
+        logger = woodchips.get(LOGGER_NAME)
+
+        try:
+            with open(self.path) as state_file:
+                self.assets = json.load(state_file)
+        except FileNotFoundError:
+            self.assets = {}
+        except (OSError, ValueError) as error:
+            logger.warning(f"Could not read the state index at {self.path}, every git asset will be synced: {error}")
+            self.assets = {}
+
+    def save(self):
+        """Write the index to disk, via a temporary file so an interrupted write never corrupts it."""
+        temp_path = f"{self.path}.tmp"
+
+        with self.lock:
+            with open(temp_path, "w") as state_file:
+                json.dump(self.assets, state_file, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+    def is_unchanged(self, key: str, pushed_at: Optional[datetime]) -> bool:
+        """Returns True if GitHub reports the asset hasn't been pushed to since we last synced it."""
+        if not isinstance(pushed_at, datetime):
+            return False
+
+        with self.lock:
+            asset = self.assets.get(key)
+
+        return asset is not None and asset.get("pushed_at") == _format_timestamp(pushed_at)
+
+    def record(self, key: str, pushed_at: Optional[datetime]):
+        """Record that an asset was just synced along with the push time GitHub reported for it."""
+        if not isinstance(pushed_at, datetime):
+            return
+
+        with self.lock:
+            self.assets.setdefault(key, {}).update(
+                pushed_at=_format_timestamp(pushed_at),
+                synced_at=_format_timestamp(datetime.now(timezone.utc)),
+            )
+            self.updated.add(key)
+
+    def record_duration(self, key: str, operation: str, duration: float):
+        """Record how many seconds the last successful git operation of an asset took."""
+        with self.lock:
+            asset = self.assets.setdefault(key, {})
+            asset.setdefault("durations", {})[operation] = round(duration, 1)
+            asset.get("timeouts", {}).pop(operation, None)
+            self.updated.add(key)
+
+    def record_timeout(self, key: str, operation: str, timeout: int):
+        """Record that a git operation of an asset ran out of time, along with the timeout it was given."""
+        with self.lock:
+            self.assets.setdefault(key, {}).setdefault("timeouts", {})[operation] = timeout
+            self.updated.add(key)
+
+    def get_updates(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the entries of the assets recorded during this run."""
+        with self.lock:
+            return {key: self.assets[key] for key in self.updated}
+
+    def merge(self, updates: Dict[str, Dict[str, Any]]):
+        """Take in the entries recorded by another process (eg: a shard) of this run."""
+        with self.lock:
+            self.assets.update(updates)
+            self.updated.update(updates)
+
+    def get_duration(self, key: str, operation: str) -> Optional[float]:
+        """Returns how many seconds the git operation of an asset took the last time it succeeded, if known."""
+        with self.lock:
+            return self.assets.get(key, {}).get("durations", {}).get(operation)
+
+    def get_timeout(self, key: str, operation: str) -> Optional[int]:
+        """Returns the timeout the git operation of an asset ran out of the last time it was attempted, if it did."""
+        with self.lock:
+            return self.assets.get(key, {}).get("timeouts", {}).get(operation)
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    """Format a timestamp consistently regardless of whether it came with a timezone."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    return timestamp.astimezone(timezone.utc).isoformat()
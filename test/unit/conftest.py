@@ -1,3 +1,12 @@
+import json
+import os
+import subprocess  # nosec
+import threading
+import urllib.parse
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
 from unittest.mock import MagicMock
 
 import pytest
@@ -11,6 +20,7 @@ def mock_git_asset():
     mock_git_asset = MagicMock()
     mock_git_asset.id = "123"
     mock_git_asset.name = "mock-asset-name"
+    mock_git_asset.full_name = "mock_username/mock-asset-name"
     mock_git_asset.owner.name = "Mock User Name"
     mock_git_asset.owner.login = "mock_username"
     mock_git_asset.html_url = "mock/html_url"
@@ -18,3 +28,141 @@ def mock_git_asset():
     mock_git_asset.language = "Python"
 
     return mock_git_asset
+
+
+@pytest.fixture
+def repo_payload():
+    """Builds the fields of a repo as they appear in a REST listing response."""
+
+    def build_repo_payload(name, owner="justintime50", fork=False):
+        return {
+            "name": name,
+            "full_name": f"{owner}/{name}",
+            "owner": {"login": owner},
+            "fork": fork,
+            "archived": False,
+            "language": "Python",
+            "html_url": f"https://github.com/{owner}/{name}",
+            "ssh_url": f"git@github.com:{owner}/{name}.git",
+            "pushed_at": "2023-01-01T00:00:00Z",
+            "size": 1024,
+        }
+
+    return build_repo_payload
+
+
+class MockApiServer:
+    """A local stand-in for the GitHub API that serves canned JSON responses and honors conditional requests."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.rate_limit_remaining = 5000
+        self.token_rate_limits = {}
+        self.graphql_resolver = None
+        self.graphql_requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._build_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def add_route(self, path, body, etag=None):
+        """Serve `body` as JSON for requests to `path`, query strings are ignored."""
+        self.routes[path] = (json.dumps(body), etag)
+
+    def set_graphql_resolver(self, resolver):
+        """Answer GraphQL requests with `resolver(query, variables)`, which returns the `data` of the response."""
+        self.graphql_resolver = resolver
+
+    def _build_handler(self):
+        api_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urllib.parse.urlparse(self.path).path
+                api_server.requests.append((path, dict(self.headers)))
+
+                if path not in api_server.routes:
+                    return self._respond(404, json.dumps({"message": "Not Found"}))
+
+                token = self.headers.get("Authorization", "").split(" ")[-1]
+                if token in api_server.token_rate_limits:
+                    if api_server.token_rate_limits[token] <= 0:
+                        return self._respond(403, json.dumps({"message": "API rate limit exceeded"}), remaining=0)
+                    api_server.token_rate_limits[token] -= 1
+                    remaining = api_server.token_rate_limits[token]
+                else:
+                    remaining = None
+
+                body, etag = api_server.routes[path]
+                if etag and self.headers.get("If-None-Match") == etag:
+                    # Conditional requests answered with a 304 don't count against the rate limit
+                    return self._respond(304, None, etag, remaining)
+
+                api_server.rate_limit_remaining -= 1
+                return self._respond(200, body, etag, remaining)
+
+            def do_POST(self):
+                path = urllib.parse.urlparse(self.path).path
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                api_server.requests.append((path, dict(self.headers)))
+
+                if path in api_server.routes:
+                    # Writes such as forks are answered with the canned body of their route
+                    return self._respond(202, api_server.routes[path][0])
+                elif path != "/graphql" or api_server.graphql_resolver is None:
+                    return self._respond(404, json.dumps({"message": "Not Found"}))
+
+                payload = json.loads(body)
+                api_server.graphql_requests.append(payload)
+                data = api_server.graphql_resolver(payload["query"], payload["variables"])
+                return self._respond(200, json.dumps({"data": data}))
+
+            def _respond(self, status, body, etag=None, remaining=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("X-RateLimit-Limit", "5000")
+                self.send_header(
+                    "X-RateLimit-Remaining", str(api_server.rate_limit_remaining if remaining is None else remaining)
+                )
+                self.send_header("X-RateLimit-Reset", "4102444800")
+                if etag:
+                    self.send_header("ETag", etag)
+                encoded_body = body.encode() if body else b""
+                self.send_header("Content-Length", str(len(encoded_body)))
+                self.end_headers()
+                self.wfile.write(encoded_body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def source_repo(tmp_path):
+    """A local repo with a few commits on a `trunk` branch to clone from."""
+    path = os.path.join(tmp_path, "source")
+    os.makedirs(path)
+    git = ["git", "-C", path, "-c", "user.name=mock", "-c", "user.email=mock@example.com"]
+    subprocess.check_output(["git", "init", "--quiet", "--initial-branch=trunk", path])
+    for commit in range(3):
+        with open(os.path.join(path, "file.txt"), "w") as file:
+            file.write(str(commit))
+        subprocess.check_output([*git, "add", "file.txt"])
+        subprocess.check_output([*git, "commit", "--quiet", "-m", f"Commit {commit}"])
+
+    return f"file://{path}"
+
+
+@pytest.fixture
+def mock_api_server():
+    api_server = MockApiServer()
+    api_server.thread.start()
+
+    yield api_server
+
+    api_server.server.shutdown()
+    api_server.server.server_close()
@@ -1,6 +1,15 @@
-from unittest.mock import patch
+import copy
+import os
+import threading
+import time
+from unittest.mock import (
+    ANY,
+    MagicMock,
+    patch,
+)
 
 import pytest
+from github import GithubException
 
 from github_archive import GithubArchive
 from github_archive.archive import (
@@ -8,8 +17,12 @@ from github_archive.archive import (
     GIST_CONTEXT,
     ORG_CONTEXT,
     PULL_OPERATION,
+    STAR_CONTEXT,
     USER_CONTEXT,
 )
+from github_archive.constants import INCOMPLETE_CLONE_MARKER
+from github_archive.pipeline import ArchivePipeline
+from github_archive.records import RepoRecord
 
 
 @pytest.mark.parametrize(
@@ -29,7 +42,7 @@ from github_archive.archive import (
                 "users": "justintime50",
                 "clone": True,
             },
-            "github_archive.archive.iterate_repos_to_archive",
+            "github_archive.archive.queue_repos_to_archive",
         ),
         (
             {
@@ -37,16 +50,18 @@ from github_archive.archive import (
                 "users": "justintime50",
                 "pull": True,
             },
-            "github_archive.archive.iterate_repos_to_archive",
+            "github_archive.archive.queue_repos_to_archive",
         ),
     ],
 )
 @patch("github_archive.archive.Github.get_user")
 @patch("github_archive.archive.GithubArchive.authenticated_user_in_users", return_value=True)
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_with_token(mock_get_all_git_assets, mock_authed_user_in_users, mock_get_user, args, patch_function):
+def test_run_with_token(
+    mock_get_all_git_assets, mock_authed_user_in_users, mock_get_user, args, patch_function, tmp_path
+):
     """Tests running the tool with different params when a token is specified."""
-    github_archive = GithubArchive(**args)
+    github_archive = GithubArchive(**args, location=str(tmp_path))
 
     github_archive.authenticated_username = "justintime50"
     with patch(patch_function) as func:
@@ -59,8 +74,9 @@ def test_run_with_token(mock_get_all_git_assets, mock_authed_user_in_users, mock
 
 @patch("github_archive.archive.view_repos")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_users_view(mock_get_all_git_assets, mock_view_repos):
+def test_run_users_view(mock_get_all_git_assets, mock_view_repos, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         users="justintime50",
         view=True,
     )
@@ -71,10 +87,11 @@ def test_run_users_view(mock_get_all_git_assets, mock_view_repos):
     mock_view_repos.assert_called_once()
 
 
-@patch("github_archive.archive.iterate_repos_to_archive")
+@patch("github_archive.archive.queue_repos_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_users_clone(mock_get_all_git_assets, mock_iterate_repos_to_archive):
+def test_run_users_clone(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         users="justintime50",
         clone=True,
     )
@@ -82,13 +99,16 @@ def test_run_users_clone(mock_get_all_git_assets, mock_iterate_repos_to_archive)
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_repos_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), CLONE_OPERATION)
+    mock_queue_repos_to_archive.assert_called_once_with(
+        github_archive, ANY, USER_CONTEXT, mock_get_all_git_assets(), [CLONE_OPERATION]
+    )
 
 
-@patch("github_archive.archive.iterate_repos_to_archive")
+@patch("github_archive.archive.queue_repos_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_users_pull(mock_get_all_git_assets, mock_iterate_repos_to_archive):
+def test_run_users_pull(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         users="justintime50",
         pull=True,
     )
@@ -96,13 +116,16 @@ def test_run_users_pull(mock_get_all_git_assets, mock_iterate_repos_to_archive):
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_repos_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), PULL_OPERATION)
+    mock_queue_repos_to_archive.assert_called_once_with(
+        github_archive, ANY, USER_CONTEXT, mock_get_all_git_assets(), [PULL_OPERATION]
+    )
 
 
 @patch("github_archive.archive.iterate_repos_to_fork")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_users_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork):
+def test_run_users_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         users="justintime50",
         fork=True,
     )
@@ -115,8 +138,9 @@ def test_run_users_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork):
 
 @patch("github_archive.archive.view_repos")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_orgs_view(mock_get_all_git_assets, mock_view_repos):
+def test_run_orgs_view(mock_get_all_git_assets, mock_view_repos, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         orgs="org1",
         view=True,
     )
@@ -127,10 +151,11 @@ def test_run_orgs_view(mock_get_all_git_assets, mock_view_repos):
     mock_view_repos.assert_called_once()
 
 
-@patch("github_archive.archive.iterate_repos_to_archive")
+@patch("github_archive.archive.queue_repos_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_orgs_clone(mock_get_all_git_assets, mock_iterate_repos_to_archive):
+def test_run_orgs_clone(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         orgs="org1",
         clone=True,
     )
@@ -138,13 +163,16 @@ def test_run_orgs_clone(mock_get_all_git_assets, mock_iterate_repos_to_archive):
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_repos_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), CLONE_OPERATION)
+    mock_queue_repos_to_archive.assert_called_once_with(
+        github_archive, ANY, ORG_CONTEXT, mock_get_all_git_assets(), [CLONE_OPERATION]
+    )
 
 
-@patch("github_archive.archive.iterate_repos_to_archive")
+@patch("github_archive.archive.queue_repos_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_orgs_pull(mock_get_all_git_assets, mock_iterate_repos_to_archive):
+def test_run_orgs_pull(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         orgs="org1",
         pull=True,
     )
@@ -152,13 +180,16 @@ def test_run_orgs_pull(mock_get_all_git_assets, mock_iterate_repos_to_archive):
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_repos_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), PULL_OPERATION)
+    mock_queue_repos_to_archive.assert_called_once_with(
+        github_archive, ANY, ORG_CONTEXT, mock_get_all_git_assets(), [PULL_OPERATION]
+    )
 
 
 @patch("github_archive.archive.iterate_repos_to_fork")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_orgs_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork):
+def test_run_orgs_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         orgs="org1",
         fork=True,
     )
@@ -171,8 +202,9 @@ def test_run_orgs_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork):
 
 @patch("github_archive.archive.view_gists")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_gists_view(mock_get_all_git_assets, mock_view_gists):
+def test_run_gists_view(mock_get_all_git_assets, mock_view_gists, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         gists="justintime50",
         view=True,
     )
@@ -183,10 +215,11 @@ def test_run_gists_view(mock_get_all_git_assets, mock_view_gists):
     mock_view_gists.assert_called_once()
 
 
-@patch("github_archive.archive.iterate_gists_to_archive")
+@patch("github_archive.archive.queue_gists_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_gists_clone(mock_get_all_git_assets, mock_iterate_gists_to_archive):
+def test_run_gists_clone(mock_get_all_git_assets, mock_queue_gists_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         gists="org1",
         clone=True,
     )
@@ -194,13 +227,16 @@ def test_run_gists_clone(mock_get_all_git_assets, mock_iterate_gists_to_archive)
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_gists_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), CLONE_OPERATION)
+    mock_queue_gists_to_archive.assert_called_once_with(
+        github_archive, ANY, GIST_CONTEXT, mock_get_all_git_assets(), [CLONE_OPERATION]
+    )
 
 
-@patch("github_archive.archive.iterate_gists_to_archive")
+@patch("github_archive.archive.queue_gists_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_gists_pull(mock_get_all_git_assets, mock_iterate_gists_to_archive):
+def test_run_gists_pull(mock_get_all_git_assets, mock_queue_gists_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         gists="org1",
         pull=True,
     )
@@ -208,13 +244,16 @@ def test_run_gists_pull(mock_get_all_git_assets, mock_iterate_gists_to_archive):
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_gists_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), PULL_OPERATION)
+    mock_queue_gists_to_archive.assert_called_once_with(
+        github_archive, ANY, GIST_CONTEXT, mock_get_all_git_assets(), [PULL_OPERATION]
+    )
 
 
 @patch("github_archive.archive.iterate_gists_to_fork")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_gists_fork(mock_get_all_git_assets, mock_iterate_gists_to_fork):
+def test_run_gists_fork(mock_get_all_git_assets, mock_iterate_gists_to_fork, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         gists="org1",
         fork=True,
     )
@@ -227,8 +266,9 @@ def test_run_gists_fork(mock_get_all_git_assets, mock_iterate_gists_to_fork):
 
 @patch("github_archive.archive.view_repos")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_stars_view(mock_get_all_git_assets, mock_view_repos):
+def test_run_stars_view(mock_get_all_git_assets, mock_view_repos, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         stars="justintime50",
         view=True,
     )
@@ -239,10 +279,11 @@ def test_run_stars_view(mock_get_all_git_assets, mock_view_repos):
     mock_view_repos.assert_called_once()
 
 
-@patch("github_archive.archive.iterate_repos_to_archive")
+@patch("github_archive.archive.queue_repos_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_stars_clone(mock_get_all_git_assets, mock_iterate_repos_to_archive):
+def test_run_stars_clone(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         stars="justintime50",
         clone=True,
     )
@@ -250,13 +291,16 @@ def test_run_stars_clone(mock_get_all_git_assets, mock_iterate_repos_to_archive)
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_repos_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), CLONE_OPERATION)
+    mock_queue_repos_to_archive.assert_called_once_with(
+        github_archive, ANY, STAR_CONTEXT, mock_get_all_git_assets(), [CLONE_OPERATION]
+    )
 
 
-@patch("github_archive.archive.iterate_repos_to_archive")
+@patch("github_archive.archive.queue_repos_to_archive")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_stars_pull(mock_get_all_git_assets, mock_iterate_repos_to_archive):
+def test_run_stars_pull(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         stars="justintime50",
         pull=True,
     )
@@ -264,13 +308,16 @@ def test_run_stars_pull(mock_get_all_git_assets, mock_iterate_repos_to_archive):
     github_archive.run()
 
     mock_get_all_git_assets.assert_called_once()
-    mock_iterate_repos_to_archive.assert_called_once_with(github_archive, mock_get_all_git_assets(), PULL_OPERATION)
+    mock_queue_repos_to_archive.assert_called_once_with(
+        github_archive, ANY, STAR_CONTEXT, mock_get_all_git_assets(), [PULL_OPERATION]
+    )
 
 
 @patch("github_archive.archive.iterate_repos_to_fork")
 @patch("github_archive.archive.GithubArchive.get_all_git_assets")
-def test_run_stars_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork):
+def test_run_stars_fork(mock_get_all_git_assets, mock_iterate_repos_to_fork, tmp_path):
     github_archive = GithubArchive(
+        location=str(tmp_path),
         stars="justintime50",
         fork=True,
     )
@@ -303,12 +350,84 @@ def test_initialize_project(mock_make_dirs, mock_dir_exist, mock_logger):
         ({"clone": True}, "A list must be provided when a git operation is specified."),
         ({}, "At least one git operation and one list must be provided to run github-archive."),
         (
-            {"users": "justintime50", "clone": True, "include": "mock-repo", "exclude": "another-mock-repo"},
-            "The include and exclude flags are mutually exclusive. Only one can be used on each run.",
+            {"users": "justintime50", "clone": True, "include": "re:github-(archive", "exclude": "re:[a-z]"},
+            "The include and exclude flags contain invalid regexes: re:github-(archive.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "pushed_since": "last tuesday"},
+            "The pushed_since flag must be a date formatted as YYYY-MM-DD.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "archived": "maybe"},
+            "The archived flag must be one of: include, exclude, only.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "depth": 0},
+            "The depth and deepen flags must be a positive number of commits.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "retries": -1},
+            "The retries and retry_backoff flags must not be negative.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "stall_timeout": -1},
+            "The stall_timeout flag must not be negative.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "metrics_port": 70000},
+            "The metrics_port flag must be a valid port.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "http_config": ["http.version=HTTP/2", "core.editor=vim"]},
+            "The http_config flag must be given http.* key=value settings.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "use_https": True, "ssh_multiplex": True},
+            "The ssh_multiplex flag can't be used with the https flag, HTTPS URLs don't go through SSH.",
+        ),
+        (
+            {"node": "node-1", "clone": True, "queue": "queue.db"},
+            "A worker node can't be given lists or git operations, it archives what its coordinator lists.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "nodes": "node-1,node-2"},
+            "The nodes and node flags require the queue flag.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "queue": "queue.db"},
+            "The queue flag requires either the nodes flag of a coordinator or the node flag of a worker.",
+        ),
+        (
+            {"users": "justintime50", "view": True, "queue": "queue.db", "nodes": "node-1"},
+            "A coordinator must be given the clone or pull flag to publish git operations to its workers.",
+        ),
+        (
+            {"node": "node-1", "queue": "queue.db", "queue_backend": "redis"},
+            "The queue_backend flag must be one of: sqlite, filesystem.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "shards": 0},
+            "The shards flag must be at least 1.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "engine": "gevent"},
+            "The engine flag must be one of: threads, asyncio.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "clone_filter": "blob:limit=1m"},
+            "The filter flag must be one of: blob:none, tree:0.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "schedule": "random"},
+            "The schedule flag must be one of: listing, size.",
         ),
         (
-            {"users": "justintime50", "clone": True, "include": "mock-repo", "languages": "python"},
-            "The include and exclude flags cannot be used with the languages flag.",
+            {"users": "justintime50", "clone": True, "backend": "soap"},
+            "The backend flag must be one of: rest, graphql.",
+        ),
+        (
+            {"users": "justintime50", "clone": True, "backend": "graphql"},
+            "The GraphQL backend requires a token, GitHub does not allow anonymous GraphQL requests.",
         ),
     ],
 )
@@ -407,6 +526,243 @@ def test_get_all_gists(mock_get_user, mock_get_gists, mock_github_instance):
     # TODO: Assert the list returned
 
 
+@patch("github_archive.archive.Github.get_user")
+def test_get_all_git_assets_sorted_by_owner(mock_get_user, mock_git_asset):
+    another_git_asset = copy.deepcopy(mock_git_asset)
+    another_git_asset.owner.login = "another_username"
+    mock_git_asset.fork = False
+    another_git_asset.fork = False
+    mock_get_user.return_value.get_repos.return_value = [mock_git_asset, another_git_asset]
+    github_archive = GithubArchive(
+        users="justintime50",
+    )
+
+    git_assets = github_archive.get_all_git_assets(USER_CONTEXT)
+
+    assert [git_asset.owner.login for git_asset in git_assets] == ["another_username", "mock_username"]
+
+
+@patch("github_archive.archive.Github.get_user")
+def test_get_all_git_assets_sorted_by_size(mock_get_user, mock_git_asset):
+    small_git_asset = copy.deepcopy(mock_git_asset)
+    large_git_asset = copy.deepcopy(mock_git_asset)
+    small_git_asset.size = 10
+    large_git_asset.size = 1000
+    small_git_asset.fork = False
+    large_git_asset.fork = False
+    mock_get_user.return_value.get_repos.return_value = [small_git_asset, large_git_asset]
+    github_archive = GithubArchive(
+        users="justintime50",
+        schedule="size",
+    )
+
+    git_assets = github_archive.get_all_git_assets(USER_CONTEXT)
+
+    assert [git_asset.size for git_asset in git_assets] == [1000, 10]
+
+
+@patch("github_archive.archive.Github.get_user")
+def test_iterate_git_assets_excludes_forks(mock_get_user, mock_git_asset):
+    forked_git_asset = copy.deepcopy(mock_git_asset)
+    mock_git_asset.fork = False
+    forked_git_asset.fork = True
+    mock_get_user.return_value.get_repos.return_value = [mock_git_asset, forked_git_asset]
+    github_archive = GithubArchive(
+        users="justintime50",
+    )
+
+    git_assets = list(github_archive.iterate_git_assets(USER_CONTEXT))
+
+    assert len(git_assets) == 1
+    assert isinstance(git_assets[0], RepoRecord)
+    assert git_assets[0].fork is False
+
+
+@patch("github_archive.archive.Github.get_user")
+def test_iterate_git_assets_filters_while_listing(mock_get_user, mock_git_asset):
+    """Tests that filtered out assets are dropped as they are listed, before they can be queued."""
+    filtered_git_asset = copy.deepcopy(mock_git_asset)
+    filtered_git_asset.name = "legacy-repo"
+    mock_git_asset.fork = False
+    filtered_git_asset.fork = False
+    mock_get_user.return_value.get_repos.return_value = [mock_git_asset, filtered_git_asset]
+    github_archive = GithubArchive(
+        users="justintime50",
+        include="mock_username/*",
+        exclude="legacy-*",
+        languages="python",
+    )
+
+    git_assets = list(github_archive.iterate_git_assets(USER_CONTEXT))
+
+    assert [git_asset.name for git_asset in git_assets] == ["mock-asset-name"]
+
+
+@patch("github_archive.archive.Github.get_user")
+def test_iterate_git_assets_filters_gists(mock_get_user, mock_git_asset):
+    filtered_git_asset = copy.deepcopy(mock_git_asset)
+    filtered_git_asset.id = "456"
+    mock_get_user.return_value.get_gists.return_value = [mock_git_asset, filtered_git_asset]
+    github_archive = GithubArchive(
+        gists="justintime50",
+        exclude="456",
+    )
+
+    git_assets = list(github_archive.iterate_git_assets(GIST_CONTEXT))
+
+    assert [git_asset.id for git_asset in git_assets] == ["123"]
+
+
+@patch("github_archive.archive.Github.get_organization")
+def test_iterate_git_assets_concurrent_owners_keep_order(mock_get_organization):
+    """Tests that owners listed concurrently are yielded in the order they were passed, even when the first
+    owner is the slowest to list.
+    """
+    second_owner_listed = threading.Event()
+
+    def get_organization(owner):
+        def get_repos():
+            if owner == "org1":
+                assert second_owner_listed.wait(timeout=5)
+            repo = MagicMock(fork=False)
+            repo.name = f"{owner}-repo"
+            if owner == "org2":
+                second_owner_listed.set()
+            return [repo]
+
+        return MagicMock(get_repos=get_repos)
+
+    mock_get_organization.side_effect = get_organization
+    github_archive = GithubArchive(
+        orgs="org1,org2",
+        api_threads=2,
+    )
+
+    git_assets = list(github_archive.iterate_git_assets(ORG_CONTEXT))
+
+    assert [git_asset.name for git_asset in git_assets] == ["org1-repo", "org2-repo"]
+
+
+@patch("github_archive.archive.OWNER_QUEUE_SIZE", 2)
+@patch("github_archive.archive.Github.get_organization")
+def test_iterate_git_assets_concurrent_owners_are_bounded(mock_get_organization):
+    """Tests that an owner listed ahead of the one being consumed only buffers a few git assets."""
+    listed = {"org1": 0, "org2": 0}
+
+    def get_organization(owner):
+        def get_repos():
+            if owner == "org1":
+                time.sleep(0.5)
+            for index in range(10):
+                listed[owner] += 1
+                repo = MagicMock(fork=False)
+                repo.name = f"{owner}-repo-{index}"
+                yield repo
+
+        return MagicMock(get_repos=get_repos)
+
+    mock_get_organization.side_effect = get_organization
+    github_archive = GithubArchive(
+        orgs="org1,org2",
+        api_threads=2,
+    )
+
+    git_assets = github_archive.iterate_git_assets(ORG_CONTEXT)
+    try:
+        first_name = next(git_assets).name
+        # The queue of the second owner is full, its listing holds one more git asset while waiting for room
+        listed_ahead = listed["org2"]
+        remaining_names = [git_asset.name for git_asset in git_assets]
+    finally:
+        git_assets.close()
+
+    assert first_name == "org1-repo-0"
+    assert listed_ahead == 3
+    assert remaining_names == [f"org1-repo-{index}" for index in range(1, 10)] + [
+        f"org2-repo-{index}" for index in range(10)
+    ]
+
+
+@pytest.mark.parametrize("api_threads", [1, 3])
+@patch("logging.Logger.error")
+@patch("github_archive.archive.Github.get_organization")
+def test_iterate_git_assets_failed_owner(mock_get_organization, mock_logger, api_threads):
+    """Tests that an owner whose listing fails is reported while the other owners are still listed."""
+
+    def get_organization(owner):
+        if owner == "org2":
+            raise GithubException(404, {"message": "Not Found"})
+        repo = MagicMock(fork=False)
+        repo.name = f"{owner}-repo"
+        return MagicMock(get_repos=MagicMock(return_value=[repo]))
+
+    mock_get_organization.side_effect = get_organization
+    github_archive = GithubArchive(
+        orgs="org1,org2,org3",
+        api_threads=api_threads,
+    )
+
+    git_assets = list(github_archive.iterate_git_assets(ORG_CONTEXT))
+
+    assert [git_asset.name for git_asset in git_assets] == ["org1-repo", "org3-repo"]
+    assert github_archive.failed_owners == {ORG_CONTEXT: ["org2"]}
+    mock_logger.assert_called_once()
+
+
+@patch("logging.Logger.error")
+@patch("github_archive.archive.GithubArchive.get_all_git_assets")
+def test_run_reports_failed_owners(mock_get_all_git_assets, mock_logger, tmp_path):
+    github_archive = GithubArchive(
+        location=str(tmp_path),
+        orgs="org1,org2",
+        view=True,
+    )
+    github_archive.failed_owners = {ORG_CONTEXT: ["org2"]}
+
+    github_archive.run()
+
+    mock_logger.assert_called_once_with("Could not retrieve the org git assets of: org2")
+
+
+@patch("github_archive.archive.ArchivePipeline.submit")
+def test_list_git_assets_stream(mock_submit, mock_git_asset):
+    """Tests that streaming queues each asset on the pipeline before the next one is listed."""
+    another_git_asset = copy.deepcopy(mock_git_asset)
+    another_git_asset.name = "another-asset-name"
+    github_archive = GithubArchive(
+        users="justintime50",
+        clone=True,
+        stream=True,
+    )
+    pipeline = ArchivePipeline(github_archive)
+
+    def iterate_git_assets(context):
+        yield mock_git_asset
+        assert mock_submit.call_count == 1
+        yield another_git_asset
+
+    with patch.object(github_archive, "iterate_git_assets", side_effect=iterate_git_assets):
+        git_assets = github_archive.list_git_assets(pipeline, USER_CONTEXT, [CLONE_OPERATION])
+
+    assert git_assets == [mock_git_asset, another_git_asset]
+    assert mock_submit.call_count == 2
+
+
+@patch("github_archive.archive.queue_repos_to_archive")
+@patch("github_archive.archive.GithubArchive.get_all_git_assets")
+def test_list_git_assets_no_stream(mock_get_all_git_assets, mock_queue_repos_to_archive):
+    github_archive = GithubArchive(
+        users="justintime50",
+        clone=True,
+    )
+    pipeline = ArchivePipeline(github_archive)
+
+    git_assets = github_archive.list_git_assets(pipeline, USER_CONTEXT, [CLONE_OPERATION])
+
+    assert git_assets == mock_get_all_git_assets()
+    mock_queue_repos_to_archive.assert_not_called()
+
+
 @patch("os.path.exists", return_value=True)
 @patch("shutil.rmtree")
 @patch("logging.Logger.debug")
@@ -432,3 +788,83 @@ def test_remove_failed_dirs_on_error(mock_logger, mock_chmod, mock_path_exists):
 
     mock_logger.assert_called_once()
     mock_chmod.assert_called_once()
+
+
+def test_remove_failed_dirs_keeps_incomplete_clones(tmp_path):
+    """Tests that partial clones which can be resumed are kept while other failed clones are removed."""
+    os.makedirs(os.path.join(tmp_path, "repos", "mock_username", "partial", ".git"))
+    open(os.path.join(tmp_path, "repos", "mock_username", "partial", ".git", INCOMPLETE_CLONE_MARKER), "w").close()
+    os.makedirs(os.path.join(tmp_path, "repos", "mock_username", "failed", ".git"))
+    github_archive = GithubArchive(location=str(tmp_path))
+
+    github_archive.remove_failed_dirs("repos", ["mock_username/partial", "mock_username/failed"])
+
+    assert os.path.exists(os.path.join(tmp_path, "repos", "mock_username", "partial"))
+    assert not os.path.exists(os.path.join(tmp_path, "repos", "mock_username", "failed"))
+
+
+@patch("github_archive.archive.queue_repos_to_archive")
+@patch("github_archive.archive.GithubArchive.get_all_git_assets")
+def test_run_clone_and_pull_share_pipeline(mock_get_all_git_assets, mock_queue_repos_to_archive, tmp_path):
+    """Tests that cloning and pulling queue each asset once with both operations on the shared pipeline."""
+    github_archive = GithubArchive(
+        location=str(tmp_path),
+        users="justintime50",
+        orgs="org1",
+        stars="justintime50",
+        clone=True,
+        pull=True,
+    )
+
+    github_archive.run()
+
+    assert mock_queue_repos_to_archive.call_count == 3
+    pipelines = {call.args[1] for call in mock_queue_repos_to_archive.call_args_list}
+    assert len(pipelines) == 1
+    assert [call.args[2] for call in mock_queue_repos_to_archive.call_args_list] == [
+        USER_CONTEXT,
+        ORG_CONTEXT,
+        STAR_CONTEXT,
+    ]
+    mock_queue_repos_to_archive.assert_called_with(
+        github_archive, ANY, STAR_CONTEXT, mock_get_all_git_assets(), [CLONE_OPERATION, PULL_OPERATION]
+    )
+
+
+@patch("github_archive.archive.GithubArchive.remove_failed_dirs")
+@patch("github_archive.archive.ArchivePipeline.wait")
+@patch("github_archive.archive.GithubArchive.get_all_git_assets")
+def test_run_removes_failed_clones_per_context(mock_get_all_git_assets, mock_wait, mock_remove_failed_dirs, tmp_path):
+    """Tests that only failed clones are removed and that they are removed from the directory of their context."""
+    mock_wait.return_value = {
+        ORG_CONTEXT: [(CLONE_OPERATION, "org1/repo"), (PULL_OPERATION, "org1/another-repo")],
+        GIST_CONTEXT: [(CLONE_OPERATION, "justintime50/123")],
+    }
+    github_archive = GithubArchive(
+        location=str(tmp_path),
+        orgs="org1",
+        gists="justintime50",
+        clone=True,
+        pull=True,
+    )
+
+    github_archive.run()
+
+    mock_remove_failed_dirs.assert_any_call("repos", ["org1/repo"])
+    mock_remove_failed_dirs.assert_any_call("gists", ["justintime50/123"])
+    assert mock_remove_failed_dirs.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "args, expected_operations",
+    [
+        ({"clone": True}, [CLONE_OPERATION]),
+        ({"pull": True}, [PULL_OPERATION]),
+        ({"clone": True, "pull": True}, [CLONE_OPERATION, PULL_OPERATION]),
+        ({"view": True}, []),
+    ],
+)
+def test_get_git_operations(args, expected_operations):
+    github_archive = GithubArchive(**args)
+
+    assert github_archive.get_git_operations() == expected_operations
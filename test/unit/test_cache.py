@@ -0,0 +1,142 @@
+import os
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from requests import PreparedRequest
+
+from github_archive import GithubArchive
+from github_archive.archive import USER_CONTEXT
+from github_archive.cache import (
+    CachingAdapter,
+    ListingCache,
+)
+from github_archive.ratelimit import TokenPool
+
+
+def _add_user_routes(mock_api_server, repo_payload):
+    mock_api_server.add_route(
+        "/users/justintime50",
+        {"login": "justintime50", "url": f"{mock_api_server.url}/users/justintime50"},
+        etag='"user-etag"',
+    )
+    mock_api_server.add_route(
+        "/users/justintime50/repos",
+        [
+            repo_payload("repo1"),
+            repo_payload("repo2"),
+        ],
+        etag='"repos-etag"',
+    )
+
+
+def test_cache_serves_unchanged_listings(mock_api_server, repo_payload, tmp_path):
+    """Tests that a second run sends conditional requests and serves the 304 responses from the cache."""
+    _add_user_routes(mock_api_server, repo_payload)
+
+    first_run = GithubArchive(users="justintime50", base_url=mock_api_server.url, location=str(tmp_path))
+    first_repos = first_run.get_all_git_assets(USER_CONTEXT)
+    remaining_after_first_run = mock_api_server.rate_limit_remaining
+
+    second_run = GithubArchive(users="justintime50", base_url=mock_api_server.url, location=str(tmp_path))
+    second_repos = second_run.get_all_git_assets(USER_CONTEXT)
+
+    assert [repo.name for repo in first_repos] == ["repo1", "repo2"]
+    assert [repo.name for repo in second_repos] == ["repo1", "repo2"]
+    assert mock_api_server.rate_limit_remaining == remaining_after_first_run
+    assert second_run.github_instance.rate_limiting[0] == remaining_after_first_run
+    conditional_requests = [headers.get("If-None-Match") for _, headers in mock_api_server.requests[2:]]
+    assert conditional_requests == ['"user-etag"', '"repos-etag"']
+
+
+def test_cache_detects_changed_listings(mock_api_server, repo_payload, tmp_path):
+    _add_user_routes(mock_api_server, repo_payload)
+    GithubArchive(users="justintime50", base_url=mock_api_server.url, location=str(tmp_path)).get_all_git_assets(
+        USER_CONTEXT
+    )
+    mock_api_server.add_route(
+        "/users/justintime50/repos",
+        [repo_payload("repo3")],
+        etag='"new-repos-etag"',
+    )
+
+    repos = GithubArchive(
+        users="justintime50", base_url=mock_api_server.url, location=str(tmp_path)
+    ).get_all_git_assets(USER_CONTEXT)
+
+    assert [repo.name for repo in repos] == ["repo3"]
+
+
+def test_no_cache(mock_api_server, repo_payload, tmp_path):
+    _add_user_routes(mock_api_server, repo_payload)
+
+    for _ in range(2):
+        GithubArchive(
+            users="justintime50",
+            base_url=mock_api_server.url,
+            location=str(tmp_path),
+            cache=False,
+        ).get_all_git_assets(USER_CONTEXT)
+
+    assert all("If-None-Match" not in headers for _, headers in mock_api_server.requests)
+    assert not os.path.exists(os.path.join(tmp_path, "cache"))
+
+
+def test_listing_cache_expired_entry(tmp_path):
+    cache = ListingCache(str(tmp_path), ttl=60)
+    cache.set("mock-key", '"etag"', {}, "[]")
+    expired = time.time() - 120
+    os.utime(os.path.join(cache.directory, "mock-key.json"), (expired, expired))
+
+    assert cache.get("mock-key") is None
+    assert not os.path.exists(os.path.join(cache.directory, "mock-key.json"))
+
+
+def test_listing_cache_prune(tmp_path):
+    cache = ListingCache(str(tmp_path), ttl=60)
+    cache.set("expired-key", '"etag"', {}, "[]")
+    cache.set("fresh-key", '"etag"', {}, "[]")
+    expired = time.time() - 120
+    os.utime(os.path.join(cache.directory, "expired-key.json"), (expired, expired))
+
+    cache.prune()
+
+    assert os.listdir(cache.directory) == ["fresh-key.json"]
+
+
+def test_listing_cache_key_includes_credentials():
+    assert ListingCache.key("https://api.github.com/user/repos", "token 123") != ListingCache.key(
+        "https://api.github.com/user/repos", "token 456"
+    )
+
+
+def test_caching_adapter_ignores_non_get_requests():
+    cache = MagicMock()
+    adapter = CachingAdapter(cache, TokenPool([]))
+    request = PreparedRequest()
+    request.prepare(method="POST", url="http://127.0.0.1:1/repos/mock/fork")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        adapter.send(request, timeout=0.01)
+
+    cache.get.assert_not_called()
+
+
+def test_caching_adapter_keys_on_sent_token():
+    """Tests that the cache key uses the token the pool picked rather than the one PyGithub set."""
+    cache = MagicMock()
+    cache.get.return_value = None
+    adapter = CachingAdapter(cache, TokenPool(["token-a", "token-b"]))
+    exhausted_response = requests.Response()
+    exhausted_response.headers.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "4102444800"})
+    adapter.token_pool.update("token-a", "core", exhausted_response)
+    request = PreparedRequest()
+    request.prepare(
+        method="GET", url="http://127.0.0.1:1/users/justintime50/repos", headers={"Authorization": "token token-a"}
+    )
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        adapter.send(request, timeout=0.01)
+
+    cache.key.assert_called_once_with("http://127.0.0.1:1/users/justintime50/repos", "token token-b")
@@ -0,0 +1,177 @@
+import threading
+import time
+from datetime import (
+    datetime,
+    timezone,
+)
+from unittest.mock import (
+    patch,
+)
+
+import pytest
+
+from github_archive import GithubArchive
+from github_archive.archive import (
+    CLONE_OPERATION,
+    PULL_OPERATION,
+    USER_CONTEXT,
+)
+from github_archive.concurrency import (
+    AdaptiveLimiter,
+    ConcurrencyController,
+    Sample,
+)
+from github_archive.pipeline import ArchivePipeline
+from github_archive.repos import _archive_repo
+
+
+def _sample(throughput=1.0, error_rate=0.0, load_per_cpu=0.0, disk_latency=0.0, saturated=False):
+    return Sample(
+        throughput=throughput,
+        error_rate=error_rate,
+        load_per_cpu=load_per_cpu,
+        disk_latency=disk_latency,
+        saturated=saturated,
+    )
+
+
+@pytest.fixture
+def controller():
+    github_archive = GithubArchive(threads=10, min_threads=2)
+    controller = ConcurrencyController(github_archive)
+    controller.limiter.resize(6)
+
+    return controller
+
+
+def test_limiter_blocks_until_resized():
+    limiter = AdaptiveLimiter(1)
+    entered = threading.Event()
+
+    def enter():
+        with limiter:
+            entered.set()
+
+    with limiter:
+        thread = threading.Thread(target=enter)
+        thread.start()
+        assert not entered.wait(timeout=0.1)
+
+        limiter.resize(2)
+        assert entered.wait(timeout=5)
+
+    thread.join()
+    assert limiter.in_flight == 0
+
+
+def test_controller_initial_limit_is_clamped():
+    with patch("os.cpu_count", return_value=64):
+        controller = ConcurrencyController(GithubArchive(threads=8, min_threads=2))
+
+    assert controller.limiter.limit == 8
+
+
+@pytest.mark.parametrize(
+    "sample, expected_limit",
+    [
+        (_sample(error_rate=0.5), 3),
+        (_sample(load_per_cpu=3.0), 5),
+        (_sample(disk_latency=2.0), 5),
+        (_sample(saturated=True), 7),
+        (_sample(), 6),
+    ],
+)
+def test_adjust(controller, sample, expected_limit):
+    controller.adjust(sample)
+
+    assert controller.limiter.limit == expected_limit
+
+
+def test_adjust_backs_off_when_throughput_drops_after_increase(controller):
+    controller.adjust(_sample(throughput=4.0, saturated=True))
+    controller.adjust(_sample(throughput=3.0, saturated=True))
+
+    assert controller.limiter.limit == 6
+
+
+def test_adjust_stays_within_bounds(controller):
+    for _ in range(5):
+        controller.adjust(_sample(error_rate=1.0))
+    assert controller.limiter.limit == 2
+
+    for throughput in range(20):
+        controller.adjust(_sample(throughput=throughput, saturated=True))
+    assert controller.limiter.limit == 10
+
+
+def test_sample_resets_counters(controller):
+    controller.record(failed=False)
+    controller.record(failed=True)
+
+    sample = controller.sample()
+
+    assert sample.throughput == 2 / controller.interval
+    assert sample.error_rate == 0.5
+    assert controller.sample().throughput == 0
+
+
+def test_pipeline_respects_controller_limit():
+    github_archive = GithubArchive(threads=4, adaptive=True, min_threads=1)
+    github_archive.controller = ConcurrencyController(github_archive)
+    github_archive.controller.limiter.resize(1)
+    pipeline = ArchivePipeline(github_archive)
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def archive_function(operation):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    for _ in range(4):
+        pipeline.submit(USER_CONTEXT, archive_function, [CLONE_OPERATION])
+    pipeline.wait()
+
+    assert max_running == 1
+    # Nothing ran git, so nothing was sampled
+    assert github_archive.controller.completed == 0
+
+
+@patch("subprocess.check_output")
+@patch("os.path.exists", return_value=True)
+def test_controller_only_samples_operations_that_ran_git(mock_path_exists, mock_subprocess, mock_git_asset):
+    """Tests that a skipped pull doesn't count as a completed operation while a pull that ran does."""
+    mock_git_asset.pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    github_archive = GithubArchive(threads=4, adaptive=True)
+    github_archive.controller = ConcurrencyController(github_archive)
+    github_archive.state.record("repos/mock_username/mock-asset-name", mock_git_asset.pushed_at)
+    pipeline = ArchivePipeline(github_archive)
+
+    pipeline.submit(
+        USER_CONTEXT,
+        _archive_repo,
+        [PULL_OPERATION],
+        github_archive=github_archive,
+        repo=mock_git_asset,
+        repo_path="mock/path",
+    )
+    pipeline.wait()
+    assert github_archive.controller.completed == 0
+
+    mock_git_asset.pushed_at = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    pipeline = ArchivePipeline(github_archive)
+    pipeline.submit(
+        USER_CONTEXT,
+        _archive_repo,
+        [PULL_OPERATION],
+        github_archive=github_archive,
+        repo=mock_git_asset,
+        repo_path="mock/path",
+    )
+    pipeline.wait()
+    assert github_archive.controller.completed == 1
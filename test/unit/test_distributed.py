@@ -0,0 +1,195 @@
+import os
+import subprocess  # nosec
+import sys
+from datetime import (
+    datetime,
+    timezone,
+)
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+import pytest
+
+from github_archive import GithubArchive
+from github_archive.constants import (
+    CLONE_OPERATION,
+    PULL_OPERATION,
+)
+from github_archive.distributed import (
+    FilesystemWorkQueue,
+    HashRing,
+    SqliteWorkQueue,
+    WorkQueue,
+    _dump_asset,
+    _load_asset,
+    wait_for_run,
+)
+from github_archive.records import (
+    GistRecord,
+    OwnerRecord,
+    RepoRecord,
+)
+
+
+def _build_repo(name, url):
+    return RepoRecord(
+        name,
+        f"mock_username/{name}",
+        OwnerRecord("mock_username"),
+        False,
+        False,
+        "Python",
+        url,
+        url,
+        datetime(2026, 1, 1, tzinfo=timezone.utc),
+        1,
+    )
+
+
+def test_hash_ring_is_consistent():
+    """Tests that assets spread across nodes and adding a node only moves assets to that node."""
+    keys = [f"mock_username/mock-repo-{index}" for index in range(1000)]
+    nodes = [HashRing(["node-1", "node-2", "node-3"]).get_node(key) for key in keys]
+    grown_nodes = [HashRing(["node-1", "node-2", "node-3", "node-4"]).get_node(key) for key in keys]
+
+    assert nodes == [HashRing(["node-3", "node-2", "node-1"]).get_node(key) for key in keys]
+    assert all(nodes.count(node) > 200 for node in ["node-1", "node-2", "node-3"])
+    assert {grown for node, grown in zip(nodes, grown_nodes) if node != grown} == {"node-4"}
+    assert 150 < grown_nodes.count("node-4") < 350
+
+
+@pytest.mark.parametrize("work_queue_class, filename", [(SqliteWorkQueue, "queue.db"), (FilesystemWorkQueue, "queue")])
+def test_work_queue(work_queue_class, filename, tmp_path):
+    path = os.path.join(tmp_path, filename)
+    coordinator_queue = work_queue_class(path)
+    worker_queue = work_queue_class(path)
+    assert worker_queue.get_run() is None
+
+    coordinator_queue.open([CLONE_OPERATION])
+    coordinator_queue.publish([("node-1", {"asset": 1}), ("node-2", {"asset": 2}), ("node-1", {"asset": 3})])
+
+    run_id, operations = worker_queue.get_run()
+    assert operations == [CLONE_OPERATION]
+    assert worker_queue.claim("node-1") == [{"asset": 1}, {"asset": 3}]
+    assert worker_queue.claim("node-1") == []
+    assert not worker_queue.is_closed()
+
+    # A restarted worker gets back what it claimed, unlike a worker that finished
+    coordinator_queue.close()
+    worker_queue.recover("node-1")
+    assert worker_queue.claim("node-1") == [{"asset": 1}, {"asset": 3}]
+    worker_queue.complete("node-1", run_id)
+    worker_queue.recover("node-1")
+    assert worker_queue.claim("node-1") == []
+    assert worker_queue.claim("node-2") == [{"asset": 2}]
+    assert worker_queue.is_closed()
+    assert worker_queue.is_completed("node-1", run_id)
+    assert not worker_queue.is_completed("node-2", run_id)
+
+    # Opening the queue starts a new run
+    coordinator_queue.open([PULL_OPERATION])
+    new_run_id, operations = worker_queue.get_run()
+    assert new_run_id != run_id
+    assert operations == [PULL_OPERATION]
+    assert not worker_queue.is_closed()
+    assert not worker_queue.is_completed("node-1", new_run_id)
+    assert worker_queue.claim("node-2") == []
+
+    # Completing a run that was replaced doesn't complete the new one
+    worker_queue.complete("node-2", run_id)
+    assert not worker_queue.is_completed("node-2", new_run_id)
+
+
+@pytest.mark.parametrize("work_queue_class, filename", [(SqliteWorkQueue, "queue.db"), (FilesystemWorkQueue, "queue")])
+@patch("time.sleep")
+def test_wait_for_run_skips_completed_run(mock_sleep, work_queue_class, filename, tmp_path):
+    """Tests that a worker started before its coordinator waits for the next run instead of finding the last one."""
+    path = os.path.join(tmp_path, filename)
+    coordinator_queue = work_queue_class(path)
+    worker_queue = work_queue_class(path)
+    coordinator_queue.open([CLONE_OPERATION])
+    coordinator_queue.close()
+    previous_run_id, _ = worker_queue.get_run()
+    worker_queue.complete("node-1", previous_run_id)
+    mock_sleep.side_effect = lambda _: coordinator_queue.open([PULL_OPERATION])
+
+    run_id, operations = wait_for_run(worker_queue, "node-1")
+
+    assert run_id != previous_run_id
+    assert operations == [PULL_OPERATION]
+    mock_sleep.assert_called_once()
+
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()
+
+
+def test_dump_and_load_assets():
+    repo = _build_repo("mock-repo", "mock/html_url")
+    gist = GistRecord("123", OwnerRecord("mock_username"), "mock/html_url", None)
+
+    loaded_repo = _load_asset(_dump_asset(repo))
+    loaded_gist = _load_asset(_dump_asset(gist))
+
+    assert isinstance(loaded_repo, RepoRecord)
+    assert [getattr(loaded_repo, field) for field in RepoRecord.__slots__ if field != "owner"] == [
+        getattr(repo, field) for field in RepoRecord.__slots__ if field != "owner"
+    ]
+    assert loaded_repo.owner.login == "mock_username"
+    assert isinstance(loaded_gist, GistRecord)
+    assert (loaded_gist.id, loaded_gist.updated_at) == ("123", None)
+
+
+@pytest.mark.parametrize("queue_backend, filename", [("sqlite", "queue.db"), ("filesystem", "queue")])
+def test_coordinator_and_workers(queue_backend, filename, source_repo, tmp_path):
+    """Tests a coordinator publishing repos to workers running in processes of their own, each repo is archived
+    by the node it hashes to.
+    """
+    queue_path = os.path.join(tmp_path, filename)
+    # Both nodes get some of these
+    names = [f"repo-{index}" for index in range(5)]
+    workers = {
+        node: subprocess.Popen(  # nosec
+            [
+                sys.executable,
+                "-m",
+                "github_archive.cli",
+                "--queue",
+                queue_path,
+                "--queue_backend",
+                queue_backend,
+                "--node",
+                node,
+                "--location",
+                os.path.join(tmp_path, node),
+                "--https",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for node in ["node-1", "node-2"]
+    }
+    coordinator = GithubArchive(
+        users="mock_username",
+        clone=True,
+        location=os.path.join(tmp_path, "coordinator"),
+        queue=queue_path,
+        queue_backend=queue_backend,
+        nodes="node-1,node-2",
+    )
+    coordinator.iterate_git_assets = MagicMock(return_value=iter([_build_repo(name, source_repo) for name in names]))
+
+    coordinator.run()
+
+    for worker in workers.values():
+        assert worker.wait(timeout=60) == 0
+    ring = HashRing(["node-1", "node-2"])
+    for name in names:
+        node = ring.get_node(f"mock_username/{name}")
+        other_node = "node-2" if node == "node-1" else "node-1"
+        assert os.path.isdir(os.path.join(tmp_path, node, "repos", "mock_username", name, ".git"))
+        assert not os.path.exists(os.path.join(tmp_path, other_node, "repos", "mock_username", name))
+    assert not os.path.exists(os.path.join(tmp_path, "coordinator", "repos", "mock_username"))
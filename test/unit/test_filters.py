@@ -0,0 +1,130 @@
+from datetime import (
+    datetime,
+    timezone,
+)
+
+import pytest
+
+from github_archive.filters import (
+    AssetFilter,
+    NamePatterns,
+    get_invalid_patterns,
+    parse_date,
+)
+from github_archive.records import (
+    GistRecord,
+    OwnerRecord,
+    RepoRecord,
+)
+
+
+def _repo(name="github-archive", owner="justintime50", language="Python", size=1024, archived=False, pushed_at=None):
+    return RepoRecord(
+        name=name,
+        full_name=f"{owner}/{name}",
+        owner=OwnerRecord(owner),
+        fork=False,
+        archived=archived,
+        language=language,
+        html_url=f"https://github.com/{owner}/{name}",
+        ssh_url=f"git@github.com:{owner}/{name}.git",
+        pushed_at=pushed_at or datetime(2023, 6, 1, tzinfo=timezone.utc),
+        size=size,
+    )
+
+
+def _gist(id="abc123", updated_at=None):
+    return GistRecord(
+        id=id,
+        owner=OwnerRecord("justintime50"),
+        html_url=f"https://gist.github.com/{id}",
+        updated_at=updated_at or datetime(2023, 6, 1, tzinfo=timezone.utc),
+    )
+
+
+@pytest.mark.parametrize(
+    "pattern, owner, name, expected_match",
+    [
+        ("github-archive", "justintime50", "github-archive", True),
+        ("GitHub-Archive", "justintime50", "github-archive", True),
+        ("github-archive", "justintime50", "github-archive-2", False),
+        ("github-*", "justintime50", "github-archive", True),
+        ("github-*", "justintime50", "my-github-archive", False),
+        ("justintime50/github-archive", "justintime50", "github-archive", True),
+        ("justintime50/github-archive", "another-user", "github-archive", False),
+        ("justintime50/*", "justintime50", "anything", True),
+        ("re:^github-(archive|serve)$", "justintime50", "github-serve", True),
+        ("re:archive", "justintime50", "github-archive", True),
+        ("re:^justintime50/", "justintime50", "github-archive", True),
+        ("re:^justintime50/", "another-user", "github-archive", False),
+    ],
+)
+def test_name_patterns(pattern, owner, name, expected_match):
+    assert NamePatterns([pattern]).matches(owner, name) is expected_match
+
+
+def test_name_patterns_compiled_separately():
+    """Tests that regexes keep their inline flags and backreferences, which merging them into one would break."""
+    name_patterns = NamePatterns([r"re:(?i)^foo", r"re:^(a)\1$", r"re:^(b)\1$"])
+
+    assert name_patterns.matches("justintime50", "foo-bar")
+    assert name_patterns.matches("justintime50", "bb")
+    assert not name_patterns.matches("justintime50", "ab")
+
+
+def test_name_patterns_empty():
+    assert not NamePatterns(["", " "])
+
+
+def test_asset_filter_without_options_keeps_everything():
+    asset_filter = AssetFilter()
+
+    assert asset_filter.matches_repo(_repo(language=None, size=None, archived=True))
+    assert asset_filter.matches_gist(_gist())
+
+
+def test_asset_filter_combines_include_exclude_and_languages():
+    asset_filter = AssetFilter(include=["justintime50/*"], exclude=["re:-old$"], languages=["python"])
+
+    assert asset_filter.matches_repo(_repo())
+    assert not asset_filter.matches_repo(_repo(name="github-archive-old"))
+    assert not asset_filter.matches_repo(_repo(owner="another-user"))
+    assert not asset_filter.matches_repo(_repo(language="Go"))
+    assert not asset_filter.matches_repo(_repo(language=None))
+
+
+@pytest.mark.parametrize(
+    "options, repo, expected_match",
+    [
+        ({"min_size": 100}, _repo(size=1024), True),
+        ({"min_size": 2048}, _repo(size=1024), False),
+        ({"max_size": 2048}, _repo(size=1024), True),
+        ({"max_size": 100}, _repo(size=1024), False),
+        ({"archived": "exclude"}, _repo(archived=True), False),
+        ({"archived": "only"}, _repo(archived=False), False),
+        ({"archived": "only"}, _repo(archived=True), True),
+        ({"pushed_since": datetime(2023, 1, 1)}, _repo(), True),
+        ({"pushed_since": datetime(2024, 1, 1)}, _repo(), False),
+    ],
+)
+def test_asset_filter_repo_predicates(options, repo, expected_match):
+    assert AssetFilter(**options).matches_repo(repo) is expected_match
+
+
+def test_asset_filter_gists():
+    """Tests that gists are filtered by ID and update time but ignore the repo only predicates."""
+    asset_filter = AssetFilter(exclude=["abc123"], languages=["python"], pushed_since=datetime(2023, 1, 1))
+
+    assert asset_filter.matches_gist(_gist(id="def456"))
+    assert not asset_filter.matches_gist(_gist(id="abc123"))
+    assert not asset_filter.matches_gist(_gist(id="def456", updated_at=datetime(2022, 1, 1, tzinfo=timezone.utc)))
+
+
+def test_parse_date():
+    assert parse_date("2023-01-01") == datetime(2023, 1, 1, tzinfo=timezone.utc)
+    assert parse_date("not a date") is None
+
+
+def test_get_invalid_patterns():
+    assert get_invalid_patterns(["github-*", "re:^github-", "re:(unclosed"]) == ["re:(unclosed"]
+    assert get_invalid_patterns(["re:(?i)foo", "re:^(a)\\1$"]) == []
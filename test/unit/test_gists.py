@@ -1,4 +1,9 @@
+import os
 import subprocess
+from datetime import (
+    datetime,
+    timezone,
+)
 from unittest.mock import (
     MagicMock,
     patch,
@@ -9,28 +14,37 @@ from github import Gist
 from github_archive import GithubArchive
 from github_archive.archive import (
     CLONE_OPERATION,
+    GIST_CONTEXT,
     PULL_OPERATION,
 )
 from github_archive.gists import (
     _archive_gist,
     _fork_gist,
-    iterate_gists_to_archive,
     iterate_gists_to_fork,
+    queue_gists_to_archive,
     view_gists,
 )
 
 
 @patch("github_archive.archive.Github")
-@patch("github_archive.gists._archive_gist")
-def test_iterate_gists(mock_archive_gist, mock_github_instance, mock_git_asset):
+def test_queue_gists(mock_github_instance, mock_git_asset):
     gists = [mock_git_asset]
     github_archive = GithubArchive(
         gists="mock_username",
     )
-
-    iterate_gists_to_archive(github_archive, gists, CLONE_OPERATION)
-
-    mock_archive_gist.assert_called()
+    pipeline = MagicMock()
+
+    queue_gists_to_archive(github_archive, pipeline, GIST_CONTEXT, gists, [CLONE_OPERATION])
+
+    pipeline.submit.assert_called_once_with(
+        GIST_CONTEXT,
+        _archive_gist,
+        [CLONE_OPERATION],
+        asset_path=os.path.join(github_archive.location, "gists", "123"),
+        github_archive=github_archive,
+        gist=mock_git_asset,
+        gist_path=os.path.join(github_archive.location, "gists", "123"),
+    )
 
 
 @patch("subprocess.check_output")
@@ -61,12 +75,24 @@ def test_archive_gist_clone_exists(mock_logger, mock_subprocess, mock_path_exist
     mock_subprocess.assert_not_called()
 
 
+@patch("os.path.exists", return_value=True)
+@patch("subprocess.check_output")
+def test_archive_gist_pull_unchanged_skipped(mock_subprocess, mock_path_exists, mock_git_asset):
+    """Tests that we don't pull a gist GitHub reports hasn't been updated since the last sync."""
+    mock_git_asset.updated_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    github_archive = GithubArchive()
+    github_archive.state.record("gists/123", mock_git_asset.updated_at)
+    _archive_gist(github_archive, mock_git_asset, "mock/path", PULL_OPERATION)
+
+    mock_subprocess.assert_not_called()
+
+
 @patch("subprocess.check_output", side_effect=subprocess.TimeoutExpired(cmd="subprocess.check_output", timeout=0.1))
 @patch("logging.Logger.error")
 def test_archive_gist_timeout_exception(mock_logger, mock_subprocess, mock_git_asset):
     operation = CLONE_OPERATION
     message = f"Git operation timed out archiving {mock_git_asset.id}."
-    github_archive = GithubArchive()
+    github_archive = GithubArchive(retries=0)
     _archive_gist(github_archive, mock_git_asset, "mock/path", operation)
 
     mock_logger.assert_called_with(message)
@@ -78,7 +104,7 @@ def test_archive_gist_timeout_exception(mock_logger, mock_subprocess, mock_git_a
 @patch("logging.Logger.error")
 def test_archive_gist_called_process_error(mock_logger, mock_subprocess, mock_git_asset):
     operation = PULL_OPERATION
-    github_archive = GithubArchive()
+    github_archive = GithubArchive(retries=0)
     _archive_gist(github_archive, mock_git_asset, "github_archive", operation)
 
     mock_logger.assert_called()
@@ -107,10 +133,9 @@ def test_iterate_gists_to_fork(mock_fork_gist, mock_github_instance):
 
 @patch("logging.Logger.info")
 @patch("github.Gist.Gist.create_fork")
-def test_fork_gist_success(mock_create_fork, mock_logger):
-    gist = MagicMock(spec=Gist.Gist)
-    gist.create_fork = mock_create_fork
-    _fork_gist(gist)
+def test_fork_gist_success(mock_create_fork, mock_logger, mock_git_asset):
+    github_archive = GithubArchive()
+    _fork_gist(github_archive, mock_git_asset)
 
     mock_create_fork.assert_called_once()
     mock_logger.assert_called_once()
@@ -118,10 +143,21 @@ def test_fork_gist_success(mock_create_fork, mock_logger):
 
 @patch("logging.Logger.warning")
 @patch("github.Gist.Gist.create_fork", side_effect=Exception())
-def test_fork_gist_failure(mock_create_fork, mock_logger):
-    gist = MagicMock(spec=Gist.Gist)
-    gist.create_fork = mock_create_fork
-    _fork_gist(gist)
+def test_fork_gist_failure(mock_create_fork, mock_logger, mock_git_asset):
+    github_archive = GithubArchive()
+    _fork_gist(github_archive, mock_git_asset)
 
     mock_create_fork.assert_called_once()
     mock_logger.assert_called_once()
+
+
+def test_fork_gist_is_rate_limited(mock_api_server, tmp_path):
+    """Tests that forks are sent through the rate limited adapter of the run rather than a connection of their own."""
+    mock_api_server.add_route("/gists/123/forks", {"id": "456"})
+    github_archive = GithubArchive(base_url=mock_api_server.url, location=str(tmp_path), cache=False)
+    gist = MagicMock(id="123")
+
+    _fork_gist(github_archive, gist)
+
+    assert [path for path, _ in mock_api_server.requests] == ["/gists/123/forks"]
+    assert 'github_archive_api_request_duration_seconds_count{resource="core"} 1' in github_archive.metrics.render()
@@ -0,0 +1,570 @@
+import asyncio
+import functools
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import (
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from unittest.mock import patch
+
+import pytest
+
+from github_archive import GithubArchive
+from github_archive.archive import (
+    CLONE_OPERATION,
+    PULL_OPERATION,
+)
+from github_archive.constants import INCOMPLETE_CLONE_MARKER
+from github_archive.git import (
+    GitJob,
+    GitStalledError,
+    _run_streaming,
+    _run_streaming_async,
+    build_git_command,
+    get_asset_dir_name,
+    get_git_timeout,
+    get_retry_delay,
+    is_incomplete_clone,
+    is_transient_git_error,
+    resume_clone,
+    run_git_command,
+    run_git_command_async,
+    run_git_job,
+)
+from github_archive.progress import ProgressTracker
+from github_archive.repos import _archive_repo_async
+
+
+@pytest.mark.parametrize(
+    "mirror, operation, expected_command",
+    [
+        (False, CLONE_OPERATION, ["git", "clone", "mock/url", "mock/path"]),
+        (False, PULL_OPERATION, ["git", "-C", "mock/path", "pull", "--rebase"]),
+        (True, CLONE_OPERATION, ["git", "clone", "--mirror", "mock/url", "mock/path"]),
+        (True, PULL_OPERATION, ["git", "-C", "mock/path", "remote", "update", "--prune"]),
+    ],
+)
+def test_build_git_command(mirror, operation, expected_command):
+    github_archive = GithubArchive(mirror=mirror)
+
+    assert build_git_command(github_archive, operation, "mock/url", "mock/path") == expected_command
+
+
+@pytest.mark.parametrize(
+    "args, operation, size, expected_command",
+    [
+        ({"depth": 1}, CLONE_OPERATION, 10, ["git", "clone", "--depth", "1", "mock/url", "mock/path"]),
+        (
+            {"clone_filter": "blob:none"},
+            CLONE_OPERATION,
+            10,
+            ["git", "clone", "--filter=blob:none", "mock/url", "mock/path"],
+        ),
+        (
+            {"mirror": True, "clone_filter": "tree:0"},
+            CLONE_OPERATION,
+            None,
+            ["git", "clone", "--mirror", "--filter=tree:0", "mock/url", "mock/path"],
+        ),
+        ({"depth": 1, "strategy_threshold": 100}, CLONE_OPERATION, 10, ["git", "clone", "mock/url", "mock/path"]),
+        (
+            {"depth": 1, "strategy_threshold": 100},
+            CLONE_OPERATION,
+            100,
+            ["git", "clone", "--depth", "1", "mock/url", "mock/path"],
+        ),
+        ({"depth": 1, "strategy_threshold": 100}, CLONE_OPERATION, None, ["git", "clone", "mock/url", "mock/path"]),
+        ({"deepen": 50}, PULL_OPERATION, 10, ["git", "-C", "mock/path", "pull", "--rebase", "--deepen", "50"]),
+        (
+            {"mirror": True, "deepen": 50},
+            PULL_OPERATION,
+            10,
+            ["git", "-C", "mock/path", "fetch", "--prune", "--deepen", "50"],
+        ),
+    ],
+)
+def test_build_git_command_strategies(args, operation, size, expected_command):
+    github_archive = GithubArchive(**args)
+
+    assert build_git_command(github_archive, operation, "mock/url", "mock/path", size=size) == expected_command
+
+
+@pytest.mark.parametrize(
+    "mirror, expected_dir_name",
+    [
+        (False, "mock-asset-name"),
+        (True, "mock-asset-name.git"),
+    ],
+)
+def test_get_asset_dir_name(mirror, expected_dir_name):
+    github_archive = GithubArchive(mirror=mirror)
+
+    assert get_asset_dir_name(github_archive, "mock-asset-name") == expected_dir_name
+
+
+def _git(*args):
+    subprocess.check_output(
+        ["git", "-c", "user.name=mock", "-c", "user.email=mock@example.com", *args],
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+
+
+def test_mirror_clone_and_update(tmp_path):
+    """Tests the mirror commands against a local repo: the clone is bare and updating it prunes deleted refs."""
+    source_path = os.path.join(tmp_path, "source")
+    mirror_path = os.path.join(tmp_path, "mirror.git")
+    _git("init", "-q", "-b", "main", source_path)
+    _git("-C", source_path, "commit", "-q", "--allow-empty", "-m", "first")
+    _git("-C", source_path, "branch", "feature")
+    github_archive = GithubArchive(mirror=True)
+
+    _git(*build_git_command(github_archive, CLONE_OPERATION, source_path, mirror_path)[1:])
+    _git("-C", source_path, "commit", "-q", "--allow-empty", "-m", "second")
+    _git("-C", source_path, "branch", "-q", "-D", "feature")
+    _git(*build_git_command(github_archive, PULL_OPERATION, source_path, mirror_path)[1:])
+
+    assert not os.path.exists(os.path.join(mirror_path, ".git"))
+    branches = subprocess.check_output(["git", "-C", mirror_path, "branch", "--format=%(refname:short)"], text=True)
+    assert branches.split() == ["main"]
+    log = subprocess.check_output(["git", "-C", mirror_path, "log", "--format=%s", "main"], text=True)
+    assert log.split() == ["second", "first"]
+
+
+def test_shallow_clone_and_deepen(tmp_path):
+    """Tests against a local repo that a shallow clone only has the requested history and that pulls deepen it."""
+    source_path = os.path.join(tmp_path, "source")
+    clone_path = os.path.join(tmp_path, "clone")
+    _git("init", "-q", "-b", "main", source_path)
+    for message in ["first", "second", "third"]:
+        _git("-C", source_path, "commit", "-q", "--allow-empty", "-m", message)
+    github_archive = GithubArchive(depth=1, deepen=1)
+
+    _git(*build_git_command(github_archive, CLONE_OPERATION, f"file://{source_path}", clone_path)[1:])
+    shallow_log = subprocess.check_output(["git", "-C", clone_path, "log", "--format=%s"], text=True)
+    _git(*build_git_command(github_archive, PULL_OPERATION, f"file://{source_path}", clone_path)[1:])
+    deepened_log = subprocess.check_output(["git", "-C", clone_path, "log", "--format=%s"], text=True)
+
+    assert shallow_log.split() == ["third"]
+    assert deepened_log.split() == ["third", "second"]
+
+
+@pytest.mark.parametrize(
+    "mirror, operation, expected_command",
+    [
+        (False, CLONE_OPERATION, ["git", "clone", "--progress", "mock/url", "mock/path"]),
+        (False, PULL_OPERATION, ["git", "-C", "mock/path", "pull", "--rebase", "--progress"]),
+        # Mirrors are updated with a command that can't report its progress
+        (True, PULL_OPERATION, ["git", "-C", "mock/path", "remote", "update", "--prune"]),
+    ],
+)
+def test_build_git_command_stall_timeout(mirror, operation, expected_command):
+    github_archive = GithubArchive(mirror=mirror, stall_timeout=60)
+
+    assert build_git_command(github_archive, operation, "mock/url", "mock/path") == expected_command
+
+
+@pytest.mark.parametrize(
+    "args, operation, duration, size, expected_timeout",
+    [
+        ({}, CLONE_OPERATION, 100, 10_000_000, 300),
+        ({"scaled_timeouts": True}, CLONE_OPERATION, 100, None, 300),
+        ({"scaled_timeouts": True}, CLONE_OPERATION, 100, 10_000_000, 19531),
+        ({"scaled_timeouts": True}, CLONE_OPERATION, None, 10_000_000, 19531),
+        ({"scaled_timeouts": True}, CLONE_OPERATION, None, 10, 60),
+        ({"scaled_timeouts": True}, CLONE_OPERATION, None, None, 300),
+        ({"scaled_timeouts": True}, PULL_OPERATION, None, 10_000_000, 19531),
+        ({"scaled_timeouts": True}, PULL_OPERATION, None, None, 300),
+        ({"scaled_timeouts": True}, PULL_OPERATION, 5, None, 60),
+        ({"scaled_timeouts": True}, PULL_OPERATION, 5, 10_000_000, 19531),
+        ({"scaled_timeouts": True}, PULL_OPERATION, 10_000, 10_000_000, 30000),
+        ({"scaled_timeouts": True, "timeout": 30}, PULL_OPERATION, 1000, None, 3000),
+        ({"scaled_timeouts": True}, CLONE_OPERATION, None, 1_000_000_000, 86400),
+    ],
+)
+def test_get_git_timeout(args, operation, duration, size, expected_timeout):
+    github_archive = GithubArchive(**args)
+    if duration is not None:
+        github_archive.state.record_duration("repos/mock_username/mock-asset-name", operation, duration)
+
+    timeout = get_git_timeout(github_archive, operation, "repos/mock_username/mock-asset-name", size=size)
+
+    assert timeout == expected_timeout
+
+
+@patch("subprocess.check_output", side_effect=subprocess.TimeoutExpired(cmd="git", timeout=100))
+def test_get_git_timeout_grows_after_timing_out(mock_subprocess):
+    """Tests that an operation which ran out of time gets longer on its next attempt, until it succeeds."""
+    state_key = "repos/mock_username/mock-asset-name"
+    github_archive = GithubArchive(scaled_timeouts=True, retries=0)
+    github_archive.state.record_duration(state_key, PULL_OPERATION, 50)
+
+    for expected_timeout in [150, 300, 600]:
+        timeout = get_git_timeout(github_archive, PULL_OPERATION, state_key)
+        assert timeout == expected_timeout
+        job = GitJob(
+            "Repo",
+            "mock-asset-name",
+            "mock-asset-name",
+            PULL_OPERATION,
+            "mock/url",
+            "mock/path",
+            ["git"],
+            timeout,
+            None,
+            False,
+            state_key,
+            None,
+        )
+        run_git_job(github_archive, job)
+
+    github_archive.state.record_duration(state_key, PULL_OPERATION, 50)
+    assert get_git_timeout(github_archive, PULL_OPERATION, state_key) == 150
+
+
+def test_run_streaming():
+    output = _run_streaming([sys.executable, "-c", "print('Receiving objects: 100%')"], 30, 5)
+
+    assert output.strip() == "Receiving objects: 100%"
+
+
+def test_run_with_stall_detection_kills_stalled_process():
+    """Tests that a process which stops reporting progress is killed long before its timeout."""
+    command = [sys.executable, "-c", "import time; print('Receiving objects: 1%', flush=True); time.sleep(30)"]
+    start_time = time.monotonic()
+
+    with pytest.raises(GitStalledError) as error:
+        _run_streaming(command, 30, 1)
+
+    assert time.monotonic() - start_time < 10
+    assert "Receiving objects: 1%" in error.value.output
+
+
+def test_run_with_stall_detection_kills_child_processes():
+    """Tests that a stalled command is killed along with the children holding its output open."""
+    command = ["sh", "-c", "sleep 20 & echo 'Receiving objects: 1%'; sleep 30"]
+    start_time = time.monotonic()
+
+    with pytest.raises(GitStalledError):
+        _run_streaming(command, 30, 1)
+
+    assert time.monotonic() - start_time < 10
+
+
+def test_run_streaming_returns_when_command_exits():
+    start_time = time.monotonic()
+
+    _run_streaming(["true"], 30, 5)
+
+    assert time.monotonic() - start_time < 0.5
+
+
+def test_run_with_stall_detection_timeout():
+    """Tests that a process still reporting progress is killed once it runs out of time."""
+    command = [sys.executable, "-c", "import time\nwhile True:\n    print('.', flush=True)\n    time.sleep(0.1)"]
+
+    with pytest.raises(subprocess.TimeoutExpired) as error:
+        _run_streaming(command, 1, 5)
+
+    assert not isinstance(error.value, GitStalledError)
+
+
+def test_run_with_stall_detection_failure():
+    command = [sys.executable, "-c", "import sys; print('fatal: mock error'); sys.exit(128)"]
+
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        _run_streaming(command, 30, 5)
+
+    assert error.value.returncode == 128
+    assert "fatal: mock error" in error.value.output
+
+
+def test_run_streaming_async():
+    lines = []
+    command = [
+        sys.executable,
+        "-c",
+        "import sys; sys.stdout.write('Receiving objects:  50% (1/2)\\rReceiving objects: 100% (2/2)\\ndone\\n')",
+    ]
+
+    output = asyncio.run(_run_streaming_async(command, 30, 5, on_output=lines.append))
+
+    assert lines == ["Receiving objects:  50% (1/2)", "Receiving objects: 100% (2/2)", "done"]
+    assert output.endswith("done\n")
+
+
+def test_run_streaming_async_kills_stalled_process():
+    command = [sys.executable, "-c", "import time; print('Receiving objects: 1%', flush=True); time.sleep(30)"]
+    start_time = time.monotonic()
+
+    with pytest.raises(GitStalledError) as error:
+        asyncio.run(_run_streaming_async(command, 30, 1))
+
+    assert time.monotonic() - start_time < 10
+    assert "Receiving objects: 1%" in error.value.output
+
+
+def test_run_streaming_async_kills_child_processes():
+    command = ["sh", "-c", "sleep 20 & echo 'Receiving objects: 1%'; sleep 30"]
+    start_time = time.monotonic()
+
+    with pytest.raises(GitStalledError):
+        asyncio.run(_run_streaming_async(command, 30, 1))
+
+    assert time.monotonic() - start_time < 10
+
+
+def test_run_streaming_async_timeout():
+    command = [sys.executable, "-c", "import time\nwhile True:\n    print('.', flush=True)\n    time.sleep(0.1)"]
+
+    with pytest.raises(subprocess.TimeoutExpired) as error:
+        asyncio.run(_run_streaming_async(command, 1, 5))
+
+    assert not isinstance(error.value, GitStalledError)
+
+
+def test_run_streaming_async_failure():
+    command = [sys.executable, "-c", "import sys; print('fatal: mock error'); sys.exit(128)"]
+
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        asyncio.run(_run_streaming_async(command, 30))
+
+    assert error.value.returncode == 128
+    assert "fatal: mock error" in error.value.output
+
+
+def test_run_streaming_async_cancel_kills_process():
+    """Tests that cancelling the task running a git command kills the command."""
+    command = [sys.executable, "-c", "import os, time; print(os.getpid(), flush=True); time.sleep(30)"]
+    pids = []
+
+    async def cancel_command():
+        task = asyncio.create_task(_run_streaming_async(command, 30, on_output=pids.append))
+        while not pids:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_command())
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pids[0]), 0)
+
+
+@patch("asyncio.sleep")
+def test_run_git_command_async_retries_transient_errors(mock_sleep):
+    command = [sys.executable, "-c", "import sys; print('fatal: the remote end hung up unexpectedly'); sys.exit(128)"]
+    github_archive = GithubArchive(retries=2)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(run_git_command_async(github_archive, command, "mock-repo", 30))
+
+    assert mock_sleep.call_count == 2
+
+
+def test_archive_repo_async(source_repo, tmp_path, mock_git_asset):
+    """Tests that the asyncio engine clones and pulls a repo end to end."""
+    path = os.path.join(tmp_path, "clone")
+    mock_git_asset.html_url = source_repo
+    mock_git_asset.pushed_at = None
+    github_archive = GithubArchive(engine="asyncio", progress=True)
+    github_archive.progress_tracker = ProgressTracker(str(tmp_path))
+
+    assert asyncio.run(_archive_repo_async(github_archive, mock_git_asset, path, CLONE_OPERATION)) is None
+    assert asyncio.run(_archive_repo_async(github_archive, mock_git_asset, path, PULL_OPERATION)) is None
+    assert _get_commit_count(path) == 3
+    # The progress git reported as it cloned was tracked
+    assert github_archive.progress_tracker.get_received()[0] > 0
+
+
+@patch("time.sleep")
+@patch(
+    "subprocess.check_output",
+    side_effect=[
+        subprocess.CalledProcessError(cmd="git", returncode=128, output="fatal: the remote end hung up unexpectedly"),
+        subprocess.TimeoutExpired(cmd="git", timeout=0.1),
+        "mock output",
+    ],
+)
+def test_run_git_command_retries_transient_errors(mock_subprocess, mock_sleep, tmp_path):
+    """Tests that transient errors are retried and that a partial clone is removed before it is retried."""
+    clone_path = os.path.join(tmp_path, "mock-repo")
+    os.makedirs(os.path.join(clone_path, ".git"))
+    github_archive = GithubArchive(retries=2, retry_backoff=1)
+
+    run_git_command(github_archive, ["git", "clone"], "mock-repo", timeout=300, clone_path=clone_path)
+
+    assert mock_subprocess.call_count == 3
+    assert mock_sleep.call_count == 2
+    assert not os.path.exists(clone_path)
+
+
+@patch("time.sleep")
+@patch(
+    "subprocess.check_output",
+    side_effect=subprocess.CalledProcessError(cmd="git", returncode=128, output="ERROR: Repository not found."),
+)
+def test_run_git_command_does_not_retry_permanent_errors(mock_subprocess, mock_sleep):
+    github_archive = GithubArchive(retries=2)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        run_git_command(github_archive, ["git", "clone"], "mock-repo", timeout=300)
+
+    mock_subprocess.assert_called_once()
+    mock_sleep.assert_not_called()
+
+
+@patch("time.sleep")
+@patch("subprocess.check_output", side_effect=subprocess.TimeoutExpired(cmd="git", timeout=0.1))
+def test_run_git_command_gives_up_after_retries(mock_subprocess, mock_sleep):
+    github_archive = GithubArchive(retries=2)
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_git_command(github_archive, ["git", "pull"], "mock-repo", timeout=300)
+
+    assert mock_subprocess.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "error, expected_transient",
+    [
+        (subprocess.TimeoutExpired(cmd="git", timeout=0.1), True),
+        (subprocess.CalledProcessError(cmd="git", returncode=128, output="error: RPC failed; HTTP 502"), True),
+        (subprocess.CalledProcessError(cmd="git", returncode=128, output="Connection reset by peer"), True),
+        (
+            subprocess.CalledProcessError(
+                cmd="git", returncode=128, output="fatal: repository 'https://github.com/mock/repo/' not found"
+            ),
+            False,
+        ),
+        (subprocess.CalledProcessError(cmd="git", returncode=128, output="Permission denied (publickey)."), False),
+        (subprocess.CalledProcessError(cmd="git", returncode=1, output="CONFLICT (content): Merge conflict"), False),
+    ],
+)
+def test_is_transient_git_error(error, expected_transient):
+    assert is_transient_git_error(error) is expected_transient
+
+
+def test_get_retry_delay():
+    """Tests that the delay doubles on each attempt with up to half of it being jitter, capped at the maximum."""
+    assert 5 <= get_retry_delay(10, 0) <= 10
+    assert 20 <= get_retry_delay(10, 2) <= 40
+    assert 150 <= get_retry_delay(10, 10) <= 300
+
+
+class _DumbGitHttpHandler(SimpleHTTPRequestHandler):
+    """Serves repos over git's dumb HTTP protocol, keeping connections alive and counting them."""
+
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        self.server.connections += 1  # type: ignore[attr-defined]
+        super().handle()
+
+    def do_GET(self):
+        self.server.mock_headers.append(self.headers.get("X-Mock"))  # type: ignore[attr-defined]
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_repo_server(source_repo, tmp_path):
+    """Serves a copy of the source repo at `/repo.git` of a local HTTP server."""
+    served_path = os.path.join(tmp_path, "served")
+    subprocess.check_output(["git", "clone", "--quiet", "--bare", source_repo, os.path.join(served_path, "repo.git")])
+    subprocess.check_output(["git", "-C", os.path.join(served_path, "repo.git"), "update-server-info"])
+    server = ThreadingHTTPServer(("localhost", 0), functools.partial(_DumbGitHttpHandler, directory=served_path))
+    server.connections = 0  # type: ignore[attr-defined]
+    server.mock_headers = []  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _get_commit_count(path):
+    return int(subprocess.check_output(["git", "-C", path, "rev-list", "--count", "HEAD"], text=True))
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+def test_resume_clone(mirror, source_repo, tmp_path):
+    path = os.path.join(tmp_path, "clone")
+    github_archive = GithubArchive(mirror=mirror)
+
+    resume_clone(github_archive, source_repo, path, "mock-repo", timeout=30)
+
+    assert is_incomplete_clone(path) is False
+    assert _get_commit_count(path) == 3
+    assert subprocess.check_output(["git", "-C", path, "symbolic-ref", "HEAD"], text=True).strip() == "refs/heads/trunk"
+    assert os.path.exists(os.path.join(path, "file.txt")) is not mirror
+
+
+def test_resume_clone_after_timeout(source_repo, tmp_path):
+    """Tests that a clone timing out while fetching its history keeps its snapshot and only fetches the history
+    when it is resumed.
+    """
+    path = os.path.join(tmp_path, "clone")
+    github_archive = GithubArchive(retries=0)
+
+    def time_out_fetching_history(github_archive, command, *args, **kwargs):
+        if "--unshallow" in command:
+            raise subprocess.TimeoutExpired(cmd=command, timeout=30)
+        return run_git_command(github_archive, command, *args, **kwargs)
+
+    with patch("github_archive.git.run_git_command", side_effect=time_out_fetching_history):
+        with pytest.raises(subprocess.TimeoutExpired):
+            resume_clone(github_archive, source_repo, path, "mock-repo", timeout=30)
+
+    assert is_incomplete_clone(path) is True
+    with open(os.path.join(path, ".git", INCOMPLETE_CLONE_MARKER)) as marker_file:
+        assert marker_file.read() == "history"
+
+    with patch("github_archive.git.run_git_command", side_effect=run_git_command) as mock_run_git_command:
+        resume_clone(github_archive, source_repo, path, "mock-repo", timeout=30)
+
+    fetch_commands = [call.args[1] for call in mock_run_git_command.call_args_list if "fetch" in call.args[1]]
+    assert fetch_commands == [["git", "-C", path, "fetch", "origin", "--unshallow"]]
+    assert is_incomplete_clone(path) is False
+    assert _get_commit_count(path) == 3
+
+
+def test_resume_clone_corrupt(source_repo, tmp_path):
+    """Tests that a partial clone git no longer recognizes is cloned again from scratch."""
+    path = os.path.join(tmp_path, "clone")
+    os.makedirs(os.path.join(path, ".git"))
+    with open(os.path.join(path, ".git", INCOMPLETE_CLONE_MARKER), "w") as marker_file:
+        marker_file.write("history")
+    with open(os.path.join(path, ".git", "HEAD"), "w") as head_file:
+        head_file.write("corrupt")
+    github_archive = GithubArchive()
+
+    resume_clone(github_archive, source_repo, path, "mock-repo", timeout=30)
+
+    assert is_incomplete_clone(path) is False
+    assert _get_commit_count(path) == 3
+
+
+def test_run_git_command_http_config(http_repo_server, tmp_path):
+    """Tests that the HTTPS transport settings reach git and that git reuses its connections across the requests of
+    a command.
+    """
+    path = os.path.join(tmp_path, "clone")
+    github_archive = GithubArchive(http_config=["http.extraHeader=X-Mock: mock-value, another-value"])
+    url = f"http://localhost:{http_repo_server.server_address[1]}/repo.git"
+
+    run_git_command(github_archive, ["git", "clone", "--quiet", url, path], "mock-repo", timeout=30)
+
+    assert _get_commit_count(path) == 3
+    assert len(http_repo_server.mock_headers) > 1
+    # The setting reaches git whole even though its value contains a comma
+    assert set(http_repo_server.mock_headers) == {"mock-value, another-value"}
+    assert http_repo_server.connections < len(http_repo_server.mock_headers)
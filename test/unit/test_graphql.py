@@ -0,0 +1,133 @@
+from datetime import (
+    datetime,
+    timezone,
+)
+
+import pytest
+
+from github_archive import GithubArchive
+from github_archive.archive import (
+    GIST_CONTEXT,
+    PERSONAL_CONTEXT,
+    USER_CONTEXT,
+)
+from github_archive.graphql import build_query
+from github_archive.records import (
+    GistRecord,
+    RepoRecord,
+)
+
+
+def _repo_node(name, fork=False, language="Python"):
+    return {
+        "name": name,
+        "nameWithOwner": f"justintime50/{name}",
+        "owner": {"login": "justintime50"},
+        "isFork": fork,
+        "isArchived": False,
+        "primaryLanguage": {"name": language} if language else None,
+        "url": f"https://github.com/justintime50/{name}",
+        "sshUrl": f"git@github.com:justintime50/{name}.git",
+        "pushedAt": "2023-01-01T00:00:00Z",
+        "diskUsage": 1024,
+    }
+
+
+def _page(connection_field, nodes, end_cursor=None, owner_field="repositoryOwner"):
+    return {
+        owner_field: {
+            connection_field: {
+                "pageInfo": {"hasNextPage": end_cursor is not None, "endCursor": end_cursor},
+                "nodes": nodes,
+            }
+        }
+    }
+
+
+@pytest.fixture
+def github_archive(mock_api_server, tmp_path):
+    mock_api_server.add_route("/user", {"login": "justintime50", "url": f"{mock_api_server.url}/user"})
+
+    def create_github_archive(**kwargs):
+        return GithubArchive(
+            token="123",
+            base_url=mock_api_server.url,
+            location=str(tmp_path),
+            backend="graphql",
+            **kwargs,
+        )
+
+    return create_github_archive
+
+
+def test_build_query():
+    query = build_query(USER_CONTEXT)
+
+    assert "query($login: String!, $cursor: String)" in query
+    assert "repositoryOwner(login: $login)" in query
+    assert "repositories(first: 100, after: $cursor, ownerAffiliations: OWNER)" in query
+
+
+def test_build_query_personal():
+    query = build_query(PERSONAL_CONTEXT)
+
+    assert "query($cursor: String)" in query
+    assert "viewer {" in query
+
+
+def test_iterate_git_assets_graphql_repos(mock_api_server, github_archive):
+    """Tests that every page of repos is listed and that forks are filtered out of the records."""
+    pages = {
+        None: _page("repositories", [_repo_node("repo1"), _repo_node("forked-repo", fork=True)], "cursor1"),
+        "cursor1": _page("repositories", [_repo_node("repo2", language=None)]),
+    }
+    mock_api_server.set_graphql_resolver(lambda query, variables: pages[variables["cursor"]])
+
+    repos = list(github_archive(users="justintime50").iterate_git_assets(USER_CONTEXT))
+
+    assert [repo.name for repo in repos] == ["repo1", "repo2"]
+    assert all(isinstance(repo, RepoRecord) for repo in repos)
+    assert repos[0].owner.login == "justintime50"
+    assert repos[0].full_name == "justintime50/repo1"
+    assert repos[0].language == "Python"
+    assert repos[1].language is None
+    assert repos[0].ssh_url == "git@github.com:justintime50/repo1.git"
+    assert repos[0].pushed_at == datetime(2023, 1, 1, tzinfo=timezone.utc)
+    assert repos[0].size == 1024
+    assert [request["variables"] for request in mock_api_server.graphql_requests] == [
+        {"cursor": None, "login": "justintime50"},
+        {"cursor": "cursor1", "login": "justintime50"},
+    ]
+
+
+def test_iterate_git_assets_graphql_gists(mock_api_server, github_archive):
+    gist_node = {
+        "name": "abc123",
+        "owner": {"login": "justintime50"},
+        "url": "https://gist.github.com/abc123",
+        "updatedAt": "2023-01-01T00:00:00Z",
+    }
+    mock_api_server.set_graphql_resolver(lambda query, variables: _page("gists", [gist_node], owner_field="user"))
+
+    gists = list(github_archive(gists="justintime50").iterate_git_assets(GIST_CONTEXT))
+
+    assert len(gists) == 1
+    assert isinstance(gists[0], GistRecord)
+    assert gists[0].id == "abc123"
+    assert gists[0].html_url == "https://gist.github.com/abc123"
+
+
+def test_iterate_git_assets_graphql_missing_owner(mock_api_server, github_archive):
+    """Tests that an owner that doesn't exist is reported as failed without stopping the listing."""
+    mock_api_server.set_graphql_resolver(lambda query, variables: {"repositoryOwner": None})
+    archive = github_archive(users="not-a-user")
+
+    repos = list(archive.iterate_git_assets(USER_CONTEXT))
+
+    assert repos == []
+    assert archive.failed_owners == {USER_CONTEXT: ["not-a-user"]}
+
+
+def test_records_use_slots():
+    with pytest.raises(AttributeError):
+        GistRecord("abc123", None, "https://gist.github.com/abc123", None).extra = True  # type: ignore[attr-defined]
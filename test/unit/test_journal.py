@@ -0,0 +1,158 @@
+import json
+import os
+from unittest.mock import MagicMock
+
+from github_archive import GithubArchive
+from github_archive.constants import (
+    CLONE_OPERATION,
+    JOURNAL_FAILED,
+    JOURNAL_QUEUED,
+    JOURNAL_STARTED,
+    JOURNAL_SUCCEEDED,
+    PULL_OPERATION,
+    USER_CONTEXT,
+)
+from github_archive.journal import RunJournal
+from github_archive.pipeline import ArchivePipeline
+
+
+def _write_journal(location, events):
+    with open(os.path.join(location, "journal.jsonl"), "w") as journal_file:
+        for asset, event, operation in events:
+            journal_file.write(f"{json.dumps({'asset': asset, 'event': event, 'operation': operation})}\n")
+
+
+def _read_journal(location):
+    with open(os.path.join(location, "journal.jsonl")) as journal_file:
+        return [json.loads(line) for line in journal_file]
+
+
+def test_journal_resume_interrupted_run(tmp_path):
+    _write_journal(
+        tmp_path,
+        [
+            ("repos/mock_username/done", JOURNAL_STARTED, CLONE_OPERATION),
+            ("repos/mock_username/done", JOURNAL_SUCCEEDED, None),
+            ("repos/mock_username/half-cloned", JOURNAL_STARTED, CLONE_OPERATION),
+            ("repos/mock_username/failed-clone", JOURNAL_FAILED, CLONE_OPERATION),
+            ("repos/mock_username/half-pulled", JOURNAL_STARTED, PULL_OPERATION),
+            ("repos/mock_username/queued", JOURNAL_QUEUED, None),
+        ],
+    )
+    journal = RunJournal(str(tmp_path))
+
+    assert journal.open(resume=True) is True
+    journal.close()
+
+    assert journal.is_completed("repos/mock_username/done") is True
+    assert journal.is_completed("repos/mock_username/half-pulled") is False
+    assert journal.get_interrupted_clones() == ["repos/mock_username/failed-clone", "repos/mock_username/half-cloned"]
+    # Resuming keeps the events of the interrupted run
+    assert len(_read_journal(tmp_path)) == 6
+
+
+def test_journal_does_not_resume_finished_run(tmp_path):
+    journal = RunJournal(str(tmp_path))
+    journal.open(resume=False)
+    journal.record("repos/mock_username/done", JOURNAL_SUCCEEDED)
+    journal.finish()
+
+    resumed_journal = RunJournal(str(tmp_path))
+
+    assert resumed_journal.open(resume=True) is False
+    resumed_journal.close()
+    assert resumed_journal.is_completed("repos/mock_username/done") is False
+    assert _read_journal(tmp_path) == []
+
+
+def test_journal_skips_truncated_line(tmp_path):
+    _write_journal(tmp_path, [("repos/mock_username/done", JOURNAL_SUCCEEDED, None)])
+    with open(os.path.join(tmp_path, "journal.jsonl"), "a") as journal_file:
+        journal_file.write('{"asset": "repos/mock_username/cut')
+    journal = RunJournal(str(tmp_path))
+
+    assert journal.open(resume=True) is True
+    journal.close()
+    assert journal.is_completed("repos/mock_username/done") is True
+
+
+def test_journal_without_previous_run(tmp_path):
+    journal = RunJournal(str(tmp_path))
+
+    assert journal.open(resume=True) is False
+    journal.close()
+
+
+def test_pipeline_journals_assets(tmp_path):
+    github_archive = GithubArchive(location=str(tmp_path))
+    github_archive.journal.open(resume=False)
+    pipeline = ArchivePipeline(github_archive)
+    asset_path = os.path.join(tmp_path, "repos", "mock_username", "mock-repo")
+
+    pipeline.submit(USER_CONTEXT, MagicMock(return_value=None), [CLONE_OPERATION], asset_path=asset_path)
+    pipeline.submit(
+        USER_CONTEXT,
+        MagicMock(return_value="mock_username/failed-repo"),
+        [CLONE_OPERATION],
+        asset_path=os.path.join(tmp_path, "repos", "mock_username", "failed-repo"),
+    )
+    pipeline.wait()
+    github_archive.journal.close()
+
+    events = [(entry["asset"], entry["event"], entry["operation"]) for entry in _read_journal(tmp_path)]
+    assert ("repos/mock_username/mock-repo", JOURNAL_QUEUED, None) in events
+    assert ("repos/mock_username/mock-repo", JOURNAL_STARTED, CLONE_OPERATION) in events
+    assert ("repos/mock_username/mock-repo", JOURNAL_SUCCEEDED, None) in events
+    assert ("repos/mock_username/failed-repo", JOURNAL_FAILED, CLONE_OPERATION) in events
+    assert ("repos/mock_username/failed-repo", JOURNAL_SUCCEEDED, None) not in events
+
+
+def test_pipeline_skips_completed_assets(tmp_path):
+    _write_journal(tmp_path, [("repos/mock_username/done", JOURNAL_SUCCEEDED, None)])
+    github_archive = GithubArchive(location=str(tmp_path), resume=True)
+    github_archive.open_journal()
+    pipeline = ArchivePipeline(github_archive)
+    archive_function = MagicMock(return_value=None)
+
+    future = pipeline.submit(
+        USER_CONTEXT,
+        archive_function,
+        [PULL_OPERATION],
+        asset_path=os.path.join(tmp_path, "repos", "mock_username", "done"),
+    )
+    pipeline.wait()
+    github_archive.journal.close()
+
+    assert future is None
+    archive_function.assert_not_called()
+
+
+def test_open_journal_removes_interrupted_clones(tmp_path):
+    _write_journal(
+        tmp_path,
+        [
+            ("repos/mock_username/half-cloned", JOURNAL_STARTED, CLONE_OPERATION),
+            ("repos/mock_username/done", JOURNAL_SUCCEEDED, None),
+        ],
+    )
+    os.makedirs(os.path.join(tmp_path, "repos", "mock_username", "half-cloned", ".git"))
+    os.makedirs(os.path.join(tmp_path, "repos", "mock_username", "done", ".git"))
+    github_archive = GithubArchive(location=str(tmp_path), resume=True)
+
+    github_archive.open_journal()
+    github_archive.journal.close()
+
+    assert not os.path.exists(os.path.join(tmp_path, "repos", "mock_username", "half-cloned"))
+    assert os.path.exists(os.path.join(tmp_path, "repos", "mock_username", "done"))
+
+
+def test_open_journal_without_resume_starts_new_run(tmp_path):
+    _write_journal(tmp_path, [("repos/mock_username/half-cloned", JOURNAL_STARTED, CLONE_OPERATION)])
+    os.makedirs(os.path.join(tmp_path, "repos", "mock_username", "half-cloned"))
+    github_archive = GithubArchive(location=str(tmp_path))
+
+    github_archive.open_journal()
+    github_archive.journal.close()
+
+    assert os.path.exists(os.path.join(tmp_path, "repos", "mock_username", "half-cloned"))
+    assert _read_journal(tmp_path) == []
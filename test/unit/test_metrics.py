@@ -0,0 +1,143 @@
+import os
+import urllib.request
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from github_archive import GithubArchive
+from github_archive.constants import (
+    CLONE_OPERATION,
+    GIST_CONTEXT,
+    PULL_OPERATION,
+    USER_CONTEXT,
+)
+from github_archive.metrics import (
+    RunMetrics,
+    _format_labels,
+)
+from github_archive.pipeline import ArchivePipeline
+from github_archive.repos import _archive_repo
+
+
+def test_metrics_count_assets(tmp_path):
+    metrics = GithubArchive(location=str(tmp_path)).metrics
+    metrics.register_asset("mock/repo", USER_CONTEXT)
+    metrics.register_asset("mock/gist", GIST_CONTEXT)
+
+    metrics.record_listed(USER_CONTEXT)
+    metrics.record_git_operation("mock/repo", CLONE_OPERATION, 12, failed=False)
+    metrics.record_git_operation("mock/repo", PULL_OPERATION, 0.5, failed=True)
+    metrics.record_skipped("mock/gist")
+    rendered = metrics.render()
+
+    assert 'github_archive_assets_total{context="user",result="listed"} 1' in rendered
+    assert 'github_archive_assets_total{context="user",result="cloned"} 1' in rendered
+    assert 'github_archive_assets_total{context="user",result="failed"} 1' in rendered
+    assert 'github_archive_assets_total{context="gist",result="skipped"} 1' in rendered
+    assert 'github_archive_git_operation_duration_seconds_bucket{operation="clone",le="5"} 0' in rendered
+    assert 'github_archive_git_operation_duration_seconds_bucket{operation="clone",le="15"} 1' in rendered
+    assert 'github_archive_git_operation_duration_seconds_bucket{operation="clone",le="+Inf"} 1' in rendered
+    assert 'github_archive_git_operation_duration_seconds_sum{operation="pull"} 0.5' in rendered
+
+
+def test_metrics_record_api_requests(tmp_path):
+    github_archive = GithubArchive(location=str(tmp_path))
+    github_archive.metrics.record_api_request("core", 0.2, 2048)
+    github_archive.metrics.record_api_request("core", 3, 1024)
+
+    rendered = github_archive.metrics.render()
+
+    assert 'github_archive_api_request_duration_seconds_bucket{resource="core",le="0.25"} 1' in rendered
+    assert 'github_archive_api_request_duration_seconds_count{resource="core"} 2' in rendered
+    assert 'github_archive_received_bytes_total{source="api"} 3072' in rendered
+
+
+def test_format_labels_escapes_values():
+    assert _format_labels({"asset": 'mock"repo\\\n'}) == '{asset="mock\\"repo\\\\\\n"}'
+
+
+def test_metrics_write_textfile(tmp_path):
+    metrics = RunMetrics(GithubArchive(location=str(tmp_path)))
+    metrics_path = os.path.join(tmp_path, "github_archive.prom")
+
+    metrics.finish()
+    metrics.write_textfile(metrics_path)
+
+    with open(metrics_path) as metrics_file:
+        assert "# TYPE github_archive_run_duration_seconds gauge" in metrics_file.read()
+    assert os.listdir(tmp_path) == ["github_archive.prom"]
+
+
+def test_metrics_serve(tmp_path):
+    metrics = RunMetrics(GithubArchive(location=str(tmp_path)))
+
+    port = metrics.serve(0)
+    try:
+        # Only local clients can scrape the metrics unless another host is given
+        assert metrics.server.server_address[0] == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:  # nosec
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "github_archive_assets_total" in response.read().decode()
+    finally:
+        metrics.shutdown()
+
+
+def test_pipeline_counts_assets_by_context(tmp_path, mock_git_asset):
+    """Tests that the git operations of an asset are counted against the context it was queued from."""
+    github_archive = GithubArchive(location=str(tmp_path), retries=0)
+    pipeline = ArchivePipeline(github_archive)
+    repo_path = os.path.join(tmp_path, "repos", "mock_username", "mock-asset-name")
+
+    with patch("subprocess.check_output"):
+        pipeline.submit(
+            USER_CONTEXT,
+            _archive_repo,
+            [CLONE_OPERATION],
+            asset_path=repo_path,
+            github_archive=github_archive,
+            repo=mock_git_asset,
+            repo_path=repo_path,
+        )
+        pipeline.wait()
+
+    assert 'github_archive_assets_total{context="user",result="cloned"} 1' in github_archive.metrics.render()
+
+
+def test_rate_limited_adapter_records_api_requests(mock_api_server, tmp_path):
+    mock_api_server.add_route("/users/justintime50", {"login": "justintime50"})
+    github_archive = GithubArchive(base_url=mock_api_server.url, location=str(tmp_path), cache=False)
+
+    github_archive.github_instance.get_user("justintime50").login
+
+    rendered = github_archive.metrics.render()
+    assert 'github_archive_api_request_duration_seconds_count{resource="core"} 1' in rendered
+    assert 'github_archive_rate_limit_remaining{token="anonymous access",resource="core"}' in rendered
+
+
+def test_run_writes_metrics_file(tmp_path):
+    metrics_path = os.path.join(tmp_path, "github_archive.prom")
+    github_archive = GithubArchive(location=str(tmp_path), users="justintime50", view=True, metrics_file=metrics_path)
+    github_archive.iterate_git_assets = MagicMock(return_value=iter([]))
+
+    github_archive.run()
+
+    assert os.path.isfile(metrics_path)
+
+
+def test_metrics_merge_shard_snapshot(tmp_path):
+    shard_metrics = GithubArchive(location=str(tmp_path)).metrics
+    shard_metrics.register_asset("mock/repo", USER_CONTEXT)
+    shard_metrics.record_git_operation("mock/repo", CLONE_OPERATION, 12, failed=False)
+    shard_metrics.record_api_request("core", 0.2, 2048)
+    metrics = GithubArchive(location=str(tmp_path)).metrics
+    metrics.register_asset("mock/other-repo", USER_CONTEXT)
+    metrics.record_git_operation("mock/other-repo", CLONE_OPERATION, 2, failed=False)
+
+    metrics.merge(shard_metrics.get_snapshot())
+    rendered = metrics.render()
+
+    assert 'github_archive_assets_total{context="user",result="cloned"} 2' in rendered
+    assert 'github_archive_git_operation_duration_seconds_bucket{operation="clone",le="5"} 1' in rendered
+    assert 'github_archive_git_operation_duration_seconds_count{operation="clone"} 2' in rendered
+    assert 'github_archive_received_bytes_total{source="api"} 2048' in rendered
@@ -0,0 +1,220 @@
+import asyncio
+import threading
+import time
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+import pytest
+
+from github_archive import GithubArchive
+from github_archive.archive import (
+    CLONE_OPERATION,
+    ORG_CONTEXT,
+    PULL_OPERATION,
+    USER_CONTEXT,
+)
+from github_archive.pipeline import (
+    ArchivePipeline,
+    AsyncArchivePipeline,
+)
+
+
+def test_pipeline_runs_operations_in_order():
+    github_archive = GithubArchive()
+    pipeline = ArchivePipeline(github_archive)
+    archive_function = MagicMock(return_value=None)
+
+    pipeline.submit(USER_CONTEXT, archive_function, [CLONE_OPERATION, PULL_OPERATION], repo="mock-repo")
+    failures = pipeline.wait()
+
+    assert failures == {}
+    assert [call.kwargs["operation"] for call in archive_function.call_args_list] == [CLONE_OPERATION, PULL_OPERATION]
+
+
+def test_pipeline_stops_after_failed_operation():
+    """Tests that a failed clone does not go on to pull and that the failure is reported for its context."""
+    github_archive = GithubArchive()
+    pipeline = ArchivePipeline(github_archive)
+    archive_function = MagicMock(return_value="mock_username/mock-repo")
+
+    pipeline.submit(ORG_CONTEXT, archive_function, [CLONE_OPERATION, PULL_OPERATION])
+    failures = pipeline.wait()
+
+    archive_function.assert_called_once_with(operation=CLONE_OPERATION)
+    assert failures == {ORG_CONTEXT: [(CLONE_OPERATION, "mock_username/mock-repo")]}
+
+
+def test_pipeline_shares_workers_across_contexts():
+    """Tests that assets from a later context start while a slow asset of an earlier context is still running."""
+    github_archive = GithubArchive(threads=2)
+    pipeline = ArchivePipeline(github_archive)
+    slow_asset_running = threading.Event()
+    fast_asset_done = threading.Event()
+
+    def slow_archive(operation):
+        slow_asset_running.set()
+        fast_asset_done.wait(timeout=5)
+
+    def fast_archive(operation):
+        slow_asset_running.wait(timeout=5)
+        fast_asset_done.set()
+
+    start = time.monotonic()
+    pipeline.submit(USER_CONTEXT, slow_archive, [CLONE_OPERATION])
+    pipeline.submit(ORG_CONTEXT, fast_archive, [CLONE_OPERATION])
+    pipeline.wait()
+
+    assert fast_asset_done.is_set()
+    assert time.monotonic() - start < 5
+
+
+def test_pipeline_schedules_largest_first():
+    """Tests that when scheduling by size, the largest queued asset is always picked up next."""
+    github_archive = GithubArchive(threads=1, schedule="size")
+    pipeline = ArchivePipeline(github_archive)
+    worker_busy = threading.Event()
+    all_queued = threading.Event()
+    archived_sizes = []
+
+    def block_worker(operation):
+        worker_busy.set()
+        all_queued.wait(timeout=5)
+
+    pipeline.submit(USER_CONTEXT, block_worker, [CLONE_OPERATION], size=1)
+    worker_busy.wait(timeout=5)
+    for size in [10, 5, 500, 50]:
+        pipeline.submit(
+            USER_CONTEXT,
+            lambda operation, size_kb: archived_sizes.append(size_kb),
+            [CLONE_OPERATION],
+            size=size,
+            size_kb=size,
+        )
+    all_queued.set()
+    pipeline.wait()
+
+    assert archived_sizes == [500, 50, 10, 5]
+
+
+def test_pipeline_listing_schedule_keeps_order():
+    github_archive = GithubArchive(threads=1)
+    pipeline = ArchivePipeline(github_archive)
+    archived_sizes = []
+
+    for size in [10, 5, 500, 50]:
+        pipeline.submit(
+            USER_CONTEXT,
+            lambda operation, size_kb: archived_sizes.append(size_kb),
+            [CLONE_OPERATION],
+            size=size,
+            size_kb=size,
+        )
+    pipeline.wait()
+
+    assert archived_sizes == [10, 5, 500, 50]
+
+
+def test_pipeline_giant_lane():
+    """Tests that giant assets run in their own lane with their own timeout while the other assets keep going."""
+    github_archive = GithubArchive(threads=1, giant_threshold=1000, giant_timeout=3600)
+    pipeline = ArchivePipeline(github_archive)
+    small_assets_done = threading.Event()
+    archive_function = MagicMock(return_value=None)
+
+    def archive_giant(operation, timeout):
+        assert small_assets_done.wait(timeout=5)
+        archive_function(timeout=timeout)
+
+    pipeline.submit(USER_CONTEXT, archive_giant, [CLONE_OPERATION], size=5000)
+    pipeline.submit(USER_CONTEXT, lambda operation: None, [CLONE_OPERATION], size=10)
+    pipeline.submit(USER_CONTEXT, lambda operation: small_assets_done.set(), [CLONE_OPERATION], size=20)
+    pipeline.wait()
+
+    archive_function.assert_called_once_with(timeout=3600)
+
+
+def test_async_pipeline_runs_coroutines_and_functions():
+    """Tests that the asyncio engine awaits coroutine archive functions and runs the others on a thread."""
+    github_archive = GithubArchive(engine="asyncio")
+    pipeline = AsyncArchivePipeline(github_archive)
+    operations = []
+
+    async def archive_coroutine(operation):
+        operations.append(operation)
+
+    pipeline.submit(USER_CONTEXT, archive_coroutine, [CLONE_OPERATION, PULL_OPERATION])
+    pipeline.submit(ORG_CONTEXT, MagicMock(return_value="mock_username/mock-repo"), [CLONE_OPERATION, PULL_OPERATION])
+    failures = pipeline.wait()
+
+    assert operations == [CLONE_OPERATION, PULL_OPERATION]
+    assert failures == {ORG_CONTEXT: [(CLONE_OPERATION, "mock_username/mock-repo")]}
+
+
+def test_async_pipeline_limits_in_flight_operations():
+    github_archive = GithubArchive(engine="asyncio", threads=3)
+    pipeline = AsyncArchivePipeline(github_archive)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def archive_coroutine(operation):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    for _ in range(20):
+        pipeline.submit(USER_CONTEXT, archive_coroutine, [CLONE_OPERATION])
+    pipeline.wait()
+
+    assert max_in_flight == 3
+
+
+def test_async_pipeline_schedules_largest_first():
+    github_archive = GithubArchive(engine="asyncio", threads=1, schedule="size")
+    pipeline = AsyncArchivePipeline(github_archive)
+    worker_busy = threading.Event()
+    all_queued = threading.Event()
+    archived_sizes = []
+
+    async def block_worker(operation):
+        worker_busy.set()
+        while not all_queued.is_set():
+            await asyncio.sleep(0.01)
+
+    async def archive_coroutine(operation, size_kb):
+        archived_sizes.append(size_kb)
+
+    pipeline.submit(USER_CONTEXT, block_worker, [CLONE_OPERATION], size=1)
+    worker_busy.wait(timeout=5)
+    for size in [10, 5, 500, 50]:
+        pipeline.submit(USER_CONTEXT, archive_coroutine, [CLONE_OPERATION], size=size, size_kb=size)
+    all_queued.set()
+    pipeline.wait()
+
+    assert archived_sizes == [500, 50, 10, 5]
+
+
+def test_async_pipeline_cancels_tasks_when_interrupted():
+    github_archive = GithubArchive(engine="asyncio")
+    pipeline = AsyncArchivePipeline(github_archive)
+    started = threading.Event()
+    cancelled = threading.Event()
+
+    async def archive_coroutine(operation):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    future = pipeline.submit(USER_CONTEXT, archive_coroutine, [CLONE_OPERATION])
+    started.wait(timeout=5)
+    with patch("github_archive.pipeline.wait", side_effect=KeyboardInterrupt), pytest.raises(KeyboardInterrupt):
+        pipeline.wait()
+
+    assert cancelled.is_set()
+    assert future.cancelled()
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from github_archive import GithubArchive
+from github_archive.constants import (
+    CLONE_OPERATION,
+    USER_CONTEXT,
+)
+from github_archive.git import _run_streaming
+from github_archive.pipeline import ArchivePipeline
+from github_archive.progress import ProgressTracker
+
+
+def test_progress_tracker_parses_git_progress(tmp_path):
+    tracker = ProgressTracker(str(tmp_path))
+    command_id = tracker.command_started("mock-repo")
+
+    tracker.update(command_id, "remote: Counting objects: 100% (1000/1000), done.")
+    tracker.update(command_id, "Receiving objects:  45% (450/1000), 1.50 MiB | 600.00 KiB/s")
+    status = tracker.get_status()
+
+    assert status["received_objects"] == 450
+    assert status["received_bytes"] == 1.5 * 1024**2
+    assert status["commands"] == [
+        {"asset": "mock-repo", "phase": "Receiving objects", "percent": 45, "bytes": 1.5 * 1024**2}
+    ]
+
+
+def test_progress_tracker_keeps_totals_of_finished_commands(tmp_path):
+    """Tests that a finished command still counts towards the totals and that later phases don't reset them."""
+    tracker = ProgressTracker(str(tmp_path))
+    first_command_id = tracker.command_started("mock-repo")
+    second_command_id = tracker.command_started("mock-repo")
+
+    tracker.update(first_command_id, "Receiving objects: 100% (10/10), 2.00 KiB | 1.00 KiB/s, done.")
+    tracker.update(first_command_id, "Resolving deltas: 100% (4/4), done.")
+    tracker.command_finished(first_command_id)
+    tracker.update(second_command_id, "Receiving objects:  50% (5/10), 512 bytes | 512.00 bytes/s")
+    status = tracker.get_status()
+
+    assert status["received_objects"] == 15
+    assert status["received_bytes"] == 2560
+    assert [command["asset"] for command in status["commands"]] == ["mock-repo"]
+
+
+def test_progress_tracker_counts_assets(tmp_path):
+    tracker = ProgressTracker(str(tmp_path))
+    for _ in range(4):
+        tracker.asset_queued()
+    for _ in range(3):
+        tracker.asset_started()
+    tracker.asset_finished(failed=False)
+    tracker.asset_finished(failed=True)
+
+    status = tracker.get_status()
+
+    assert (status["queued"], status["active"], status["finished"], status["failed"]) == (1, 1, 2, 1)
+    assert status["eta_seconds"] is not None
+
+
+@patch("logging.Logger.info")
+def test_progress_tracker_report(mock_logger, tmp_path):
+    tracker = ProgressTracker(str(tmp_path))
+    tracker.asset_queued()
+
+    tracker.report()
+
+    mock_logger.assert_called_once()
+    assert "1 queued" in mock_logger.call_args.args[0]
+    with open(os.path.join(tmp_path, "status.json")) as status_file:
+        assert json.load(status_file)["queued"] == 1
+
+
+def test_run_streaming_splits_progress_lines():
+    """Tests that progress lines, which git ends with a carriage return, are streamed one at a time."""
+    lines = []
+    command = [
+        sys.executable,
+        "-c",
+        "import sys; sys.stdout.write('Receiving objects:  50% (1/2)\\rReceiving objects: 100% (2/2)\\ndone\\n')",
+    ]
+
+    _run_streaming(command, 30, on_output=lines.append)
+
+    assert lines == ["Receiving objects:  50% (1/2)", "Receiving objects: 100% (2/2)", "done"]
+
+
+def test_pipeline_reports_progress(tmp_path):
+    github_archive = GithubArchive(location=str(tmp_path), progress=True)
+    github_archive.progress_tracker = ProgressTracker(str(tmp_path))
+    pipeline = ArchivePipeline(github_archive)
+
+    pipeline.submit(USER_CONTEXT, MagicMock(return_value=None), [CLONE_OPERATION])
+    pipeline.submit(USER_CONTEXT, MagicMock(return_value="mock_username/mock-repo"), [CLONE_OPERATION])
+    pipeline.wait()
+    status = github_archive.progress_tracker.get_status()
+
+    assert (status["queued"], status["active"], status["finished"], status["failed"]) == (0, 0, 2, 1)
@@ -0,0 +1,225 @@
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+import pytest
+from github import GithubRetry
+from requests import (
+    PreparedRequest,
+    Response,
+)
+
+from github_archive import GithubArchive
+from github_archive.archive import USER_CONTEXT
+from github_archive.ratelimit import (
+    CORE_RESOURCE,
+    GRAPHQL_RESOURCE,
+    SEARCH_RESOURCE,
+    RateLimitedAdapter,
+    TokenPool,
+    get_resource,
+    is_user_scoped,
+)
+
+
+def _response(status_code=200, remaining=None, limit=5000, reset=2000, retry_after=None):
+    response = Response()
+    response.status_code = status_code
+    if remaining is not None:
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        response.headers["X-RateLimit-Limit"] = str(limit)
+        response.headers["X-RateLimit-Reset"] = str(reset)
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+
+    return response
+
+
+@pytest.mark.parametrize(
+    "url, expected_resource",
+    [
+        ("https://api.github.com/users/justintime50/repos", CORE_RESOURCE),
+        ("https://api.github.com/search/repositories", SEARCH_RESOURCE),
+        ("https://github.example.com/api/graphql", GRAPHQL_RESOURCE),
+    ],
+)
+def test_get_resource(url, expected_resource):
+    assert get_resource(url) == expected_resource
+
+
+@patch("time.sleep")
+@patch("time.time", return_value=1000)
+def test_token_pool_prefers_token_with_most_budget(mock_time, mock_sleep):
+    token_pool = TokenPool(["token-a", "token-b"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=3000))
+    token_pool.update("token-b", CORE_RESOURCE, _response(remaining=4000))
+
+    assert token_pool.acquire() == "token-b"
+    mock_sleep.assert_not_called()
+
+
+@patch("time.sleep")
+@patch("time.time", return_value=1000)
+def test_token_pool_primary_requests_use_first_token(mock_time, mock_sleep):
+    token_pool = TokenPool(["token-a", "token-b"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=3000))
+    token_pool.update("token-b", CORE_RESOURCE, _response(remaining=4000))
+
+    assert token_pool.acquire(primary=True) == "token-a"
+
+
+@patch("time.sleep")
+@patch("time.time", return_value=1000)
+def test_token_pool_pins_token(mock_time, mock_sleep):
+    """Tests that the requests of a pinned block stick to the first token that answered one of them."""
+    token_pool = TokenPool(["token-a", "token-b"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=3000))
+    token_pool.update("token-b", CORE_RESOURCE, _response(remaining=4000))
+
+    with token_pool.pin():
+        token = token_pool.acquire()
+        token_pool.update(token, CORE_RESOURCE, _response(remaining=1000))
+        assert [token, token_pool.acquire()] == ["token-b", "token-b"]
+        # The authenticated user is still requested with the primary token
+        assert token_pool.acquire(primary=True) == "token-a"
+
+    assert token_pool.acquire() == "token-a"
+
+
+@patch("time.sleep")
+@patch("time.time", return_value=1000)
+def test_token_pool_does_not_pin_rate_limited_token(mock_time, mock_sleep):
+    token_pool = TokenPool(["token-a", "token-b"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=3000))
+
+    with token_pool.pin():
+        assert token_pool.acquire() == "token-b"
+        token_pool.update("token-b", CORE_RESOURCE, _response(status_code=403, remaining=0))
+        assert token_pool.acquire() == "token-a"
+        token_pool.update("token-a", CORE_RESOURCE, _response(remaining=2999))
+        assert token_pool.acquire() == "token-a"
+
+    mock_sleep.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "method, url, expected_user_scoped",
+    [
+        ("GET", "https://api.github.com/user", True),
+        ("GET", "https://api.github.com/user/repos", True),
+        ("GET", "https://api.github.com/gists", True),
+        ("GET", "https://github.example.com/api/v3/user/orgs", True),
+        ("POST", "https://api.github.com/graphql", True),
+        ("POST", "https://api.github.com/repos/justintime50/repo1/forks", True),
+        ("GET", "https://api.github.com/users/justintime50/repos", False),
+        ("GET", "https://api.github.com/users/justintime50/gists", False),
+        ("GET", "https://api.github.com/gists/123", True),
+    ],
+)
+def test_is_user_scoped(method, url, expected_user_scoped):
+    request = PreparedRequest()
+    request.prepare(method=method, url=url)
+
+    assert is_user_scoped(request) is expected_user_scoped
+
+
+@patch("time.sleep")
+@patch("time.time", return_value=1000)
+def test_token_pool_waits_for_reset_when_exhausted(mock_time, mock_sleep):
+    token_pool = TokenPool(["token-a", "token-b"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=0, reset=1500))
+    token_pool.update("token-b", CORE_RESOURCE, _response(remaining=0, reset=1100))
+
+    assert token_pool.acquire() == "token-b"
+    mock_sleep.assert_called_once_with(100)
+
+
+@patch("time.sleep")
+@patch("time.time", return_value=1000)
+def test_token_pool_paces_requests_under_reserve(mock_time, mock_sleep):
+    """Tests that the remaining budget is spread evenly until the reset, even across concurrent requests."""
+    token_pool = TokenPool(["token-a"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=10, reset=1020))
+
+    token_pool.acquire()
+    token_pool.acquire()
+
+    mock_sleep.assert_called_once_with(2.0)
+
+
+@patch("time.time", return_value=1000)
+def test_token_pool_update_detects_rate_limits(mock_time):
+    token_pool = TokenPool(["token-a"])
+
+    assert token_pool.update("token-a", CORE_RESOURCE, _response(status_code=403, remaining=0)) is True
+    assert token_pool.update("token-a", CORE_RESOURCE, _response(status_code=403, retry_after=60)) is True
+    assert token_pool.update("token-a", CORE_RESOURCE, _response(status_code=403, remaining=10)) is False
+    assert token_pool.budgets[("token-a", CORE_RESOURCE)].next_request == 1060
+
+
+def test_token_pool_budgets_mask_tokens():
+    token_pool = TokenPool(["secret-token-1234"])
+    token_pool.update("secret-token-1234", CORE_RESOURCE, _response(remaining=4000))
+
+    assert token_pool.get_budgets() == [
+        {"token": "token ...1234", "resource": CORE_RESOURCE, "remaining": 4000, "limit": 5000, "reset": 2000}
+    ]
+
+
+@patch("github_archive.archive.Github")
+def test_github_archive_pools_tokens(mock_github):
+    github_archive = GithubArchive(token="token-a, token-b")
+
+    assert github_archive.token == "token-a"
+    assert github_archive.token_pool.tokens == ["token-a", "token-b"]
+
+
+def test_exhausted_token_is_retried_with_another(mock_api_server, repo_payload, tmp_path):
+    """Tests that a request rejected by the rate limit of one token is retried with the next one in the pool."""
+    mock_api_server.add_route("/user", {"login": "justintime50", "url": f"{mock_api_server.url}/user"})
+    mock_api_server.add_route(
+        "/users/justintime50",
+        {"login": "justintime50", "url": f"{mock_api_server.url}/users/justintime50"},
+    )
+    mock_api_server.add_route(
+        "/users/justintime50/repos",
+        [repo_payload("repo1")],
+    )
+    mock_api_server.token_rate_limits = {"token-a": 4000, "token-b": 0}
+    github_archive = GithubArchive(
+        token="token-a,token-b",
+        users="justintime50",
+        base_url=mock_api_server.url,
+        location=str(tmp_path),
+        cache=False,
+    )
+
+    repos = list(github_archive.iterate_git_assets(USER_CONTEXT))
+
+    assert [repo.name for repo in repos] == ["repo1"]
+    used_tokens = [headers["Authorization"] for _, headers in mock_api_server.requests]
+    # The authenticated user is always requested with the primary token, public resources go to any token
+    assert used_tokens == ["token token-a", "token token-b", "token token-a", "token token-a"]
+    assert github_archive.failed_owners == {}
+
+
+def test_log_budgets():
+    token_pool = TokenPool(["token-a"])
+    token_pool.update("token-a", CORE_RESOURCE, _response(remaining=4000, reset=0))
+
+    with patch("woodchips.get", return_value=MagicMock()) as mock_logger:
+        token_pool.log_budgets()
+
+    mock_logger.return_value.info.assert_called_once_with(
+        "API budget of token ...en-a (core): 4000/5000 requests remaining, resets at 00:00:00 UTC"
+    )
+
+
+def test_adapter_leaves_rate_limits_to_the_token_pool():
+    """Tests that PyGithub's retry policy no longer sleeps on rate limited responses itself."""
+    adapter = RateLimitedAdapter(TokenPool([]), max_retries=GithubRetry(total=5))
+
+    assert adapter.max_retries.total == 5
+    assert 403 not in adapter.max_retries.status_forcelist
+    assert 500 in adapter.max_retries.status_forcelist
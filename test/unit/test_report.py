@@ -0,0 +1,136 @@
+import json
+import os
+import subprocess  # nosec
+from unittest.mock import patch
+
+from github_archive import GithubArchive
+from github_archive.constants import (
+    CLONE_OPERATION,
+    GIST_CONTEXT,
+    PULL_OPERATION,
+    REPORTS_DIR,
+    USER_CONTEXT,
+)
+from github_archive.pipeline import ArchivePipeline
+from github_archive.progress import ProgressTracker
+from github_archive.repos import _archive_repo
+
+
+def _read_report(path):
+    with open(path) as report_file:
+        return [json.loads(line) for line in report_file]
+
+
+def test_report_records_operations(tmp_path):
+    github_archive = GithubArchive(location=str(tmp_path))
+    repo_path = os.path.join(tmp_path, "repos", "mock_username", "mock-repo")
+    github_archive.metrics.register_asset(repo_path, USER_CONTEXT)
+
+    github_archive.report.open([CLONE_OPERATION, PULL_OPERATION])
+    github_archive.report.record(repo_path, CLONE_OPERATION, 2.5)
+    github_archive.report.record(repo_path, PULL_OPERATION, 1, "CalledProcessError")
+    github_archive.report.record_skipped(repo_path, PULL_OPERATION)
+    github_archive.report.finish()
+
+    run, cloned, failed, skipped, summary = _read_report(github_archive.report.path)
+    assert os.path.dirname(github_archive.report.path) == os.path.join(tmp_path, "reports")
+    assert run["operations"] == [CLONE_OPERATION, PULL_OPERATION]
+    assert cloned["asset"] == "repos/mock_username/mock-repo"
+    assert cloned["context"] == USER_CONTEXT
+    assert (cloned["outcome"], cloned["duration_seconds"], cloned["error_class"]) == ("succeeded", 2.5, None)
+    # Git wasn't asked for its progress, so the bytes it received are unknown
+    assert cloned["received_bytes"] is None
+    assert (failed["outcome"], failed["error_class"]) == ("failed", "CalledProcessError")
+    assert skipped["outcome"] == "skipped"
+    assert summary["contexts"] == {
+        USER_CONTEXT: {"succeeded": 1, "failed": 1, "skipped": 1, "duration_seconds": 3.5, "received_bytes": 0}
+    }
+
+
+@patch("github_archive.report.REPORTS_KEPT", 2)
+def test_report_removes_old_reports(tmp_path):
+    """Tests that only the newest reports are kept in the reports folder."""
+    reports_dir = os.path.join(tmp_path, REPORTS_DIR)
+    os.makedirs(reports_dir)
+    for timestamp in ["20260101T000000Z", "20260102T000000Z"]:
+        open(os.path.join(reports_dir, f"{timestamp}.jsonl"), "w").close()
+    github_archive = GithubArchive(location=str(tmp_path))
+
+    github_archive.report.open([CLONE_OPERATION])
+    github_archive.report.finish()
+
+    assert sorted(os.listdir(reports_dir)) == ["20260102T000000Z.jsonl", os.path.basename(github_archive.report.path)]
+
+
+def test_report_is_written_incrementally(tmp_path):
+    """Tests that the report is usable before the run finishes, such as after a crash."""
+    report_path = os.path.join(tmp_path, "report.jsonl")
+    github_archive = GithubArchive(location=str(tmp_path), report_file=report_path)
+
+    github_archive.report.open([CLONE_OPERATION])
+    github_archive.report.record(os.path.join(tmp_path, "gists", "123"), CLONE_OPERATION, 1)
+
+    assert [entry["type"] for entry in _read_report(report_path)] == ["run", "operation"]
+    github_archive.report.close()
+
+
+def test_report_records_received_bytes(tmp_path):
+    github_archive = GithubArchive(location=str(tmp_path), progress=True)
+    github_archive.progress_tracker = ProgressTracker(str(tmp_path))
+    command_id = github_archive.progress_tracker.command_started("mock-repo")
+    github_archive.progress_tracker.update(command_id, "Receiving objects: 100% (10/10), 2.00 KiB | 1.00 KiB/s, done.")
+    github_archive.progress_tracker.command_finished(command_id)
+
+    github_archive.report.open([CLONE_OPERATION])
+    github_archive.report.record(os.path.join(tmp_path, "repos", "mock_username", "mock-repo"), CLONE_OPERATION, 1)
+    github_archive.report.finish()
+
+    assert _read_report(github_archive.report.path)[1]["received_bytes"] == 2048
+
+
+def test_report_records_failed_git_operations(tmp_path, mock_git_asset):
+    github_archive = GithubArchive(location=str(tmp_path), retries=0)
+    github_archive.report.open([CLONE_OPERATION])
+    pipeline = ArchivePipeline(github_archive)
+    repo_path = os.path.join(tmp_path, "repos", "mock_username", "mock-asset-name")
+
+    with patch("subprocess.check_output", side_effect=subprocess.TimeoutExpired(cmd="git clone", timeout=1)):
+        pipeline.submit(
+            USER_CONTEXT,
+            _archive_repo,
+            [CLONE_OPERATION],
+            asset_path=repo_path,
+            github_archive=github_archive,
+            repo=mock_git_asset,
+            repo_path=repo_path,
+        )
+        pipeline.wait()
+    github_archive.report.close()
+
+    operation = _read_report(github_archive.report.path)[1]
+    assert (operation["context"], operation["outcome"], operation["error_class"]) == (
+        USER_CONTEXT,
+        "failed",
+        "TimeoutExpired",
+    )
+
+
+def test_report_merges_shard_totals(tmp_path):
+    github_archive = GithubArchive(location=str(tmp_path))
+    gist_path = os.path.join(tmp_path, "gists", "123")
+    github_archive.metrics.register_asset(gist_path, GIST_CONTEXT)
+    github_archive.report.open([CLONE_OPERATION])
+    github_archive.report.record(gist_path, CLONE_OPERATION, 1.5)
+
+    github_archive.report.merge_totals(
+        {USER_CONTEXT: {"succeeded": 2, "failed": 1, "skipped": 0, "duration_seconds": 4.25, "received_bytes": 1024}}
+    )
+    github_archive.report.merge_totals(
+        {GIST_CONTEXT: {"succeeded": 1, "failed": 0, "skipped": 0, "duration_seconds": 1, "received_bytes": 0}}
+    )
+    github_archive.report.finish()
+
+    assert _read_report(github_archive.report.path)[-1]["contexts"] == {
+        GIST_CONTEXT: {"succeeded": 2, "failed": 0, "skipped": 0, "duration_seconds": 2.5, "received_bytes": 0},
+        USER_CONTEXT: {"succeeded": 2, "failed": 1, "skipped": 0, "duration_seconds": 4.25, "received_bytes": 1024},
+    }
@@ -1,102 +1,58 @@
-import copy
+import os
 import subprocess
+from datetime import (
+    datetime,
+    timezone,
+)
 from unittest.mock import (
     MagicMock,
     patch,
 )
 
+import pytest
 from github import Repository
 
 from github_archive import GithubArchive
 from github_archive.archive import (
     CLONE_OPERATION,
     PULL_OPERATION,
+    USER_CONTEXT,
 )
+from github_archive.constants import INCOMPLETE_CLONE_MARKER
 from github_archive.repos import (
     _archive_repo,
     _fork_repo,
-    iterate_repos_to_archive,
     iterate_repos_to_fork,
+    queue_repos_to_archive,
     view_repos,
 )
 
 
 @patch("github_archive.archive.Github")
-@patch("github_archive.repos._archive_repo")
-def test_iterate_repos_not_matching_authed_username(mock_archive_repo, mock_github_instance, mock_git_asset):
+def test_queue_repos_not_matching_authed_username(mock_github_instance, mock_git_asset):
     repos = [mock_git_asset]
     github_archive = GithubArchive(
         users="mock_username",
     )
+    pipeline = MagicMock()
 
-    iterate_repos_to_archive(github_archive, repos, CLONE_OPERATION)
+    queue_repos_to_archive(github_archive, pipeline, USER_CONTEXT, repos, [CLONE_OPERATION])
 
-    mock_archive_repo.assert_called_once()
+    pipeline.submit.assert_called_once()
 
 
 @patch("github_archive.archive.Github")
-@patch("github_archive.repos._archive_repo")
-def test_iterate_repos_matching_authed_username(mock_archive_repo, mock_github_instance, mock_git_asset):
+def test_queue_repos_matching_authed_username(mock_github_instance, mock_git_asset):
     repos = [mock_git_asset]
     github_archive = GithubArchive(
         token="123",
         users="mock_username",  # matches the username of the git asset
     )
+    pipeline = MagicMock()
 
-    iterate_repos_to_archive(github_archive, repos, CLONE_OPERATION)
-
-    mock_archive_repo.assert_called_once()
-
-
-@patch("github_archive.archive.Github")
-@patch("github_archive.repos._archive_repo")
-def test_iterate_repos_include_list(mock_archive_repo, mock_github_instance, mock_git_asset):
-    """Tests that we iterate repos that are on the include list."""
-    mock_non_include_asset = copy.deepcopy(mock_git_asset)
-    mock_non_include_asset.name = "not-the-name"
-    repos = [mock_git_asset, mock_non_include_asset]
-    github_archive = GithubArchive(
-        users="mock_username",
-        include="mock-asset-name",
-    )
-
-    iterate_repos_to_archive(github_archive, repos, CLONE_OPERATION)
-
-    mock_archive_repo.assert_called_once()  # Called once even though there are two, ensure we filtered
-
-
-@patch("github_archive.archive.Github")
-@patch("github_archive.repos._archive_repo")
-def test_iterate_repos_exclude_list(mock_archive_repo, mock_github_instance, mock_git_asset):
-    """Tests that we do not iterate repos that are on the exclude list."""
-    mock_non_exclude_asset = copy.deepcopy(mock_git_asset)
-    mock_non_exclude_asset.name = "not-the-name"
-    repos = [mock_git_asset, mock_non_exclude_asset]
-    github_archive = GithubArchive(
-        users="mock_username",
-        exclude="mock-asset-name",
-    )
-
-    iterate_repos_to_archive(github_archive, repos, CLONE_OPERATION)
-
-    mock_archive_repo.assert_called_once()  # Called once even though there are two, ensure we filtered
-
-
-@patch("github_archive.archive.Github")
-@patch("github_archive.repos._archive_repo")
-def test_iterate_repos_languages_list(mock_archive_repo, mock_github_instance, mock_git_asset):
-    """Tests that we iterate repos that are one of the languages in the list."""
-    mock_non_language_asset = copy.deepcopy(mock_git_asset)
-    mock_non_language_asset.language = "Go"
-    repos = [mock_git_asset, mock_non_language_asset]
-    github_archive = GithubArchive(
-        users="mock_username",
-        languages="python",
-    )
-
-    iterate_repos_to_archive(github_archive, repos, CLONE_OPERATION)
+    queue_repos_to_archive(github_archive, pipeline, USER_CONTEXT, repos, [CLONE_OPERATION])
 
-    mock_archive_repo.assert_called_once()  # Called once even though there are two, ensure we filtered
+    pipeline.submit.assert_called_once()
 
 
 @patch("logging.Logger.info")
@@ -144,6 +100,21 @@ def test_archive_repo_use_https_success(mock_logger, mock_subprocess, mock_git_a
     mock_logger.assert_called_once_with(message)
 
 
+@patch("subprocess.check_output", side_effect=subprocess.TimeoutExpired(cmd="subprocess.check_output", timeout=0.1))
+def test_archive_repo_mirror(mock_subprocess, mock_git_asset):
+    """Tests that mirrors are cloned bare and that a failed mirror is reported with its `.git` directory name."""
+    github_archive = GithubArchive(mirror=True, retries=0)
+    failed_repo = _archive_repo(github_archive, mock_git_asset, "mock/path.git", CLONE_OPERATION)
+
+    mock_subprocess.assert_called_once_with(
+        ["git", "clone", "--mirror", "mock/html_url", "mock/path.git"],
+        stderr=-2,
+        text=True,
+        timeout=300,
+    )
+    assert failed_repo == "mock_username/mock-asset-name.git"
+
+
 @patch("os.path.join", return_value="mock_user/mock_repo")
 @patch("os.path.exists", return_value=True)
 @patch("subprocess.check_output")
@@ -156,12 +127,77 @@ def test_archive_repo_clone_exists(mock_logger, mock_subprocess, mock_path_exist
     mock_subprocess.assert_not_called()
 
 
+@patch("os.path.exists", return_value=True)
+@patch("subprocess.check_output")
+def test_archive_repo_pull_unchanged_skipped(mock_subprocess, mock_path_exists, mock_git_asset):
+    """Tests that we don't pull a repo GitHub reports hasn't been pushed to since the last sync."""
+    mock_git_asset.pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    github_archive = GithubArchive()
+    github_archive.state.record("repos/mock_username/mock-asset-name", mock_git_asset.pushed_at)
+    _archive_repo(github_archive, mock_git_asset, "mock/path", PULL_OPERATION)
+
+    mock_subprocess.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "deepen, shallow, expected_pulled",
+    [
+        (10, True, True),
+        (10, False, False),
+        (None, True, False),
+    ],
+)
+@patch("os.path.exists", return_value=True)
+@patch("subprocess.check_output")
+def test_archive_repo_pull_unchanged_deepen(
+    mock_subprocess, mock_path_exists, deepen, shallow, expected_pulled, mock_git_asset, tmp_path
+):
+    """Tests that an unchanged repo is only pulled when the pull deepens a shallow clone, a plain pull of a
+    shallow clone or a pull of a full clone adds nothing.
+    """
+    os.makedirs(os.path.join(tmp_path, ".git"))
+    if shallow:
+        open(os.path.join(tmp_path, ".git", "shallow"), "w").close()
+    mock_git_asset.pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    github_archive = GithubArchive(deepen=deepen)
+    github_archive.state.record("repos/mock_username/mock-asset-name", mock_git_asset.pushed_at)
+    _archive_repo(github_archive, mock_git_asset, str(tmp_path), PULL_OPERATION)
+
+    assert mock_subprocess.called is expected_pulled
+    if expected_pulled:
+        assert "--deepen" in mock_subprocess.call_args[0][0]
+
+
+@patch("os.path.exists", return_value=True)
+@patch("subprocess.check_output")
+def test_archive_repo_pull_changed(mock_subprocess, mock_path_exists, mock_git_asset):
+    """Tests that we pull a repo that was pushed to since the last sync and record the new push time."""
+    mock_git_asset.pushed_at = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    github_archive = GithubArchive()
+    github_archive.state.record("repos/mock_username/mock-asset-name", datetime(2026, 1, 1, tzinfo=timezone.utc))
+    _archive_repo(github_archive, mock_git_asset, "mock/path", PULL_OPERATION)
+
+    mock_subprocess.assert_called_once()
+    assert github_archive.state.is_unchanged("repos/mock_username/mock-asset-name", mock_git_asset.pushed_at)
+
+
+@patch("os.path.exists", return_value=True)
+@patch("subprocess.check_output")
+def test_archive_repo_force_pull(mock_subprocess, mock_path_exists, mock_git_asset):
+    mock_git_asset.pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    github_archive = GithubArchive(force_pull=True)
+    github_archive.state.record("repos/mock_username/mock-asset-name", mock_git_asset.pushed_at)
+    _archive_repo(github_archive, mock_git_asset, "mock/path", PULL_OPERATION)
+
+    mock_subprocess.assert_called_once()
+
+
 @patch("subprocess.check_output", side_effect=subprocess.TimeoutExpired(cmd="subprocess.check_output", timeout=0.1))
 @patch("logging.Logger.error")
 def test_archive_repo_timeout_exception(mock_logger, mock_subprocess, mock_git_asset):
     operation = CLONE_OPERATION
     message = f"Git operation timed out archiving {mock_git_asset.name}."
-    github_archive = GithubArchive()
+    github_archive = GithubArchive(retries=0)
     _archive_repo(github_archive, mock_git_asset, "mock/path", operation)
 
     mock_logger.assert_called_with(message)
@@ -173,12 +209,30 @@ def test_archive_repo_timeout_exception(mock_logger, mock_subprocess, mock_git_a
 @patch("logging.Logger.error")
 def test_archive_repo_called_process_error(mock_logger, mock_subprocess, mock_git_asset):
     operation = PULL_OPERATION
-    github_archive = GithubArchive()
+    github_archive = GithubArchive(retries=0)
     _archive_repo(github_archive, mock_git_asset, "github_archive", operation)
 
     mock_logger.assert_called_once()
 
 
+@patch("subprocess.check_output")
+@patch("github_archive.git.resume_clone")
+def test_archive_repo_resumes_incomplete_clone(mock_resume_clone, mock_subprocess, mock_git_asset, tmp_path):
+    """Tests that a partial clone is resumed (even without --resumable_clones) and isn't pulled until complete."""
+    repo_path = os.path.join(tmp_path, "mock-asset-name")
+    os.makedirs(os.path.join(repo_path, ".git"))
+    open(os.path.join(repo_path, ".git", INCOMPLETE_CLONE_MARKER), "w").close()
+    github_archive = GithubArchive()
+
+    _archive_repo(github_archive, mock_git_asset, repo_path, CLONE_OPERATION)
+    _archive_repo(github_archive, mock_git_asset, repo_path, PULL_OPERATION)
+
+    mock_resume_clone.assert_called_once_with(
+        github_archive, "mock/html_url", repo_path, "mock-asset-name", timeout=300, size=mock_git_asset.size
+    )
+    mock_subprocess.assert_not_called()
+
+
 @patch("github_archive.archive.Github")
 @patch("github_archive.repos._fork_repo")
 def test_iterate_repos_to_fork(mock_fork_repo, mock_github_instance):
@@ -193,10 +247,9 @@ def test_iterate_repos_to_fork(mock_fork_repo, mock_github_instance):
 
 @patch("logging.Logger.info")
 @patch("github.Repository.Repository.create_fork")
-def test_fork_repo_success(mock_create_fork, mock_logger):
-    repo = MagicMock(spec=Repository.Repository)
-    repo.create_fork = mock_create_fork
-    _fork_repo(repo)
+def test_fork_repo_success(mock_create_fork, mock_logger, mock_git_asset):
+    github_archive = GithubArchive()
+    _fork_repo(github_archive, mock_git_asset)
 
     mock_create_fork.assert_called_once()
     mock_logger.assert_called_once()
@@ -204,10 +257,21 @@ def test_fork_repo_success(mock_create_fork, mock_logger):
 
 @patch("logging.Logger.error")
 @patch("github.Repository.Repository.create_fork", side_effect=Exception())
-def test_fork_repo_failure(mock_create_fork, mock_logger):
-    repo = MagicMock(spec=Repository.Repository)
-    repo.create_fork = mock_create_fork
-    _fork_repo(repo)
+def test_fork_repo_failure(mock_create_fork, mock_logger, mock_git_asset):
+    github_archive = GithubArchive()
+    _fork_repo(github_archive, mock_git_asset)
 
     mock_create_fork.assert_called_once()
     mock_logger.assert_called_once()
+
+
+def test_fork_repo_is_rate_limited(mock_api_server, repo_payload, tmp_path):
+    """Tests that forks are sent through the rate limited adapter of the run rather than a connection of their own."""
+    mock_api_server.add_route("/repos/justintime50/repo1/forks", repo_payload("repo1", owner="another-user"))
+    github_archive = GithubArchive(base_url=mock_api_server.url, location=str(tmp_path), cache=False)
+    repo = MagicMock(full_name="justintime50/repo1")
+
+    _fork_repo(github_archive, repo)
+
+    assert [path for path, _ in mock_api_server.requests] == ["/repos/justintime50/repo1/forks"]
+    assert 'github_archive_api_request_duration_seconds_count{resource="core"} 1' in github_archive.metrics.render()
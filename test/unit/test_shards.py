@@ -0,0 +1,63 @@
+import os
+from datetime import (
+    datetime,
+    timezone,
+)
+
+from github_archive import GithubArchive
+from github_archive.constants import (
+    CLONE_OPERATION,
+    USER_CONTEXT,
+)
+from github_archive.records import (
+    OwnerRecord,
+    RepoRecord,
+)
+from github_archive.repos import _archive_repo
+from github_archive.shards import (
+    ShardedPipeline,
+    get_shard,
+)
+
+
+def test_get_shard_is_stable():
+    shards = [get_shard(f"repos/mock_username/mock-repo-{index}", 4) for index in range(100)]
+
+    assert shards == [get_shard(f"repos/mock_username/mock-repo-{index}", 4) for index in range(100)]
+    assert set(shards) == {0, 1, 2, 3}
+    assert get_shard("repos/mock_username/mock-repo-0", 1) == 0
+
+
+def test_sharded_pipeline_archives_and_merges(source_repo, tmp_path):
+    """Tests that shards archive their assets in worker processes and hand their results back to the run."""
+    location = os.path.join(tmp_path, "archive")
+    github_archive = GithubArchive(location=location, clone=True, use_https=True, shards=2, retries=0)
+    github_archive.report.open([CLONE_OPERATION])
+    pipeline = ShardedPipeline(github_archive)
+    pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    # The last repo doesn't exist, its clone fails
+    for name, url in [("mock-repo-1", source_repo), ("mock-repo-2", source_repo), ("missing", f"{source_repo}-x")]:
+        repo = RepoRecord(
+            name, f"mock_username/{name}", OwnerRecord("mock_username"), False, False, None, url, url, pushed_at, 1
+        )
+        repo_path = os.path.join(location, "repos", "mock_username", name)
+        pipeline.submit(
+            USER_CONTEXT,
+            _archive_repo,
+            [CLONE_OPERATION],
+            asset_path=repo_path,
+            github_archive=github_archive,
+            repo=repo,
+            repo_path=repo_path,
+        )
+    failures = pipeline.wait()
+    github_archive.report.close()
+
+    assert sum(1 for assets in pipeline.assets if assets) == 2
+    assert os.path.isdir(os.path.join(location, "repos", "mock_username", "mock-repo-1", ".git"))
+    assert os.path.isdir(os.path.join(location, "repos", "mock_username", "mock-repo-2", ".git"))
+    assert failures == {USER_CONTEXT: [(CLONE_OPERATION, os.path.join("mock_username", "missing"))]}
+    assert github_archive.state.is_unchanged("repos/mock_username/mock-repo-1", pushed_at)
+    assert github_archive.report.totals[USER_CONTEXT]["succeeded"] == 2
+    assert 'github_archive_assets_total{context="user",result="cloned"} 2' in github_archive.metrics.render()
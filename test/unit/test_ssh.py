@@ -0,0 +1,186 @@
+import json
+import os
+import shlex
+import stat
+import subprocess  # nosec
+import sys
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+import pytest
+
+from github_archive import GithubArchive
+from github_archive.git import run_git_command
+from github_archive.ssh import (
+    SshControlPool,
+    get_ssh_command,
+)
+
+FAKE_SSH = """#!{executable}
+import json
+import subprocess
+import sys
+
+with open({log_path!r}, "a") as log_file:
+    log_file.write(json.dumps(sys.argv[1:]) + "\\n")
+# Control commands and OpenSSH detection succeed, connections run the remote command locally instead
+if "-O" in sys.argv or "-G" in sys.argv:
+    sys.exit(0)
+sys.exit(subprocess.call(["sh", "-c", sys.argv[-1]]))
+"""
+
+
+@pytest.fixture
+def fake_ssh(tmp_path):
+    """An SSH command standing in for OpenSSH that logs its arguments, returns the path of the command and log."""
+    path = os.path.join(tmp_path, "fake-ssh")
+    log_path = os.path.join(tmp_path, "fake-ssh.log")
+    with open(path, "w") as script:
+        script.write(FAKE_SSH.format(executable=sys.executable, log_path=log_path))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+    return path, log_path
+
+
+def _read_log(log_path):
+    with open(log_path) as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+@pytest.mark.parametrize(
+    "args, expected_size",
+    [
+        ({"threads": 5}, 1),
+        ({"threads": 25}, 3),
+        ({"threads": 10, "giant_threshold": 1000, "giant_threads": 2}, 2),
+    ],
+)
+def test_ssh_control_pool_size(args, expected_size):
+    pool = SshControlPool(GithubArchive(**args))
+
+    assert pool.size == expected_size
+    pool.close()
+
+
+def test_ssh_control_pool_socket_path_length():
+    """Tests that the control sockets fit in a Unix socket path, which the default temp directory of macOS doesn't."""
+    pool = SshControlPool(GithubArchive(threads=200))
+
+    assert pool.directory.startswith("/tmp/gha-")
+    assert len(pool._get_control_path(pool.size - 1).replace("%C", "c" * 40)) + 17 < 104
+    pool.close()
+
+
+def test_ssh_control_pool_socket_path_too_long(tmp_path):
+    directory = os.path.join(tmp_path, "a" * 60)
+    os.makedirs(directory)
+
+    with patch("github_archive.ssh.SSH_SOCKET_DIRECTORY", directory):
+        with pytest.raises(ValueError) as error:
+            SshControlPool(GithubArchive())
+
+    assert "exceed the length limit of Unix sockets" in str(error.value)
+    assert os.listdir(directory) == []
+
+
+def test_ssh_control_pool_get_env():
+    """Tests that git commands are spread over the connections of the pool."""
+    pool = SshControlPool(GithubArchive(threads=20))
+
+    control_paths = []
+    for _ in range(3):
+        ssh_command = shlex.split(pool.get_env()["GIT_SSH_COMMAND"])
+        assert ssh_command[:3] == ["ssh", "-o", "ControlMaster=auto"]
+        assert ssh_command[-1] == "ControlPersist=60"
+        control_paths.append(ssh_command[4])
+    pool.close()
+
+    assert control_paths == [f"ControlPath={os.path.join(pool.directory, slot)}-%C" for slot in ["0", "1", "0"]]
+    assert not os.path.exists(pool.directory)
+
+
+@pytest.mark.parametrize(
+    "env, expected_ssh_command",
+    [
+        ({}, "ssh"),
+        ({"GIT_SSH_COMMAND": "ssh -i mock_key"}, "ssh -i mock_key"),
+        (
+            {"GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": "core.sshCommand", "GIT_CONFIG_VALUE_0": "ssh -p 22"},
+            "ssh -p 22",
+        ),
+        (
+            {
+                "GIT_SSH_COMMAND": "ssh -i mock_key",
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "core.sshCommand",
+                "GIT_CONFIG_VALUE_0": "ssh -p 22",
+            },
+            "ssh -i mock_key",
+        ),
+    ],
+)
+def test_get_ssh_command(env, expected_ssh_command, tmp_path):
+    """Tests that the pool keeps the SSH command git would otherwise connect with."""
+    env = {"GIT_CONFIG_GLOBAL": os.path.join(tmp_path, "gitconfig"), "GIT_CONFIG_NOSYSTEM": "1", **env}
+    with patch.dict(os.environ, env):
+        if "GIT_SSH_COMMAND" not in env:
+            os.environ.pop("GIT_SSH_COMMAND", None)
+        assert get_ssh_command() == expected_ssh_command
+
+
+def test_ssh_control_pool_clone(fake_ssh, tmp_path):
+    """Tests cloning over the SSH transport through the connections of the pool."""
+    ssh_path, log_path = fake_ssh
+    source_path = os.path.join(tmp_path, "source")
+    subprocess.check_output(["git", "init", "--quiet", "--bare", source_path])
+    github_archive = GithubArchive(ssh_multiplex=True, ssh_command=ssh_path)
+    github_archive.ssh_pool = SshControlPool(github_archive)
+    path = os.path.join(tmp_path, "clone")
+
+    run_git_command(github_archive, ["git", "clone", f"ssh://localhost{source_path}", path], "mock-repo", timeout=30)
+
+    assert os.path.isdir(os.path.join(path, ".git"))
+    connection = _read_log(log_path)[-1]
+    assert ["-o", "ControlMaster=auto"] == connection[:2]
+    assert f"ControlPath={os.path.join(github_archive.ssh_pool.directory, '0')}-%C" in connection
+    assert connection[-2:] == ["localhost", f"git-upload-pack '{source_path}'"]
+    github_archive.ssh_pool.close()
+
+
+def test_ssh_control_pool_close(fake_ssh):
+    """Tests that every master connection of the pool is told to exit."""
+    ssh_path, log_path = fake_ssh
+    pool = SshControlPool(GithubArchive(ssh_command=ssh_path))
+    for socket_name in ["0-abc", "1-abc"]:
+        open(os.path.join(pool.directory, socket_name), "w").close()
+
+    pool.close()
+
+    assert _read_log(log_path) == [
+        ["-o", f"ControlPath={os.path.join(pool.directory, socket_name)}", "-O", "exit", "localhost"]
+        for socket_name in ["0-abc", "1-abc"]
+    ]
+    assert not os.path.exists(pool.directory)
+
+
+@patch("github_archive.archive.SshControlPool")
+def test_run_closes_ssh_control_pool(mock_ssh_control_pool, tmp_path):
+    github_archive = GithubArchive(users="justintime50", clone=True, ssh_multiplex=True, location=str(tmp_path))
+    github_archive.iterate_git_assets = MagicMock(return_value=iter([]))
+
+    github_archive.run()
+
+    mock_ssh_control_pool.return_value.close.assert_called_once()
+
+
+@patch("github_archive.archive.SshControlPool")
+def test_run_closes_ssh_control_pool_on_error(mock_ssh_control_pool, tmp_path):
+    github_archive = GithubArchive(users="justintime50", clone=True, ssh_multiplex=True, location=str(tmp_path))
+    github_archive.iterate_git_assets = MagicMock(side_effect=KeyboardInterrupt)
+
+    with pytest.raises(KeyboardInterrupt):
+        github_archive.run()
+
+    mock_ssh_control_pool.return_value.close.assert_called_once()
@@ -0,0 +1,80 @@
+import json
+import os
+from datetime import (
+    datetime,
+    timezone,
+)
+from unittest.mock import patch
+
+from github_archive.state import StateIndex
+
+
+def test_state_index_unchanged_after_record(tmp_path):
+    state = StateIndex(str(tmp_path))
+    pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    state.record("repos/mock_username/mock-asset-name", pushed_at)
+
+    assert state.is_unchanged("repos/mock_username/mock-asset-name", pushed_at) is True
+    assert state.is_unchanged("repos/mock_username/mock-asset-name", datetime(2026, 2, 1, tzinfo=timezone.utc)) is False
+    assert state.is_unchanged("repos/mock_username/another-asset", pushed_at) is False
+
+
+def test_state_index_ignores_missing_push_time(tmp_path):
+    state = StateIndex(str(tmp_path))
+
+    state.record("repos/mock_username/empty-repo", None)
+
+    assert state.assets == {}
+    assert state.is_unchanged("repos/mock_username/empty-repo", None) is False
+
+
+def test_state_index_save_and_load(tmp_path):
+    pushed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    state = StateIndex(str(tmp_path))
+    state.record("repos/mock_username/mock-asset-name", pushed_at)
+
+    state.save()
+    loaded_state = StateIndex(str(tmp_path))
+    loaded_state.load()
+
+    assert loaded_state.is_unchanged("repos/mock_username/mock-asset-name", pushed_at) is True
+    with open(os.path.join(tmp_path, "state.json")) as state_file:
+        assert json.load(state_file)["repos/mock_username/mock-asset-name"]["pushed_at"] == pushed_at.isoformat()
+
+
+@patch("logging.Logger.warning")
+def test_state_index_load_corrupt(mock_logger, tmp_path):
+    with open(os.path.join(tmp_path, "state.json"), "w") as state_file:
+        state_file.write("{not json")
+    state = StateIndex(str(tmp_path))
+
+    state.load()
+
+    assert state.assets == {}
+    mock_logger.assert_called_once()
+
+
+def test_state_index_durations(tmp_path):
+    """Tests that durations are kept per operation and survive the asset being synced again."""
+    state = StateIndex(str(tmp_path))
+
+    state.record_duration("repos/mock_username/mock-asset-name", "clone", 12.345)
+    state.record("repos/mock_username/mock-asset-name", datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+    assert state.get_duration("repos/mock_username/mock-asset-name", "clone") == 12.3
+    assert state.get_duration("repos/mock_username/mock-asset-name", "pull") is None
+    assert state.get_duration("repos/mock_username/another-asset", "clone") is None
+
+
+def test_state_index_merge(tmp_path):
+    """Tests that the entries a shard recorded are taken in and saved along with those of the run."""
+    shard_state = StateIndex(str(tmp_path))
+    shard_state.assets = {"repos/mock_username/unchanged-asset": {"pushed_at": "2025-01-01T00:00:00+00:00"}}
+    shard_state.record("repos/mock_username/mock-asset-name", datetime(2026, 1, 1, tzinfo=timezone.utc))
+    state = StateIndex(str(tmp_path))
+
+    state.merge(shard_state.get_updates())
+
+    assert list(state.assets) == ["repos/mock_username/mock-asset-name"]
+    assert state.is_unchanged("repos/mock_username/mock-asset-name", datetime(2026, 1, 1, tzinfo=timezone.utc))